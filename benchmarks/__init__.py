@@ -0,0 +1,81 @@
+"""
+Benchmarks de performance do projeto
+
+Cada módulo pode ser executado diretamente, ex:
+
+    python -m benchmarks.bench_list_render
+"""
+import os
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import Callable, Dict
+
+
+def setup_django():
+    """Configura o Django com as settings do projeto"""
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'djangoibge.settings')
+    import django
+    django.setup()
+
+
+def measure(func: Callable, repeat: int = 50) -> Dict:
+    """Mede tempo de CPU e tempo de relógio por execução (melhor e mediana)"""
+    cpu_times = []
+    wall_times = []
+    for _ in range(repeat):
+        cpu_start = time.process_time()
+        wall_start = time.perf_counter()
+        func()
+        wall_times.append(time.perf_counter() - wall_start)
+        cpu_times.append(time.process_time() - cpu_start)
+
+    cpu_times.sort()
+    wall_times.sort()
+    return {
+        'cpu_ms_min': round(cpu_times[0] * 1000, 3),
+        'cpu_ms_median': round(cpu_times[len(cpu_times) // 2] * 1000, 3),
+        'wall_ms_median': round(wall_times[len(wall_times) // 2] * 1000, 3),
+    }
+
+
+def import_synthetic_data(scale: int = 1, empresas_rows: int = 0):
+    """
+    Importa os dados sintéticos no banco configurado pelas importações reais
+
+    Gera as respostas da API e o zip de empresas (benchmarks.generators),
+    serve-os pelo servidor local de djangoibge.transport e aponta os
+    services para ele.
+    """
+    from djangoibge.transport import serve
+    from empresas.services import EmpresasService
+    from ibge.services import (
+        DistritoImportService, EstadoImportService, IBGEAPIService, MunicipioImportService,
+    )
+    from benchmarks.generators import write_empresas_archive, write_ibge_payloads
+
+    with tempfile.TemporaryDirectory(prefix='ibge-seed-') as workdir:
+        root = Path(workdir)
+        write_ibge_payloads(root / 'srv' / 'api', scale)
+        if empresas_rows:
+            write_empresas_archive(root / 'srv' / 'empresas.zip', empresas_rows)
+        server = serve(root / 'srv', port=0)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        base_url = f"http://127.0.0.1:{server.server_address[1]}"
+        IBGEAPIService.BASE_URL = f"{base_url}/api"
+        EmpresasService.URL = f"{base_url}/empresas.zip"
+
+        # EmpresasService grava o zip no diretório atual
+        old_cwd = os.getcwd()
+        os.chdir(root)
+        try:
+            print(f"Importando dados sintéticos (escala {scale}, {empresas_rows} empresas)")
+            EstadoImportService().import_estados()
+            MunicipioImportService().import_municipios()
+            DistritoImportService().import_distritos()
+            if empresas_rows:
+                EmpresasService.get_data()
+        finally:
+            os.chdir(old_cwd)
+            server.shutdown()
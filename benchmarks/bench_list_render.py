@@ -0,0 +1,76 @@
+"""
+Compara a renderização das listagens: template com instâncias de modelo
+(caminho antigo) contra tuplas de values_list com RowTemplate
+
+Não acessa o banco: as instâncias são montadas em memória com as relações
+já preenchidas, o que favorece o caminho antigo (sem N+1).
+"""
+from benchmarks import measure, setup_django
+
+setup_django()
+
+from django.template import Context, Template  # noqa: E402
+from ibge.filters import MUNICIPIO_ROW  # noqa: E402
+from ibge.models import Mesorregiao, Microrregiao, Municipio, Regiao, Uf  # noqa: E402
+
+
+# Laço da tabela de municípios antes do caminho enxuto
+LEGACY_TEMPLATE = Template("""
+{% for municipio in municipios %}
+<tr>
+    <td>{{ municipio.id }}</td>
+    <td>{{ municipio.nome }}</td>
+    <td>
+        {% if municipio.microrregiao.mesorregiao.uf %}
+            {{ municipio.microrregiao.mesorregiao.uf.nome }} ({{ municipio.microrregiao.mesorregiao.uf.sigla }})
+        {% else %}
+            -
+        {% endif %}
+    </td>
+    <td>
+        {% if municipio.microrregiao.mesorregiao.uf.regiao %}
+            {{ municipio.microrregiao.mesorregiao.uf.regiao.nome }}
+        {% else %}
+            -
+        {% endif %}
+    </td>
+    <td>{{ municipio.microrregiao.nome|default:"-" }}</td>
+    <td>{{ municipio.microrregiao.mesorregiao.nome|default:"-" }}</td>
+</tr>
+{% endfor %}
+""")
+
+LEAN_TEMPLATE = Template("{{ rows }}")
+
+
+def build_instances(count):
+    regiao = Regiao(id=3, sigla='SE', nome='Sudeste')
+    uf = Uf(id=35, sigla='SP', nome='São Paulo', regiao=regiao)
+    meso = Mesorregiao(id=3501, nome='São José do Rio Preto', uf=uf)
+    micro = Microrregiao(id=35001, nome='Jales', mesorregiao=meso)
+    return [Municipio(id=3500000 + i, nome=f'Município {i}', microrregiao=micro) for i in range(count)]
+
+
+def build_rows(count):
+    return [
+        (3500000 + i, f'Município {i}', 'São Paulo', 'SP', 'Sudeste', 'Jales', 'São José do Rio Preto')
+        for i in range(count)
+    ]
+
+
+def run():
+    print(f"{'linhas':>6}  {'caminho':<8}  {'CPU mín (ms)':>12}  {'CPU mediana (ms)':>16}")
+    for count in (20, 500):
+        instances = build_instances(count)
+        rows = build_rows(count)
+        results = {
+            'antigo': measure(lambda: LEGACY_TEMPLATE.render(Context({'municipios': instances}))),
+            'enxuto': measure(lambda: LEAN_TEMPLATE.render(Context({'rows': MUNICIPIO_ROW.render(rows)}))),
+        }
+        for name, result in results.items():
+            print(f"{count:>6}  {name:<8}  {result['cpu_ms_min']:>12}  {result['cpu_ms_median']:>16}")
+    return results
+
+
+if __name__ == '__main__':
+    run()
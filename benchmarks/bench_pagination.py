@@ -0,0 +1,69 @@
+"""
+Compara a renderização da paginação: laço sobre ``page_range`` no template
+(caminho antigo) contra a janela calculada em Python pela tag ``paginacao``
+
+Não acessa o banco: o paginador recebe um ``range`` com o total de linhas.
+Falha (código de saída 1) se o custo do caminho novo crescer com o número
+de páginas.
+"""
+import sys
+from benchmarks import measure, setup_django
+
+setup_django()
+
+from django.core.paginator import Paginator  # noqa: E402
+from django.template import Context, Template  # noqa: E402
+from django.template.loader import get_template  # noqa: E402
+from django.test import RequestFactory  # noqa: E402
+
+
+# Laço de páginas antes da tag de paginação
+LEGACY_TEMPLATE = Template("""
+<div class="page-numbers">
+    {% for i in page_obj.paginator.page_range %}
+        {% if i >= page_obj.number|add:"-3" and i <= page_obj.number|add:"3" %}
+            {% if i == page_obj.number %}
+                <span class="current-page"><strong>{{ i }} de {{ paginator.num_pages }}</strong></span>
+            {% else %}
+                <a href="?page={{ i }}{% if request.GET.nome %}&nome={{ request.GET.nome }}{% endif %}{% if request.GET.uf %}&uf={{ request.GET.uf }}{% endif %}{% if request.GET.regiao %}&regiao={{ request.GET.regiao }}{% endif %}" class="button">{{ i }}</a>
+            {% endif %}
+        {% endif %}
+    {% endfor %}
+</div>
+""")
+
+PER_PAGE = 30
+
+# Crescimento máximo aceito do caminho novo entre a menor e a maior listagem
+MAX_GROWTH = 2.0
+
+
+def run():
+    request = RequestFactory().get('/empresas/', {'nome': 'são', 'uf': 'SP'})
+    component = get_template('pagination.html')
+
+    print(f"{'páginas':>9}  {'caminho':<8}  {'CPU mín (ms)':>12}  {'CPU mediana (ms)':>16}")
+    costs = {}
+    for num_pages in (10, 1000, 100000):
+        paginator = Paginator(range(num_pages * PER_PAGE), PER_PAGE)
+        page_obj = paginator.page(num_pages // 2)
+        context = {'page_obj': page_obj, 'paginator': paginator, 'request': request}
+
+        results = {
+            'novo': measure(lambda: component.render(context, request)),
+        }
+        # O caminho antigo é linear no número de páginas; só mede até onde é viável
+        if num_pages <= 1000:
+            results['antigo'] = measure(lambda: LEGACY_TEMPLATE.render(Context(context)), repeat=10)
+
+        for name, result in results.items():
+            print(f"{num_pages:>9}  {name:<8}  {result['cpu_ms_min']:>12}  {result['cpu_ms_median']:>16}")
+        costs[num_pages] = results['novo']['cpu_ms_min']
+
+    growth = costs[max(costs)] / costs[min(costs)]
+    print(f"crescimento do caminho novo: {growth:.2f}x")
+    return growth <= MAX_GROWTH
+
+
+if __name__ == '__main__':
+    sys.exit(0 if run() else 1)
@@ -0,0 +1,226 @@
+"""
+Geradores de dados sintéticos para os benchmarks
+
+- Respostas da API de localidades do IBGE (estados, municípios e distritos)
+  com o mesmo aninhamento da API real, em escala 1x (5.570 municípios),
+  10x ou 100x. As divisões (meso/microrregiões, regiões imediatas e
+  intermediárias) seguem o tamanho real; só municípios e distritos crescem.
+- Arquivo zip da Receita com o CSV de empresas, gerado em streaming
+  (1 milhão a 50 milhões de linhas sem carregar tudo na memória).
+
+Uso:
+
+    python -m benchmarks.generators ibge DIRETORIO --scale 10
+    python -m benchmarks.generators empresas ARQUIVO.zip --rows 1000000
+"""
+import argparse
+import csv
+import io
+import json
+import random
+import zipfile
+from pathlib import Path
+from typing import Dict, Iterator, List
+
+
+REGIOES = [
+    {'id': 1, 'sigla': 'N', 'nome': 'Norte'},
+    {'id': 2, 'sigla': 'NE', 'nome': 'Nordeste'},
+    {'id': 3, 'sigla': 'SE', 'nome': 'Sudeste'},
+    {'id': 4, 'sigla': 'S', 'nome': 'Sul'},
+    {'id': 5, 'sigla': 'CO', 'nome': 'Centro-Oeste'},
+]
+
+# (id, sigla, nome, região)
+UFS = [
+    (11, 'RO', 'Rondônia', 1), (12, 'AC', 'Acre', 1), (13, 'AM', 'Amazonas', 1),
+    (14, 'RR', 'Roraima', 1), (15, 'PA', 'Pará', 1), (16, 'AP', 'Amapá', 1),
+    (17, 'TO', 'Tocantins', 1), (21, 'MA', 'Maranhão', 2), (22, 'PI', 'Piauí', 2),
+    (23, 'CE', 'Ceará', 2), (24, 'RN', 'Rio Grande do Norte', 2), (25, 'PB', 'Paraíba', 2),
+    (26, 'PE', 'Pernambuco', 2), (27, 'AL', 'Alagoas', 2), (28, 'SE', 'Sergipe', 2),
+    (29, 'BA', 'Bahia', 2), (31, 'MG', 'Minas Gerais', 3), (32, 'ES', 'Espírito Santo', 3),
+    (33, 'RJ', 'Rio de Janeiro', 3), (35, 'SP', 'São Paulo', 3), (41, 'PR', 'Paraná', 4),
+    (42, 'SC', 'Santa Catarina', 4), (43, 'RS', 'Rio Grande do Sul', 4),
+    (50, 'MS', 'Mato Grosso do Sul', 5), (51, 'MT', 'Mato Grosso', 5), (52, 'GO', 'Goiás', 5),
+    (53, 'DF', 'Distrito Federal', 5),
+]
+
+# Quantidades da divisão territorial real (escala 1x)
+MUNICIPIOS = 5570
+DISTRITOS = 10670
+MESORREGIOES = 137
+MICRORREGIOES = 558
+REGIOES_INTERMEDIARIAS = 133
+REGIOES_IMEDIATAS = 510
+
+PREFIXOS = ['São', 'Santa', 'Santo', 'Nova', 'Vila', 'Porto', 'Campo', 'Serra', 'Rio', 'Bom Jesus do', 'Conceição do']
+NOMES = [
+    'José', 'João', 'Antônio', 'Francisco', 'Luís', 'Sebastião', 'Maria', 'Bárbara', 'Cecília',
+    'Paraná', 'Itaúna', 'Araçá', 'Jacaré', 'Tucumã', 'Ipê', 'Aurora', 'Esperança', 'Alegre',
+    'Verde', 'Grande', 'Açu', 'Mirim', 'Formoso', 'Bonito', 'Belo', 'União', 'Paraíso',
+]
+
+
+def _nome(rng: random.Random, numero: int) -> str:
+    return f"{rng.choice(PREFIXOS)} {rng.choice(NOMES)} {numero}"
+
+
+def _split(total: int, parts: int) -> List[int]:
+    """Divide ``total`` em ``parts`` quantidades quase iguais (mínimo 1)"""
+    base, rest = divmod(total, parts)
+    return [max(base + (1 if i < rest else 0), 1) for i in range(parts)]
+
+
+def ibge_payloads(scale: int = 1, seed: int = 42) -> Dict[str, List[Dict]]:
+    """Respostas de /estados, /municipios e /distritos no formato da API do IBGE"""
+    rng = random.Random(seed)
+    regioes = {r['id']: r for r in REGIOES}
+    estados = []
+    ufs = []
+    for uf_id, sigla, nome, regiao_id in UFS:
+        uf = {'id': uf_id, 'sigla': sigla, 'nome': nome, 'regiao': regioes[regiao_id]}
+        ufs.append(uf)
+        estados.append(uf)
+
+    municipios = []
+    distritos = []
+    per_uf = zip(
+        ufs,
+        _split(MESORREGIOES, len(ufs)),
+        _split(MICRORREGIOES, len(ufs)),
+        _split(REGIOES_INTERMEDIARIAS, len(ufs)),
+        _split(REGIOES_IMEDIATAS, len(ufs)),
+        _split(MUNICIPIOS * scale, len(ufs)),
+    )
+    distritos_per_municipio = DISTRITOS / MUNICIPIOS
+
+    for uf, n_meso, n_micro, n_rin, n_rim, n_municipios in per_uf:
+        mesos = [
+            {'id': uf['id'] * 100 + i + 1, 'nome': f"Mesorregião {_nome(rng, i + 1)}", 'UF': uf}
+            for i in range(n_meso)
+        ]
+        micros = [
+            {'id': uf['id'] * 1000 + i + 1, 'nome': f"Microrregião {_nome(rng, i + 1)}", 'mesorregiao': mesos[i % n_meso]}
+            for i in range(n_micro)
+        ]
+        rins = [
+            {'id': uf['id'] * 100 + i + 1, 'nome': _nome(rng, i + 1), 'UF': uf}
+            for i in range(n_rin)
+        ]
+        rims = [
+            {'id': uf['id'] * 10000 + i + 1, 'nome': _nome(rng, i + 1), 'regiao-intermediaria': rins[i % n_rin]}
+            for i in range(n_rim)
+        ]
+
+        for i in range(n_municipios):
+            municipio = {
+                'id': uf['id'] * 100000 + i + 1,
+                'nome': _nome(rng, i + 1),
+                'microrregiao': micros[i % n_micro],
+                'regiao-imediata': rims[i % n_rim],
+            }
+            municipios.append(municipio)
+
+            # Em média ~1,9 distritos por município, como na base real
+            count = int(distritos_per_municipio) + (1 if rng.random() < distritos_per_municipio % 1 else 0)
+            for k in range(count):
+                distritos.append({
+                    'id': municipio['id'] * 100 + k + 5,
+                    'nome': municipio['nome'] if k == 0 else _nome(rng, k),
+                    'municipio': municipio,
+                })
+
+    return {'estados': estados, 'municipios': municipios, 'distritos': distritos}
+
+
+def write_ibge_payloads(directory, scale: int = 1, seed: int = 42) -> Dict[str, int]:
+    """Grava ``<endpoint>.json`` no diretório e retorna a quantidade de cada um"""
+    directory = Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+    counts = {}
+    for endpoint, payload in ibge_payloads(scale, seed).items():
+        with open(directory / f"{endpoint}.json", 'w', encoding='utf-8') as f:
+            json.dump(payload, f, ensure_ascii=False)
+        counts[endpoint] = len(payload)
+    return counts
+
+
+PALAVRAS_EMPRESA = [
+    'COMERCIO', 'SERVICOS', 'INDUSTRIA', 'TRANSPORTES', 'CONSTRUTORA', 'ALIMENTOS', 'TECNOLOGIA',
+    'MATERIAIS', 'DISTRIBUIDORA', 'CONSULTORIA', 'AGROPECUARIA', 'EDITORA', 'FARMACIA', 'AUTO PECAS',
+]
+SUFIXOS_EMPRESA = ['LTDA', 'EIRELI', 'S.A.', 'ME', 'EPP']
+
+
+def empresas_rows(rows: int, seed: int = 42) -> Iterator[List[str]]:
+    """Linhas no layout do arquivo EMPRECSV da Receita"""
+    rng = random.Random(seed)
+    for cnpj in range(1, rows + 1):
+        nome = f"{rng.choice(PALAVRAS_EMPRESA)} {rng.choice(PALAVRAS_EMPRESA)} {cnpj} {rng.choice(SUFIXOS_EMPRESA)}"
+        capital = rng.choice((0, 1000, 5000, 10000, 50000, 100000, 1000000))
+        yield [
+            f"{cnpj:08d}",
+            nome,
+            str(rng.choice((2062, 2135, 2305, 2240, 4014))),
+            str(rng.choice((49, 50, 65, 16))),
+            f"{capital},00",
+            f"{rng.choice((1, 3, 5)):02d}",
+            '',
+        ]
+
+
+def write_empresas_archive(path, rows: int, seed: int = 42, members: int = 1) -> int:
+    """
+    Gera o zip da Receita com ``rows`` empresas em ``members`` arquivos CSV
+
+    Escreve em streaming (zip64, latin-1, ``;`` e campos entre aspas, como
+    o arquivo original). Retorna o tamanho do zip em bytes.
+    """
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    rows_iter = empresas_rows(rows, seed)
+    per_member = _split(rows, members)
+
+    with zipfile.ZipFile(path, 'w', compression=zipfile.ZIP_DEFLATED, compresslevel=6) as archive:
+        for index, count in enumerate(per_member):
+            name = f"K3241.K03200Y{index}.D50809.EMPRECSV"
+            with archive.open(name, 'w', force_zip64=True) as member:
+                text = io.TextIOWrapper(member, encoding='latin-1', newline='')
+                writer = csv.writer(text, delimiter=';', quoting=csv.QUOTE_ALL)
+                for _ in range(count):
+                    row = next(rows_iter, None)
+                    if row is None:
+                        break
+                    writer.writerow(row)
+                text.flush()
+                text.detach()
+
+    return path.stat().st_size
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m benchmarks.generators')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    ibge_parser = subparsers.add_parser('ibge', help='Respostas da API de localidades')
+    ibge_parser.add_argument('directory')
+    ibge_parser.add_argument('--scale', type=int, default=1, choices=(1, 10, 100))
+    ibge_parser.add_argument('--seed', type=int, default=42)
+
+    empresas_parser = subparsers.add_parser('empresas', help='Zip de empresas da Receita')
+    empresas_parser.add_argument('path')
+    empresas_parser.add_argument('--rows', type=int, default=1_000_000)
+    empresas_parser.add_argument('--members', type=int, default=1)
+    empresas_parser.add_argument('--seed', type=int, default=42)
+
+    args = parser.parse_args(argv)
+    if args.command == 'ibge':
+        counts = write_ibge_payloads(args.directory, args.scale, args.seed)
+        print(f"Gerado em {args.directory}: {counts}")
+    else:
+        size = write_empresas_archive(args.path, args.rows, args.seed, args.members)
+        print(f"Gerado {args.path}: {args.rows} empresas, {size / 1024 / 1024:.1f} MB")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,521 @@
+"""
+Teste de carga da aplicação web
+
+Usuários virtuais (asyncio, uma conexão keep-alive cada) fazem login pela
+tela de login e repetem uma mistura ponderada de requisições: listagens,
+filtros, paginação profunda e APIs. No fim mostra, por endpoint, vazão e
+latências p50/p95/p99 e grava o resultado em
+``benchmarks/results/load-<commit>-<data>.json``.
+
+Contra um servidor já no ar:
+
+    python -m benchmarks.load --url http://127.0.0.1:8000 --users 50 --duration 60
+
+Subindo o gunicorn localmente, com uma rodada para cada número de workers
+(usa o banco configurado; ``--seed`` importa antes os dados sintéticos):
+
+    python -m benchmarks.load --start --workers 1,2,4,8 --users 64 --seed 1
+
+Comparando, com os mesmos workers e muitos clientes simultâneos, os
+workers síncronos do WSGI com os workers do uvicorn (ASGI, views
+assíncronas):
+
+    python -m benchmarks.load --start --server wsgi,asgi --workers 2 --users 200
+
+Com ``--rate`` a carga é em malha aberta (requisições por segundo no total)
+e a latência conta a partir do horário planejado, então uma fila no
+servidor aparece nos percentis em vez de simplesmente reduzir a carga.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import re
+import signal
+import subprocess
+import sys
+import time
+from http.cookies import SimpleCookie
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+from urllib.parse import urlencode, urlsplit
+from benchmarks import import_synthetic_data, setup_django
+from benchmarks.generators import NOMES, PREFIXOS, UFS
+
+
+RESULTS_DIR = Path(__file__).resolve().parent / 'results'
+
+REGIOES = ['Norte', 'Nordeste', 'Sudeste', 'Sul', 'Centro-Oeste']
+SIGLAS = [sigla for _, sigla, _, _ in UFS]
+PALAVRAS_EMPRESA = ['COMERCIO', 'SERVICOS', 'INDUSTRIA', 'TRANSPORTES', 'ALIMENTOS']
+
+REQUEST_TIMEOUT = 60.0
+
+
+def _pick(rng: random.Random, values):
+    return rng.choice(values)
+
+
+def _nome(rng: random.Random) -> str:
+    return f"{_pick(rng, PREFIXOS)} {_pick(rng, NOMES)}".lower()
+
+
+# Mistura de requisições: nome -> (peso, gerador de (método, caminho, corpo JSON))
+Scenario = Callable[[random.Random, Dict], Tuple[str, str, Optional[Dict]]]
+
+MIX: Dict[str, Tuple[int, Scenario]] = {
+    'estados': (5, lambda rng, ctx: ('GET', '/estados/', None)),
+    'estados?regiao': (3, lambda rng, ctx: ('GET', '/estados/?' + urlencode({'regiao': _pick(rng, REGIOES)}), None)),
+    'municipios': (6, lambda rng, ctx: ('GET', '/municipios/', None)),
+    'municipios?uf': (8, lambda rng, ctx: ('GET', '/municipios/?' + urlencode({'uf': _pick(rng, SIGLAS)}), None)),
+    'municipios?nome': (6, lambda rng, ctx: ('GET', '/municipios/?' + urlencode({'nome': _nome(rng)}), None)),
+    'municipios?page=profunda': (
+        3, lambda rng, ctx: ('GET', f"/municipios/?page={rng.randint(50, 400)}", None)
+    ),
+    'distritos?uf': (6, lambda rng, ctx: ('GET', '/distritos/?' + urlencode({'uf': _pick(rng, SIGLAS)}), None)),
+    'distritos?regiao&nome': (
+        4, lambda rng, ctx: ('GET', '/distritos/?' + urlencode({'regiao': _pick(rng, REGIOES), 'nome': _nome(rng)}), None)
+    ),
+    'distritos?page=profunda': (
+        3, lambda rng, ctx: ('GET', f"/distritos/?page={rng.randint(100, 800)}", None)
+    ),
+    'empresas': (4, lambda rng, ctx: ('GET', '/empresas/', None)),
+    'empresas?rasao_social': (
+        3, lambda rng, ctx: ('GET', '/empresas/?' + urlencode({'rasao_social': _pick(rng, PALAVRAS_EMPRESA)}), None)
+    ),
+    'empresas?cursor=last': (1, lambda rng, ctx: ('GET', '/empresas/?cursor=last', None)),
+    'api/busca': (8, lambda rng, ctx: ('GET', '/api/busca/?' + urlencode({'q': _nome(rng)}), None)),
+    'api/v1/localidades/estados/{uf}/municipios': (
+        4, lambda rng, ctx: ('GET', f"/api/v1/localidades/estados/{_pick(rng, SIGLAS)}/municipios", None)
+    ),
+    'api/v1/localidades/municipios': (1, lambda rng, ctx: ('GET', '/api/v1/localidades/municipios', None)),
+    'api/resolver': (
+        2, lambda rng, ctx: ('POST', '/api/resolver/', {'codigos': rng.sample(ctx['codigos'], min(100, len(ctx['codigos'])))})
+    ),
+}
+
+
+class HTTPError(Exception):
+    pass
+
+
+class Connection:
+    """Cliente HTTP/1.1 mínimo sobre asyncio, com keep-alive e cookies"""
+
+    def __init__(self, host: str, port: int):
+        self.host = host
+        self.port = port
+        self.cookies: Dict[str, str] = {}
+        self._reader: Optional[asyncio.StreamReader] = None
+        self._writer: Optional[asyncio.StreamWriter] = None
+
+    async def close(self):
+        if self._writer is not None:
+            self._writer.close()
+            try:
+                await self._writer.wait_closed()
+            except OSError:
+                pass
+            self._reader = self._writer = None
+
+    async def request(self, method: str, path: str, body: bytes = b'', headers: Optional[Dict] = None):
+        """Envia a requisição e devolve (status, cabeçalhos, corpo); reconecta uma vez se preciso"""
+        for attempt in (1, 2):
+            if self._writer is None:
+                self._reader, self._writer = await asyncio.open_connection(self.host, self.port)
+            try:
+                return await asyncio.wait_for(self._exchange(method, path, body, headers or {}), REQUEST_TIMEOUT)
+            except (ConnectionError, asyncio.IncompleteReadError):
+                # Conexão keep-alive fechada pelo servidor entre requisições
+                await self.close()
+                if attempt == 2:
+                    raise
+
+    async def _exchange(self, method, path, body, headers):
+        lines = [f"{method} {path} HTTP/1.1", f"Host: {self.host}:{self.port}", "Accept-Encoding: identity"]
+        if self.cookies:
+            lines.append("Cookie: " + '; '.join(f"{k}={v}" for k, v in self.cookies.items()))
+        if body or method == 'POST':
+            lines.append(f"Content-Length: {len(body)}")
+        lines.extend(f"{k}: {v}" for k, v in headers.items())
+        self._writer.write(('\r\n'.join(lines) + '\r\n\r\n').encode('latin-1') + body)
+        await self._writer.drain()
+
+        status_line = await self._reader.readuntil(b'\r\n')
+        if not status_line:
+            raise ConnectionError('conexão fechada')
+        status = int(status_line.split()[1])
+        response_headers: Dict[str, str] = {}
+        while True:
+            line = (await self._reader.readuntil(b'\r\n')).decode('latin-1').rstrip('\r\n')
+            if not line:
+                break
+            name, _, value = line.partition(':')
+            name = name.strip().lower()
+            if name == 'set-cookie':
+                cookie = SimpleCookie()
+                cookie.load(value.strip())
+                for key, morsel in cookie.items():
+                    if morsel['max-age'] == '0' or morsel.value == '':
+                        self.cookies.pop(key, None)
+                    else:
+                        self.cookies[key] = morsel.value
+            response_headers[name] = value.strip()
+
+        if response_headers.get('transfer-encoding', '').lower() == 'chunked':
+            content = bytearray()
+            while True:
+                size = int((await self._reader.readuntil(b'\r\n')).split(b';')[0], 16)
+                if size == 0:
+                    await self._reader.readuntil(b'\r\n')
+                    break
+                content += await self._reader.readexactly(size)
+                await self._reader.readexactly(2)
+            content = bytes(content)
+        elif 'content-length' in response_headers:
+            content = await self._reader.readexactly(int(response_headers['content-length']))
+        elif status in (204, 304) or method == 'HEAD':
+            content = b''
+        else:
+            content = await self._reader.read()
+            await self.close()
+            return status, response_headers, content
+
+        if response_headers.get('connection', '').lower() == 'close':
+            await self.close()
+        return status, response_headers, content
+
+
+async def login(connection: Connection, username: str, password: str):
+    """Login pela view custom_auth.views.login, como um navegador"""
+    status, _, content = await connection.request('GET', '/login/')
+    match = re.search(rb'name="csrfmiddlewaretoken" value="([^"]+)"', content)
+    if status != 200 or not match:
+        raise HTTPError(f"GET /login/ devolveu {status} sem token CSRF")
+    body = urlencode({
+        'csrfmiddlewaretoken': match.group(1).decode(),
+        'username': username,
+        'password': password,
+    }).encode()
+    status, headers, _ = await connection.request(
+        'POST', '/login/', body, {'Content-Type': 'application/x-www-form-urlencoded'}
+    )
+    if status != 302 or 'sessionid' not in connection.cookies:
+        raise HTTPError(f"login de {username} falhou (status {status})")
+
+
+class Recorder:
+    """Latências e erros por endpoint, descartando o aquecimento"""
+
+    def __init__(self, warmup_until: float):
+        self.warmup_until = warmup_until
+        self.latencies: Dict[str, List[float]] = {}
+        self.errors: Dict[str, int] = {}
+        self.statuses: Dict[str, Dict[int, int]] = {}
+
+    def record(self, name: str, started: float, latency: float, status: Optional[int]):
+        if started < self.warmup_until:
+            return
+        self.latencies.setdefault(name, []).append(latency)
+        statuses = self.statuses.setdefault(name, {})
+        statuses[status or 0] = statuses.get(status or 0, 0) + 1
+        if status is None or status >= 400:
+            self.errors[name] = self.errors.get(name, 0) + 1
+
+
+def _percentile(values: List[float], fraction: float) -> float:
+    """Percentil pelo posto mais próximo (lista já ordenada)"""
+    index = max(int(round(fraction * len(values) + 0.5)) - 1, 0)
+    return values[min(index, len(values) - 1)]
+
+
+def summarize(recorder: Recorder, seconds: float) -> Dict[str, Dict]:
+    summary = {}
+    everything: List[float] = []
+    for name, latencies in sorted(recorder.latencies.items()):
+        latencies.sort()
+        everything.extend(latencies)
+        summary[name] = _stats(latencies, seconds, recorder.errors.get(name, 0))
+        summary[name]['statuses'] = {str(k): v for k, v in sorted(recorder.statuses[name].items())}
+    everything.sort()
+    if everything:
+        summary['TOTAL'] = _stats(everything, seconds, sum(recorder.errors.values()))
+    return summary
+
+
+def _stats(latencies: List[float], seconds: float, errors: int) -> Dict:
+    return {
+        'requests': len(latencies),
+        'errors': errors,
+        'rps': round(len(latencies) / seconds, 1),
+        'mean_ms': round(sum(latencies) / len(latencies) * 1000, 1),
+        'p50_ms': round(_percentile(latencies, 0.50) * 1000, 1),
+        'p95_ms': round(_percentile(latencies, 0.95) * 1000, 1),
+        'p99_ms': round(_percentile(latencies, 0.99) * 1000, 1),
+        'max_ms': round(latencies[-1] * 1000, 1),
+    }
+
+
+async def virtual_user(index: int, connection: Connection, args, context: Dict, mix, recorder: Recorder, deadline: float):
+    rng = random.Random(args.seed_random + index)
+    try:
+        names = [name for name, _ in mix]
+        weights = [weight for _, (weight, _) in mix]
+        scenarios = dict((name, scenario) for name, (_, scenario) in mix)
+
+        interval = args.users / args.rate if args.rate else 0
+        # Espalha o início dos usuários dentro do primeiro intervalo
+        planned = time.perf_counter() + (rng.random() * interval if interval else 0)
+
+        while True:
+            if interval:
+                now = time.perf_counter()
+                if planned > now:
+                    await asyncio.sleep(planned - now)
+                started = planned
+                planned += interval
+            else:
+                started = time.perf_counter()
+            if started >= deadline:
+                break
+
+            name = rng.choices(names, weights)[0]
+            method, path, payload = scenarios[name](rng, context)
+            body, headers = b'', {}
+            if payload is not None:
+                body = json.dumps(payload).encode()
+                headers = {'Content-Type': 'application/json', 'X-CSRFToken': connection.cookies.get('csrftoken', '')}
+
+            status = None
+            try:
+                status, _, _ = await connection.request(method, path, body, headers)
+            except (OSError, asyncio.TimeoutError, asyncio.IncompleteReadError, ValueError):
+                await connection.close()
+            recorder.record(name, started, time.perf_counter() - started, status)
+
+            if args.think and not interval:
+                await asyncio.sleep(rng.expovariate(1000 / args.think))
+    finally:
+        await connection.close()
+
+
+async def _sample_codigos(host: str, port: int, username: str, password: str) -> List[int]:
+    """Códigos de municípios para a API de resolução, tirados da API espelho"""
+    connection = Connection(host, port)
+    try:
+        await login(connection, username, password)
+        status, _, content = await connection.request('GET', '/api/v1/localidades/municipios')
+        if status != 200:
+            return []
+        return [item['id'] for item in json.loads(content)][:5000]
+    finally:
+        await connection.close()
+
+
+async def run_load(args, url: str) -> Dict:
+    parts = urlsplit(url)
+    host, port = parts.hostname, parts.port or 80
+
+    mix = [(name, entry) for name, entry in MIX.items() if not args.only or name in args.only]
+    codigos = await _sample_codigos(host, port, args.username, args.password)
+    if not codigos:
+        mix = [(name, entry) for name, entry in mix if name != 'api/resolver']
+    context = {'host': host, 'port': port, 'codigos': codigos}
+
+    # Todos fazem login antes de o relógio começar (o hash da senha é caro)
+    connections = [Connection(host, port) for _ in range(args.users)]
+    await asyncio.gather(*(login(c, args.username, args.password) for c in connections))
+
+    start = time.perf_counter()
+    recorder = Recorder(start + args.warmup)
+    deadline = start + args.warmup + args.duration
+    users = [
+        asyncio.create_task(virtual_user(i, connection, args, context, mix, recorder, deadline))
+        for i, connection in enumerate(connections)
+    ]
+    results = await asyncio.gather(*users, return_exceptions=True)
+    failures = [r for r in results if isinstance(r, Exception)]
+    if failures and len(failures) == len(results):
+        raise failures[0]
+    measured = max(time.perf_counter() - (start + args.warmup), 1e-9)
+    # Vazão real: requisições concluídas pelo tempo até a última terminar
+    summary = summarize(recorder, measured)
+    if failures:
+        print(f"  {len(failures)} de {len(results)} usuários pararam: {failures[0]!r}")
+        summary.setdefault('TOTAL', {})['failed_users'] = len(failures)
+    return summary
+
+
+def print_summary(summary: Dict):
+    header = f"{'endpoint':<45} {'req':>7} {'err':>5} {'req/s':>8} {'p50':>8} {'p95':>8} {'p99':>8} {'máx':>8}"
+    print(header)
+    print('-' * len(header))
+    for name, stats in summary.items():
+        if 'requests' not in stats:
+            continue
+        print(
+            f"{name:<45} {stats['requests']:>7} {stats['errors']:>5} {stats['rps']:>8} "
+            f"{stats['p50_ms']:>8} {stats['p95_ms']:>8} {stats['p99_ms']:>8} {stats['max_ms']:>8}"
+        )
+
+
+def seed_database(scale: int, empresas_rows: int, username: str, password: str):
+    """Importa os dados sintéticos no banco configurado e cria o usuário do teste"""
+    import_synthetic_data(scale, empresas_rows)
+    ensure_user(username, password)
+
+
+def ensure_user(username: str, password: str):
+    from django.contrib.auth import get_user_model
+
+    user, _ = get_user_model().objects.get_or_create(username=username)
+    user.set_password(password)
+    user.save()
+
+
+def _wait_until_up(url: str, process: subprocess.Popen, timeout: float = 60.0):
+    parts = urlsplit(url)
+
+    async def probe():
+        connection = Connection(parts.hostname, parts.port)
+        try:
+            status, _, _ = await connection.request('GET', '/login/')
+            return status == 200
+        finally:
+            await connection.close()
+
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"gunicorn saiu com código {process.returncode}")
+        try:
+            if asyncio.run(probe()):
+                return
+        except OSError:
+            pass
+        time.sleep(0.5)
+    raise RuntimeError(f"servidor não respondeu em {timeout:.0f} s")
+
+
+def start_server(workers: int, threads: int, port: int, server: str = 'wsgi') -> subprocess.Popen:
+    """
+    Sobe o gunicorn do projeto (com o gunicorn.conf.py) na porta pedida
+
+    :param server: wsgi (workers síncronos) ou asgi (workers do uvicorn)
+    """
+    root = Path(__file__).resolve().parent.parent
+    command = [
+        sys.executable, '-m', 'gunicorn',
+        '--bind', f'127.0.0.1:{port}', '--workers', str(workers), '--threads', str(threads),
+        '--log-level', 'warning',
+    ]
+    env = dict(os.environ, GUNICORN_ASGI='1' if server == 'asgi' else '0')
+    return subprocess.Popen(command, cwd=root, env=env, start_new_session=True)
+
+
+def stop_server(process: subprocess.Popen):
+    try:
+        os.killpg(process.pid, signal.SIGTERM)
+        process.wait(timeout=30)
+    except (ProcessLookupError, subprocess.TimeoutExpired):
+        os.killpg(process.pid, signal.SIGKILL)
+
+
+def _git_commit() -> str:
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m benchmarks.load')
+    target = parser.add_mutually_exclusive_group(required=True)
+    target.add_argument('--url', help='Servidor já no ar (ex: http://127.0.0.1:8000)')
+    target.add_argument('--start', action='store_true', help='Sobe o gunicorn localmente')
+    parser.add_argument('--workers', default='2', help='Workers do gunicorn; vários separados por vírgula (com --start)')
+    parser.add_argument('--threads', type=int, default=1, help='Threads por worker WSGI (com --start)')
+    parser.add_argument('--server', default='wsgi',
+                        help='wsgi, asgi ou os dois separados por vírgula, para comparar (com --start)')
+    parser.add_argument('--port', type=int, default=8765, help='Porta do gunicorn (com --start)')
+    parser.add_argument('--users', type=int, default=20, help='Usuários virtuais simultâneos')
+    parser.add_argument('--duration', type=float, default=30, help='Segundos medidos')
+    parser.add_argument('--warmup', type=float, default=5, help='Segundos iniciais descartados')
+    parser.add_argument('--rate', type=float, default=0, help='Requisições por segundo no total (malha aberta)')
+    parser.add_argument('--think', type=float, default=0, help='Pausa média entre requisições, em ms (malha fechada)')
+    parser.add_argument('--only', nargs='*', help=f"Só estes endpoints: {', '.join(MIX)}")
+    parser.add_argument('--username', default='loadtest')
+    parser.add_argument('--password', default='loadtest-senha')
+    parser.add_argument('--create-user', action='store_true', help='Cria (ou redefine a senha do) usuário antes')
+    parser.add_argument('--seed', type=int, choices=(1, 10, 100), help='Importa dados sintéticos nesta escala antes')
+    parser.add_argument('--empresas-rows', type=int, default=0, help='Empresas sintéticas importadas com --seed')
+    parser.add_argument('--seed-random', type=int, default=42, help='Semente da escolha das requisições')
+    parser.add_argument('--label', default='', help='Rótulo gravado no resultado (ex: redis, locmem)')
+    args = parser.parse_args(argv)
+
+    if args.seed or args.create_user:
+        setup_django()
+        if args.seed:
+            seed_database(args.seed, args.empresas_rows, args.username, args.password)
+        else:
+            ensure_user(args.username, args.password)
+
+    servers = args.server.split(',') if args.start else [None]
+    if any(server not in ('wsgi', 'asgi', None) for server in servers):
+        parser.error('--server aceita wsgi e asgi')
+
+    runs = []
+    worker_counts = [int(w) for w in args.workers.split(',')] if args.start else [None]
+    for server, workers in [(server, workers) for server in servers for workers in worker_counts]:
+        process = None
+        url = args.url
+        if args.start:
+            url = f"http://127.0.0.1:{args.port}"
+            print(f"Subindo gunicorn ({server}) com {workers} worker(s)"
+                  + (f" e {args.threads} thread(s)" if server == 'wsgi' else ''))
+            process = start_server(workers, args.threads, args.port, server)
+        try:
+            if process is not None:
+                _wait_until_up(url, process)
+            print(f"Carga em {url}: {args.users} usuários, {args.duration:.0f} s"
+                  + (f", {args.rate} req/s" if args.rate else ''))
+            summary = asyncio.run(run_load(args, url))
+        finally:
+            if process is not None:
+                stop_server(process)
+        print_summary(summary)
+        runs.append({
+            'server': server, 'workers': workers,
+            'threads': args.threads if server == 'wsgi' else None, 'endpoints': summary,
+        })
+
+    result = {
+        'commit': _git_commit(),
+        'timestamp': time.time(),
+        'label': args.label,
+        'url': args.url,
+        'params': {
+            'users': args.users, 'duration': args.duration, 'warmup': args.warmup,
+            'rate': args.rate, 'think_ms': args.think, 'only': args.only,
+        },
+        'runs': runs,
+    }
+    RESULTS_DIR.mkdir(exist_ok=True)
+    output = RESULTS_DIR / f"load-{result['commit']}-{time.strftime('%Y%m%d-%H%M%S')}.json"
+    output.write_text(json.dumps(result, ensure_ascii=False, indent=2), encoding='utf-8')
+    print(f"Resultado gravado em {output}")
+
+    if len(runs) > 1:
+        print("\nservidor  workers  req/s     p50     p95     p99  erros")
+        for run in runs:
+            total = run['endpoints'].get('TOTAL', {})
+            print(f"{run['server'] or '-':>8} {run['workers']:>8} {total.get('rps', 0):>6} {total.get('p50_ms', 0):>7} "
+                  f"{total.get('p95_ms', 0):>7} {total.get('p99_ms', 0):>7} {total.get('errors', 0):>6}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
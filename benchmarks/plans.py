@@ -0,0 +1,431 @@
+"""
+Regressão de planos de execução das listagens e do admin
+
+Cria um banco de teste no PostgreSQL configurado, importa os dados
+sintéticos na escala pedida, roda ``ANALYZE`` e, para cada combinação de
+filtros das listagens (``benchmarks.run.VIEW_CASES``) e de cada changelist
+do admin (sem filtro, busca e as primeiras opções de cada ``list_filter``),
+captura o ``EXPLAIN (FORMAT JSON)`` de cada SELECT executado.
+
+Cada plano é conferido contra as regras:
+
+- nenhum Seq Scan em tabela com mais de ``--max-rows`` linhas (estimadas
+  pelo ``reltuples``), exceto a leitura sem filtro que para no LIMIT
+- nenhuma ordenação de mais de ``--max-rows`` linhas para atender um LIMIT
+  (falta índice na ordem da listagem)
+- custo total de cada query até ``--max-cost``
+- as exigências de ``RULES`` do caso (índices usados, custo, Seq Scan aceito)
+
+Os planos são gravados em ``benchmarks/results/plans-<commit>.json`` e
+comparados com o resultado anterior de mesmos parâmetros (ou
+``--baseline``): cada plano que mudou é mostrado como diff. Sai com código
+1 se alguma regra foi violada (ou, com ``--fail-on-change``, se algum plano
+mudou).
+
+    python -m benchmarks.plans --scale 10 --empresas-rows 200000
+    python -m benchmarks.plans --scale 1 --skip-empresas --only admin:
+"""
+import argparse
+import difflib
+import json
+import math
+import re
+import sys
+import time
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+from urllib.parse import parse_qsl, urlencode
+from benchmarks import import_synthetic_data, setup_django
+from benchmarks.run import DEEP_CURSOR, VIEW_CASES, _git_commit, is_baseline_candidate
+
+
+RESULTS_DIR = Path(__file__).resolve().parent / 'results'
+
+SEQ_SCAN_MAX_ROWS = 10_000
+MAX_COST = 100_000.0
+
+# Termo da busca do admin por app
+SEARCH_TERMS = {'ibge': 'sao', 'empresas': 'COMERCIO'}
+
+# Opções de cada list_filter medidas no admin
+FILTER_CHOICES = 2
+
+# Exigências por caso (nome do caso como aparece na saída):
+#   require_index: trechos de nomes de índice que precisam aparecer no plano
+#   require_index_cond: trechos que precisam aparecer em alguma Index Cond
+#     (a coluna que limita onde a leitura do índice começa)
+#   max_cost: custo máximo de cada query do caso, no lugar de --max-cost
+#   allow_seq_scan: tabelas em que o Seq Scan é aceito no caso
+RULES: Dict[str, Dict] = {
+    'municipios': {'require_index': ['ibge_munlist_nome']},
+    'municipios?uf=SP': {'require_index': ['ibge_munlist_uf_sigla_nome']},
+    'municipios?regiao=Nordeste': {'require_index': ['ibge_munlist_regiao_nome']},
+    'distritos?uf=BA': {'require_index': ['ibge_distritos_uf_id']},
+    'empresas': {'require_index': ['empresas_razao_cnpj_idx']},
+    'empresas?rasao_social=COMERCIO': {'require_index': ['empresas_razao_cnpj_idx']},
+    'empresas?cnpj_basico=12345': {'require_index': ['pkey']},
+    f'empresas?cursor={DEEP_CURSOR}': {
+        'require_index': ['empresas_razao_cnpj_idx'], 'require_index_cond': ['rasao_social >='],
+    },
+    'municipios?nome=sao jose': {'require_index': ['ibge_search_nome']},
+    'admin:empresas.empresa': {'require_index': ['empresas_razao_cnpj_idx']},
+    'admin:empresas.empresa?q=COMERCIO': {'require_index': ['empresas_razao_prefix_idx']},
+    'admin:empresas.empresa?capital_social=1mil-10mil': {'require_index': ['empresas_capital_social_idx']},
+    'admin:ibge.municipio': {'require_index': ['ibge_munici_nome']},
+}
+
+# Queries que não são das listagens (sessão, usuário, permissões)
+IGNORED_TABLES = re.compile(r'"(django_|auth_)')
+
+# Nós que leem a entrada inteira antes de devolver a primeira linha
+BLOCKING_NODES = {'Sort', 'Incremental Sort', 'Aggregate', 'Hash', 'Materialize', 'Gather Merge', 'WindowAgg'}
+
+# Condições mostradas no plano normalizado
+CONDITIONS = (
+    'Index Cond', 'Recheck Cond', 'Filter', 'Join Filter', 'Hash Cond', 'Merge Cond', 'Sort Key', 'Group Key',
+)
+
+
+def view_cases(skip_empresas: bool) -> Iterator[Tuple[str, str, Dict]]:
+    """(nome, URL, parâmetros) de cada combinação de filtros das listagens"""
+    from django.urls import reverse
+
+    for view, cases in VIEW_CASES.items():
+        if view == 'empresas' and skip_empresas:
+            continue
+        for params in cases:
+            yield _label(view, params), reverse(view), params
+
+
+def admin_cases(user, skip_empresas: bool) -> Iterator[Tuple[str, str, Dict]]:
+    """
+    (nome, URL, parâmetros) de cada changelist do admin
+
+    Para cada ModelAdmin de ibge e empresas: sem filtro, com busca (se tem
+    ``search_fields``) e as primeiras ``FILTER_CHOICES`` opções de cada filtro
+    lateral, tiradas do próprio changelist.
+    """
+    from django.contrib import admin
+    from django.test import RequestFactory
+    from django.urls import reverse
+
+    factory = RequestFactory()
+    for model, model_admin in sorted(admin.site._registry.items(), key=lambda item: item[0]._meta.label):
+        meta = model._meta
+        if meta.app_label not in SEARCH_TERMS or (meta.app_label == 'empresas' and skip_empresas):
+            continue
+        url = reverse(f'admin:{meta.app_label}_{meta.model_name}_changelist')
+        name = f'admin:{meta.label_lower}'
+
+        cases = [{}]
+        if model_admin.search_fields:
+            cases.append({'q': SEARCH_TERMS[meta.app_label]})
+
+        request = factory.get(url)
+        request.user = user
+        changelist = model_admin.get_changelist_instance(request)
+        for spec in changelist.filter_specs:
+            choices = [choice for choice in spec.choices(changelist) if not choice['selected']]
+            for choice in choices[:FILTER_CHOICES]:
+                cases.append(dict(parse_qsl(choice['query_string'].lstrip('?'))))
+
+        for params in cases:
+            yield _label(name, params), url, params
+
+
+def _label(name: str, params: Dict) -> str:
+    return f"{name}?{'&'.join(f'{k}={v}' for k, v in params.items())}" if params else name
+
+
+def relation_sizes() -> Dict[str, float]:
+    """Linhas estimadas (reltuples) de cada tabela e view materializada"""
+    from django.db import connection
+
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT relname, reltuples FROM pg_class WHERE relkind IN ('r', 'm')")
+        return {name: max(rows, 0) for name, rows in cursor.fetchall()}
+
+
+def explain(sql: str) -> Dict:
+    from django.db import connection
+
+    with connection.cursor() as cursor:
+        # O SQL capturado já vem com os parâmetros interpolados
+        cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}')
+        plan = cursor.fetchone()[0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return plan[0]['Plan']
+
+
+def capture_selects(client, url: str, params: Dict) -> List[str]:
+    """SELECTs da aplicação executados por uma requisição, sem repetição"""
+    from django.core.cache import caches
+    from django.db import connection
+    from django.test.utils import CaptureQueriesContext
+
+    caches['default'].clear()
+    with CaptureQueriesContext(connection) as captured:
+        response = client.get(url, params)
+    if response.status_code != 200:
+        raise RuntimeError(f"{url}?{urlencode(params)}: status {response.status_code}")
+
+    selects = []
+    for query in captured.captured_queries:
+        sql = query['sql']
+        if sql.lstrip().upper().startswith('SELECT') and not IGNORED_TABLES.search(sql) and sql not in selects:
+            selects.append(sql)
+    return selects
+
+
+def _magnitude(rows: float) -> str:
+    # Só a ordem de grandeza: as estimativas variam a cada ANALYZE
+    return f"~1e{int(math.log10(rows))}" if rows >= 1 else '~0'
+
+
+def render_plan(node: Dict, depth: int = 0) -> List[str]:
+    """Plano em texto, sem custos, com as estimativas de linhas em ordem de grandeza"""
+    parts = [node['Node Type']]
+    if node.get('Join Type'):
+        parts.append(node['Join Type'])
+    if node.get('Index Name'):
+        parts.append(f"using {node['Index Name']}")
+    if node.get('Relation Name'):
+        parts.append(f"on {node['Relation Name']}")
+    parts.append(f"rows{_magnitude(node.get('Plan Rows', 0))}")
+
+    lines = ['  ' * depth + ' '.join(parts)]
+    for key in CONDITIONS:
+        value = node.get(key)
+        if value:
+            if isinstance(value, list):
+                value = ', '.join(value)
+            lines.append('  ' * depth + f"    {key}: {value}")
+    for child in node.get('Plans', []):
+        lines.extend(render_plan(child, depth + 1))
+    return lines
+
+
+def _walk(node: Dict, ancestors: Tuple = ()) -> Iterator[Tuple[Dict, Tuple]]:
+    yield node, ancestors
+    for child in node.get('Plans', []):
+        yield from _walk(child, ancestors + (node,))
+
+
+def _stops_at_limit(ancestors: Tuple) -> bool:
+    """Se o nó alimenta um LIMIT sem nenhum nó que leia a entrada inteira no caminho"""
+    for ancestor in reversed(ancestors):
+        if ancestor['Node Type'] == 'Limit':
+            return True
+        if ancestor['Node Type'] in BLOCKING_NODES:
+            return False
+    return False
+
+
+def _index_names(plan: Dict) -> List[str]:
+    return [node['Index Name'] for node, _ in _walk(plan) if node.get('Index Name')]
+
+
+def _index_conds(plan: Dict) -> List[str]:
+    return [node['Index Cond'] for node, _ in _walk(plan) if node.get('Index Cond')]
+
+
+def check_plan(plan: Dict, sizes: Dict[str, float], rules: Dict, max_rows: int, max_cost: float) -> List[str]:
+    """Regras violadas por um plano"""
+    violations = []
+    allowed = set(rules.get('allow_seq_scan', ()))
+    for node, ancestors in _walk(plan):
+        node_type = node['Node Type']
+        relation = node.get('Relation Name')
+        if node_type == 'Seq Scan' and relation not in allowed:
+            rows = sizes.get(relation, 0)
+            if rows > max_rows and (node.get('Filter') or not _stops_at_limit(ancestors)):
+                violations.append(f"Seq Scan em {relation} ({int(rows)} linhas)")
+        elif node_type == 'Sort' and node.get('Plan Rows', 0) > max_rows and _stops_at_limit(ancestors):
+            violations.append(
+                f"ordenação de ~{int(node['Plan Rows'])} linhas para um LIMIT ({', '.join(node.get('Sort Key', []))})"
+            )
+
+    cost = plan['Total Cost']
+    budget = rules.get('max_cost', max_cost)
+    if cost > budget:
+        violations.append(f"custo {cost:.0f} acima de {budget:.0f}")
+    return violations
+
+
+def check_case(label: str, client, url: str, params: Dict, sizes: Dict, max_rows: int, max_cost: float) -> Dict:
+    rules = RULES.get(label, {})
+    queries = []
+    violations = []
+    indexes = set()
+    conds = []
+    for sql in capture_selects(client, url, params):
+        plan = explain(sql)
+        indexes.update(_index_names(plan))
+        conds.extend(_index_conds(plan))
+        problems = check_plan(plan, sizes, rules, max_rows, max_cost)
+        violations.extend(f"{problem}: {_short_sql(sql)}" for problem in problems)
+        queries.append({'sql': sql, 'cost': plan['Total Cost'], 'plan': '\n'.join(render_plan(plan))})
+
+    for required in rules.get('require_index', ()):
+        if not any(required in name for name in indexes):
+            violations.append(f"nenhuma query usa o índice {required}")
+    for required in rules.get('require_index_cond', ()):
+        if not any(required in cond for cond in conds):
+            violations.append(f"nenhuma Index Cond com {required}")
+    return {'queries': queries, 'violations': violations}
+
+
+def _short_sql(sql: str, size: int = 120) -> str:
+    sql = ' '.join(sql.split())
+    return sql if len(sql) <= size else sql[:size] + '...'
+
+
+def case_text(case: Dict) -> List[str]:
+    """Planos de um caso em texto, para o diff"""
+    lines = []
+    for number, query in enumerate(case['queries'], 1):
+        lines.append(f"-- query {number}: {_short_sql(query['sql'])}")
+        lines.extend(query['plan'].split('\n'))
+    return lines
+
+
+def _load_results(path: Path) -> Optional[Dict]:
+    try:
+        return json.loads(path.read_text(encoding='utf-8'))
+    except (OSError, ValueError):
+        return None
+
+
+def find_baseline(current: Dict, baseline: Optional[str]) -> Optional[Dict]:
+    """Resultado de referência: o commit pedido ou o mais recente com os mesmos parâmetros"""
+    if baseline:
+        return _load_results(RESULTS_DIR / f"plans-{baseline}.json")
+
+    candidates = []
+    for path in RESULTS_DIR.glob('plans-*.json'):
+        result = _load_results(path)
+        if is_baseline_candidate(result, current):
+            candidates.append(result)
+    return max(candidates, key=lambda r: r['timestamp'], default=None)
+
+
+def diff_plans(current: Dict, baseline: Dict) -> List[str]:
+    """Diff unificado dos casos cujo plano mudou"""
+    output = []
+    for label, case in current['cases'].items():
+        previous = baseline['cases'].get(label)
+        if previous is None:
+            continue
+        diff = list(difflib.unified_diff(
+            case_text(previous), case_text(case),
+            fromfile=f"{label} ({baseline['commit']})", tofile=f"{label} ({current['commit']})", lineterm='',
+        ))
+        output.extend(diff)
+    return output
+
+
+def _has_data() -> bool:
+    from ibge.models import Municipio
+
+    return Municipio.objects.exists()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m benchmarks.plans')
+    parser.add_argument('--scale', type=int, default=1, choices=(1, 10, 100))
+    parser.add_argument('--empresas-rows', type=int, default=200_000)
+    parser.add_argument('--skip-empresas', action='store_true')
+    parser.add_argument('--max-rows', type=int, default=SEQ_SCAN_MAX_ROWS,
+                        help=f'Maior tabela em que Seq Scan é aceito (padrão {SEQ_SCAN_MAX_ROWS})')
+    parser.add_argument('--max-cost', type=float, default=MAX_COST,
+                        help=f'Custo máximo de cada query (padrão {MAX_COST:.0f})')
+    parser.add_argument('--only', help='Só os casos cujo nome começa com este prefixo')
+    parser.add_argument('--baseline', help='Commit de referência (padrão: último resultado com os mesmos parâmetros)')
+    parser.add_argument('--fail-on-change', action='store_true', help='Sai com código 1 também se algum plano mudou')
+    parser.add_argument('--keepdb', action='store_true', help='Reaproveita o banco de teste')
+    args = parser.parse_args(argv)
+
+    setup_django()
+
+    from django.contrib.auth import get_user_model
+    from django.db import connection
+    from django.test import Client
+    from django.test.utils import override_settings
+
+    params = {
+        'scale': args.scale,
+        'empresas_rows': None if args.skip_empresas else args.empresas_rows,
+    }
+
+    # Cache só em memória: não toca no cache da aplicação e é limpo a cada caso
+    caches = {
+        'default': {
+            'BACKEND': 'djangoibge.cache.TieredCache',
+            'LOCATION': 'plans',
+            'OPTIONS': {'SHARED': 'shared'},
+        },
+        'shared': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'plans'},
+    }
+
+    old_name = connection.settings_dict['NAME']
+    connection.creation.create_test_db(verbosity=0, autoclobber=True, keepdb=args.keepdb, serialize=False)
+    cases = {}
+    try:
+        with override_settings(CACHES=caches, HTTP_TRANSPORT='live', ALLOWED_HOSTS=['testserver']):
+            if not args.keepdb or not _has_data():
+                import_synthetic_data(args.scale, 0 if args.skip_empresas else args.empresas_rows)
+            with connection.cursor() as cursor:
+                cursor.execute('ANALYZE')
+            sizes = relation_sizes()
+
+            user, _ = get_user_model().objects.get_or_create(
+                username='plans', defaults={'is_staff': True, 'is_superuser': True},
+            )
+            client = Client()
+            client.force_login(user)
+
+            all_cases = list(view_cases(args.skip_empresas)) + list(admin_cases(user, args.skip_empresas))
+            for label, url, case_params in all_cases:
+                if args.only and not label.startswith(args.only):
+                    continue
+                case = check_case(label, client, url, case_params, sizes, args.max_rows, args.max_cost)
+                cases[label] = case
+                status = f"{len(case['violations'])} violações" if case['violations'] else 'ok'
+                print(f"  {label}: {len(case['queries'])} queries, {status}")
+                for violation in case['violations']:
+                    print(f"    {violation}")
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0, keepdb=args.keepdb)
+
+    result = {
+        'commit': _git_commit(),
+        'timestamp': time.time(),
+        'params': params,
+        'cases': cases,
+    }
+    RESULTS_DIR.mkdir(exist_ok=True)
+    output = RESULTS_DIR / f"plans-{result['commit']}.json"
+    output.write_text(json.dumps(result, ensure_ascii=False, indent=2), encoding='utf-8')
+    print(f"Planos gravados em {output}")
+
+    violations = sum(len(case['violations']) for case in cases.values())
+    changed = False
+    baseline = find_baseline(result, args.baseline)
+    if baseline is None:
+        print("Sem resultado anterior para comparar")
+    else:
+        diff = diff_plans(result, baseline)
+        changed = bool(diff)
+        print(f"Comparado com {baseline['commit']}:")
+        for line in diff:
+            print(f"  {line}")
+        if not diff:
+            print("  nenhum plano mudou")
+
+    print(f"{len(cases)} casos, {violations} violações")
+    return 1 if violations or (changed and args.fail_on_change) else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,347 @@
+"""
+Suíte de benchmarks das importações e das listagens
+
+Cria um banco de teste no PostgreSQL configurado, gera os dados sintéticos
+(benchmarks.generators), serve-os pelo servidor local de
+djangoibge.transport e mede:
+
+- importação de estados, municípios, distritos e empresas: tempo, linhas
+  por segundo, queries, tempo em SQL e pico de RSS durante a importação,
+  pelas fases do MemoryTracker
+- listagens para cada combinação de filtros: latência da primeira
+  requisição (cache vazio) e mediana das seguintes, e queries de cada uma
+
+O resultado é gravado em ``benchmarks/results/<commit>.json`` e comparado
+com o resultado anterior de mesmos parâmetros (ou ``--baseline``); métricas
+que pioram além da tolerância são marcadas e o comando sai com código 1.
+
+    python -m benchmarks.run --scale 1 --empresas-rows 1000000
+    python -m benchmarks.run --scale 10 --skip-empresas --baseline a1b2c3d
+"""
+import argparse
+import base64
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, List, Optional
+from benchmarks import setup_django
+
+
+RESULTS_DIR = Path(__file__).resolve().parent / 'results'
+
+# Cursor da listagem de empresas a partir de (razão social 'M', CNPJ 0): uma
+# página no meio da tabela, que deve custar o mesmo que a primeira
+DEEP_CURSOR = 'n' + base64.urlsafe_b64encode(json.dumps(['M', 0]).encode('utf-8')).decode('ascii').rstrip('=')
+
+# Combinações de filtros medidas em cada listagem
+VIEW_CASES = {
+    'estados': [{}, {'regiao': 'Sudeste'}, {'nome': 'São'}, {'sigla': 'SP'}, {'page': '2'}],
+    'municipios': [
+        {}, {'uf': 'SP'}, {'regiao': 'Nordeste'}, {'nome': 'sao jose'}, {'uf': 'MG', 'nome': 'santa'},
+        {'regiao': 'Sul', 'uf': 'RS'}, {'page': '50'},
+    ],
+    'distritos': [
+        {}, {'uf': 'BA'}, {'regiao': 'Norte'}, {'municipio': 'Vila'}, {'nome': 'porto'}, {'page': '100'},
+    ],
+    'empresas': [
+        {}, {'porte': '5'}, {'rasao_social': 'COMERCIO'}, {'cnpj_basico': '12345'}, {'cursor': DEEP_CURSOR},
+    ],
+}
+
+WARM_REPEAT = 20
+
+# Métricas em que um valor maior é melhor; nas demais, menor é melhor
+HIGHER_IS_BETTER = ('rows_per_second',)
+
+# Métricas comparadas entre execuções
+COMPARED = ('seconds', 'rows_per_second', 'queries', 'peak_rss_mb', 'cold_ms', 'warm_ms', 'cold_queries')
+
+
+def _phases_peak_rss_mb(result: Optional[Dict]) -> Optional[float]:
+    """
+    Maior RSS medido nas fases de uma importação
+
+    O ``ru_maxrss`` do processo só cresce, então depois de uma importação
+    grande todas as seguintes herdariam o pico dela; as fases do
+    MemoryTracker medem o RSS só enquanto cada importação roda.
+    """
+    phases = ((result or {}).get('memory') or {}).get('phases') or []
+    return max((phase['rss_max_mb'] for phase in phases), default=None)
+
+
+class QueryCounter:
+    """Conta queries e tempo em SQL via execute_wrapper, sem guardar o SQL"""
+
+    def __init__(self):
+        self.queries = 0
+        self.seconds = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.seconds += time.perf_counter() - start
+            self.queries += 1
+
+
+@contextmanager
+def count_queries():
+    from django.db import connection
+
+    counter = QueryCounter()
+    with connection.execute_wrapper(counter):
+        yield counter
+
+
+def _git_commit() -> str:
+    try:
+        commit = subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True
+        ).stdout.strip()
+        dirty = subprocess.run(
+            ['git', 'status', '--porcelain', '--untracked-files=no'], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+    return f"{commit}-dirty" if dirty else commit
+
+
+def bench_imports(skip_empresas: bool) -> Dict[str, Dict]:
+    """Roda as importações na ordem da aplicação e mede cada uma"""
+    from empresas.models import Empresa
+    from empresas.services import EmpresasService
+    from ibge.models import Distrito, Estado, Municipio
+    from ibge.services import DistritoImportService, EstadoImportService, MunicipioImportService
+
+    steps = [
+        ('estados', lambda: EstadoImportService().import_estados(), Estado),
+        ('municipios', lambda: MunicipioImportService().import_municipios(), Municipio),
+        ('distritos', lambda: DistritoImportService().import_distritos(), Distrito),
+    ]
+    if not skip_empresas:
+        steps.append(('empresas', EmpresasService.get_data, Empresa))
+
+    results = {}
+    for name, run, model in steps:
+        with count_queries() as counter:
+            start = time.perf_counter()
+            result = run()
+            seconds = time.perf_counter() - start
+        rows = model.objects.count()
+        results[name] = {
+            'rows': rows,
+            'seconds': round(seconds, 3),
+            'rows_per_second': round(rows / seconds, 1) if seconds else None,
+            'queries': counter.queries,
+            'sql_seconds': round(counter.seconds, 3),
+            'peak_rss_mb': _phases_peak_rss_mb(result),
+        }
+        print(f"  importação {name}: {rows} linhas em {seconds:.2f} s, {counter.queries} queries")
+    return results
+
+
+def bench_views(skip_empresas: bool) -> Dict[str, Dict]:
+    """Latência de cada listagem e combinação de filtros, com cache vazio e cheio"""
+    from django.contrib.auth import get_user_model
+    from django.core.cache import caches
+    from django.test import Client
+    from django.urls import reverse
+
+    user, _ = get_user_model().objects.get_or_create(username='benchmark', defaults={'is_staff': True})
+    client = Client()
+    client.force_login(user)
+
+    results = {}
+    for view, cases in VIEW_CASES.items():
+        if view == 'empresas' and skip_empresas:
+            continue
+        url = reverse(view)
+        for params in cases:
+            label = f"{view}?{'&'.join(f'{k}={v}' for k, v in params.items())}" if params else view
+            caches['default'].clear()
+
+            with count_queries() as cold:
+                start = time.perf_counter()
+                response = client.get(url, params)
+                cold_ms = (time.perf_counter() - start) * 1000
+            if response.status_code != 200:
+                raise RuntimeError(f"{label}: status {response.status_code}")
+
+            warm = []
+            with count_queries() as warm_counter:
+                for _ in range(WARM_REPEAT):
+                    start = time.perf_counter()
+                    client.get(url, params)
+                    warm.append((time.perf_counter() - start) * 1000)
+
+            results[label] = {
+                'cold_ms': round(cold_ms, 2),
+                'cold_queries': cold.queries,
+                'warm_ms': round(statistics.median(warm), 2),
+                'warm_queries': round(warm_counter.queries / WARM_REPEAT, 1),
+            }
+            print(f"  {label}: {cold_ms:.1f} ms ({cold.queries} queries), depois {results[label]['warm_ms']} ms")
+    return results
+
+
+def _load_results(path: Path) -> Optional[Dict]:
+    try:
+        return json.loads(path.read_text(encoding='utf-8'))
+    except (OSError, ValueError):
+        return None
+
+
+def is_baseline_candidate(result: Optional[Dict], current: Dict) -> bool:
+    """
+    Resultado de outro commit com os mesmos parâmetros
+
+    Execuções com alterações não commitadas (``-dirty``) não servem de
+    referência automática: o mesmo nome cobre qualquer estado da árvore.
+    """
+    return (
+        result is not None
+        and result['commit'] != current['commit']
+        and not result['commit'].endswith('-dirty')
+        and result['params'] == current['params']
+    )
+
+
+def find_baseline(current: Dict, baseline: Optional[str]) -> Optional[Dict]:
+    """Resultado de referência: o commit pedido ou o mais recente com os mesmos parâmetros"""
+    if baseline:
+        return _load_results(RESULTS_DIR / f"{baseline}.json")
+
+    candidates = []
+    for path in RESULTS_DIR.glob('*.json'):
+        # Os resultados de benchmarks.plans e benchmarks.load ficam no mesmo diretório
+        if path.name.startswith(('plans-', 'load-')):
+            continue
+        result = _load_results(path)
+        if is_baseline_candidate(result, current):
+            candidates.append(result)
+    return max(candidates, key=lambda r: r['timestamp'], default=None)
+
+
+def compare(current: Dict, baseline: Dict, tolerance: float) -> List[str]:
+    """Lista as métricas que pioraram além da tolerância"""
+    regressions = []
+    for section in ('imports', 'views'):
+        for name, metrics in current[section].items():
+            previous = baseline.get(section, {}).get(name)
+            if not previous:
+                continue
+            for metric in COMPARED:
+                new, old = metrics.get(metric), previous.get(metric)
+                if new is None or not old:
+                    continue
+                change = (new - old) / old
+                if metric in HIGHER_IS_BETTER:
+                    change = -change
+                # Contagens de queries não têm ruído: qualquer aumento conta
+                limit = 0 if 'queries' in metric else tolerance
+                if change > limit:
+                    regressions.append(f"{section}/{name} {metric}: {old} -> {new} ({change:+.0%})")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m benchmarks.run')
+    parser.add_argument('--scale', type=int, default=1, choices=(1, 10, 100))
+    parser.add_argument('--empresas-rows', type=int, default=1_000_000)
+    parser.add_argument('--skip-empresas', action='store_true')
+    parser.add_argument('--baseline', help='Commit de referência (padrão: último resultado com os mesmos parâmetros)')
+    parser.add_argument('--tolerance', type=float, default=0.15, help='Piora relativa aceita (padrão 0.15)')
+    parser.add_argument('--keepdb', action='store_true', help='Reaproveita o banco de teste')
+    args = parser.parse_args(argv)
+
+    setup_django()
+
+    from django.db import connection
+    from django.test.utils import override_settings
+    from djangoibge.transport import serve
+    from empresas.services import EmpresasService
+    from ibge.services import IBGEAPIService
+    from benchmarks.generators import write_empresas_archive, write_ibge_payloads
+
+    params = {
+        'scale': args.scale,
+        'empresas_rows': None if args.skip_empresas else args.empresas_rows,
+    }
+
+    workdir = tempfile.TemporaryDirectory(prefix='ibge-bench-')
+    root = Path(workdir.name)
+    print(f"Gerando dados em {root}")
+    write_ibge_payloads(root / 'srv' / 'api', args.scale)
+    if not args.skip_empresas:
+        write_empresas_archive(root / 'srv' / 'empresas.zip', args.empresas_rows)
+
+    server = serve(root / 'srv', port=0)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f"http://127.0.0.1:{server.server_address[1]}"
+    IBGEAPIService.BASE_URL = f"{base_url}/api"
+    EmpresasService.URL = f"{base_url}/empresas.zip"
+
+    # Cache só em memória: não toca no cache da aplicação e começa vazio
+    caches = {
+        'default': {
+            'BACKEND': 'djangoibge.cache.TieredCache',
+            'LOCATION': 'benchmark',
+            'OPTIONS': {'SHARED': 'shared'},
+        },
+        'shared': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'benchmark'},
+    }
+
+    old_name = connection.settings_dict['NAME']
+    old_cwd = os.getcwd()
+    connection.creation.create_test_db(verbosity=0, autoclobber=True, keepdb=args.keepdb, serialize=False)
+    try:
+        # EmpresasService grava o zip no diretório atual
+        os.chdir(root)
+        with override_settings(CACHES=caches, HTTP_TRANSPORT='live', ALLOWED_HOSTS=['testserver']):
+            print("Importações")
+            imports = bench_imports(args.skip_empresas)
+            print("Listagens")
+            views = bench_views(args.skip_empresas)
+    finally:
+        os.chdir(old_cwd)
+        server.shutdown()
+        connection.creation.destroy_test_db(old_name, verbosity=0, keepdb=args.keepdb)
+        workdir.cleanup()
+
+    result = {
+        'commit': _git_commit(),
+        'timestamp': time.time(),
+        'python': sys.version.split()[0],
+        'params': params,
+        'imports': imports,
+        'views': views,
+    }
+    RESULTS_DIR.mkdir(exist_ok=True)
+    output = RESULTS_DIR / f"{result['commit']}.json"
+    output.write_text(json.dumps(result, ensure_ascii=False, indent=2), encoding='utf-8')
+    print(f"Resultado gravado em {output}")
+
+    baseline = find_baseline(result, args.baseline)
+    if baseline is None:
+        print("Sem resultado anterior para comparar")
+        return 0
+
+    regressions = compare(result, baseline, args.tolerance)
+    print(f"Comparado com {baseline['commit']}:")
+    for line in regressions:
+        print(f"  REGRESSÃO {line}")
+    if not regressions:
+        print("  sem regressões")
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,147 @@
+import io
+import json
+import math
+import tempfile
+from contextlib import redirect_stderr, redirect_stdout
+from pathlib import Path
+from unittest import mock, skipUnless
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import SimpleTestCase, TestCase, override_settings
+from benchmarks import import_synthetic_data, plans, run
+
+
+CACHES = {
+    'default': {
+        'BACKEND': 'djangoibge.cache.TieredCache',
+        'LOCATION': 'plans-tests',
+        'OPTIONS': {'SHARED': 'shared'},
+    },
+    'shared': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'plans-tests'},
+}
+
+
+def scan(relation, rows, **extra):
+    return {'Node Type': 'Seq Scan', 'Relation Name': relation, 'Plan Rows': rows, **extra}
+
+
+def limit(child):
+    return {'Node Type': 'Limit', 'Plan Rows': 10, 'Total Cost': 1.0, 'Plans': [child]}
+
+
+class CheckPlanTests(SimpleTestCase):
+    sizes = {'empresas_empresa': 50_000}
+
+    def check(self, plan, rules=None):
+        plan.setdefault('Total Cost', 1.0)
+        return plans.check_plan(plan, self.sizes, rules or {}, max_rows=10_000, max_cost=1_000)
+
+    def test_seq_scan_on_large_table(self):
+        violations = self.check(scan('empresas_empresa', 50_000, Filter='(porte = 1)'))
+        self.assertEqual(violations, ['Seq Scan em empresas_empresa (50000 linhas)'])
+
+    def test_unfiltered_seq_scan_that_stops_at_limit(self):
+        self.assertEqual(self.check(limit(scan('empresas_empresa', 50_000))), [])
+
+    def test_seq_scan_allowed_by_rule(self):
+        plan = scan('empresas_empresa', 50_000, Filter='(porte = 1)')
+        self.assertEqual(self.check(plan, {'allow_seq_scan': ['empresas_empresa']}), [])
+
+    def test_sort_feeding_a_limit(self):
+        sort = {'Node Type': 'Sort', 'Plan Rows': 50_000, 'Sort Key': ['nome'], 'Plans': [
+            {'Node Type': 'Index Scan', 'Index Name': 'x', 'Relation Name': 'empresas_empresa', 'Plan Rows': 50_000},
+        ]}
+        violations = self.check(limit(sort))
+        self.assertEqual(violations, ['ordenação de ~50000 linhas para um LIMIT (nome)'])
+
+    def test_cost(self):
+        plan = {'Node Type': 'Index Scan', 'Index Name': 'x', 'Plan Rows': 1, 'Total Cost': 5_000.0}
+        self.assertEqual(self.check(plan), ['custo 5000 acima de 1000'])
+        self.assertEqual(self.check(plan, {'max_cost': 10_000}), [])
+
+
+class FindBaselineTests(SimpleTestCase):
+    params = {'scale': 1}
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.results = Path(directory.name)
+        for module in (run, plans):
+            patcher = mock.patch.object(module, 'RESULTS_DIR', self.results)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def write(self, name, commit, timestamp, params=None):
+        result = {'commit': commit, 'timestamp': timestamp, 'params': params or self.params}
+        (self.results / name).write_text(json.dumps(result), encoding='utf-8')
+
+    def test_skips_dirty_results(self):
+        current = {'commit': 'c3', 'params': self.params}
+        self.write('c1.json', 'c1', 1)
+        self.write('c2-dirty.json', 'c2-dirty', 2)
+        self.write('plans-c1.json', 'c1', 1)
+        self.write('plans-c2-dirty.json', 'c2-dirty', 2)
+        self.assertEqual(run.find_baseline(current, None)['commit'], 'c1')
+        self.assertEqual(plans.find_baseline(current, None)['commit'], 'c1')
+        # Pedido explicitamente, vale mesmo com alterações não commitadas
+        self.assertEqual(run.find_baseline(current, 'c2-dirty')['commit'], 'c2-dirty')
+
+    def test_run_ignores_plans_and_load_results(self):
+        current = {'commit': 'c3', 'params': self.params}
+        self.write('c1.json', 'c1', 1)
+        self.write('plans-c2.json', 'c2', 2)
+        self.write('load-c2-20260101-000000.json', 'c2', 2)
+        self.assertEqual(run.find_baseline(current, None)['commit'], 'c1')
+
+
+class ImportMemoryTests(SimpleTestCase):
+    def test_peak_from_the_import_phases(self):
+        result = {'memory': {'peak_rss_mb': 900.0, 'phases': [{'rss_max_mb': 120.5}, {'rss_max_mb': 150.0}]}}
+        self.assertEqual(run._phases_peak_rss_mb(result), 150.0)
+        self.assertIsNone(run._phases_peak_rss_mb({'created': 0}))
+        self.assertIsNone(run._phases_peak_rss_mb(None))
+
+
+@skipUnless(connection.vendor == 'postgresql', 'EXPLAIN dos planos só no PostgreSQL')
+@override_settings(CACHES=CACHES, HTTP_TRANSPORT='live', ALLOWED_HOSTS=['testserver'])
+class PlanRegressionTests(TestCase):
+    """
+    Índices exigidos em ``plans.RULES`` nas listagens e nos changelists do admin
+
+    Com os poucos dados do teste o planejador prefere Seq Scan em quase
+    tudo; com ``enable_seqscan`` desligado ele escolhe o índice sempre que
+    algum atende a consulta, que é o que se confere aqui. Os limites de
+    linhas e de custo só fazem sentido na escala real e ficam para o
+    ``python -m benchmarks.plans``.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        with redirect_stdout(io.StringIO()), redirect_stderr(io.StringIO()):
+            import_synthetic_data(1, 2000)
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+        cls.user = get_user_model().objects.create_superuser('plans', password='senha')
+
+    def setUp(self):
+        with connection.cursor() as cursor:
+            # Desfeito com o savepoint do teste
+            cursor.execute('SET LOCAL enable_seqscan = off')
+        self.client.force_login(self.user)
+        self.sizes = plans.relation_sizes()
+
+    def cases(self):
+        return list(plans.view_cases(skip_empresas=False)) + list(plans.admin_cases(self.user, skip_empresas=False))
+
+    def test_rules_name_existing_cases(self):
+        labels = {label for label, _, _ in self.cases()}
+        self.assertEqual(set(plans.RULES) - labels, set())
+
+    def test_required_indexes(self):
+        for label, url, params in self.cases():
+            if label not in plans.RULES:
+                continue
+            with self.subTest(label):
+                case = plans.check_case(label, self.client, url, params, self.sizes, math.inf, math.inf)
+                self.assertEqual(case['violations'], [])
@@ -0,0 +1,131 @@
+import logging
+import time
+from typing import Callable, Dict, Iterable, List, Sequence
+
+
+logger = logging.getLogger(__name__)
+
+# Limite de parâmetros por statement no protocolo do PostgreSQL
+POSTGRES_MAX_PARAMS = 65535
+
+
+class AdaptiveBatcher:
+    """
+    Controlador de tamanho de lote para escritas em bulk.
+
+    Mede linhas/s e latência de cada flush e ajusta o tamanho do próximo
+    lote: cresce enquanto a vazão melhora e a latência fica abaixo do alvo,
+    encolhe quando a latência estoura ou a vazão cai. O tamanho fica sempre
+    entre ``min_size`` e o menor limite entre ``max_size``, o número de
+    parâmetros do statement e o orçamento de memória.
+
+    :param name: Nome da tabela/escrita, usado nas métricas
+    :type name: string
+    :param fields_per_row: Número de colunas inseridas por linha
+    :type fields_per_row: int
+    :param row_bytes: Estimativa de bytes por linha em memória
+    :type row_bytes: int
+    """
+
+    GROWTH_FACTOR = 1.5
+    SHRINK_FACTOR = 0.5
+    # Quedas de vazão abaixo desta fração são tratadas como ruído
+    NOISE_TOLERANCE = 0.9
+
+    def __init__(
+        self,
+        name: str,
+        fields_per_row: int = 1,
+        initial_size: int = 500,
+        min_size: int = 100,
+        max_size: int = 20000,
+        target_latency: float = 0.5,
+        memory_budget: int = 64 * 1024 * 1024,
+        row_bytes: int = 512,
+    ):
+        self.name = name
+        self.target_latency = target_latency
+
+        statement_limit = POSTGRES_MAX_PARAMS // max(fields_per_row, 1)
+        memory_limit = memory_budget // max(row_bytes, 1)
+        self.max_size = max(min(max_size, statement_limit, memory_limit), 1)
+        self.min_size = min(min_size, self.max_size)
+        self.size = min(max(initial_size, self.min_size), self.max_size)
+
+        self._last_throughput = None
+        self.flushes = 0
+        self.rows = 0
+        self.elapsed = 0.0
+        self.max_latency = 0.0
+        self.sizes: List[int] = []
+
+    def record(self, rows: int, elapsed: float):
+        """Registra um flush e recalcula o tamanho do próximo lote"""
+        self.flushes += 1
+        self.rows += rows
+        self.elapsed += elapsed
+        self.max_latency = max(self.max_latency, elapsed)
+        self.sizes.append(self.size)
+
+        # Lotes parciais (último lote) não dizem nada sobre o tamanho ideal
+        if rows < self.size or elapsed <= 0:
+            return
+
+        throughput = rows / elapsed
+
+        if elapsed > self.target_latency:
+            new_size = int(self.size * self.SHRINK_FACTOR)
+        elif self._last_throughput is None or throughput >= self._last_throughput * self.NOISE_TOLERANCE:
+            new_size = int(self.size * self.GROWTH_FACTOR)
+        else:
+            new_size = int(self.size * self.SHRINK_FACTOR ** 0.5)
+
+        self._last_throughput = throughput
+        new_size = min(max(new_size, self.min_size), self.max_size)
+
+        if new_size != self.size:
+            logger.debug(
+                f"{self.name}: lote {self.size} -> {new_size} "
+                f"({throughput:.0f} linhas/s, {elapsed * 1000:.0f} ms)"
+            )
+            self.size = new_size
+
+    def flush(self, batch: Sequence, writer: Callable[[Sequence], object]):
+        """Executa ``writer(batch)`` medindo a duração"""
+        start = time.perf_counter()
+        writer(batch)
+        self.record(len(batch), time.perf_counter() - start)
+
+    def run(self, items: Sequence, writer: Callable[[Sequence], object]) -> int:
+        """Grava uma lista inteira em lotes adaptativos, retorna linhas gravadas"""
+        position = 0
+        total = len(items)
+        while position < total:
+            batch = items[position:position + self.size]
+            self.flush(batch, writer)
+            position += len(batch)
+        return total
+
+    def batches(self, iterable: Iterable) -> Iterable[List]:
+        """Agrupa um iterável em lotes do tamanho atual (use ``record`` após gravar)"""
+        batch = []
+        for item in iterable:
+            batch.append(item)
+            if len(batch) >= self.size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+    def metrics(self) -> Dict:
+        """Métricas do controlador para inclusão no resultado da importação"""
+        return {
+            'table': self.name,
+            'flushes': self.flushes,
+            'rows': self.rows,
+            'rows_per_second': round(self.rows / self.elapsed, 1) if self.elapsed else None,
+            'max_latency_ms': round(self.max_latency * 1000, 1),
+            'initial_batch_size': self.sizes[0] if self.sizes else self.size,
+            'final_batch_size': self.size,
+            'batch_sizes': sorted(set(self.sizes)),
+        }
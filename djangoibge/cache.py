@@ -0,0 +1,218 @@
+import pickle
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+from django.core.cache import caches
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+from .instrumentation import record_cache
+
+
+class LocalTier:
+    """
+    LRU do processo com limite de entradas e de bytes e validade por entrada
+
+    Guarda os valores serializados, como o LocMemCache, para que quem lê
+    não altere o objeto guardado.
+    """
+
+    def __init__(self, max_entries: int, max_bytes: int):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        # chave -> (valor serializado, expira em)
+        self._entries: 'OrderedDict[str, Tuple[bytes, float]]' = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.stats = {'local_hits': 0, 'shared_hits': 0, 'misses': 0, 'sets': 0, 'evictions': 0}
+
+    def get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            data, expires_at = entry
+            if expires_at <= time.monotonic():
+                self._pop(key)
+                return None
+            self._entries.move_to_end(key)
+            self.stats['local_hits'] += 1
+            return data
+
+    def set(self, key: str, data: bytes, ttl: float):
+        with self._lock:
+            self._pop(key)
+            if len(data) > self.max_bytes // 4:
+                # Valores muito grandes ficam só no nível compartilhado
+                return
+            self._entries[key] = (data, time.monotonic() + ttl)
+            self._bytes += len(data)
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                self._pop(next(iter(self._entries)))
+                self.stats['evictions'] += 1
+
+    def delete(self, key: str):
+        with self._lock:
+            self._pop(key)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def count(self, stat: str):
+        with self._lock:
+            self.stats[stat] += 1
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            stats = dict(self.stats)
+            stats['local_entries'] = len(self._entries)
+            stats['local_bytes'] = self._bytes
+        return stats
+
+    def _pop(self, key: str):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._bytes -= len(entry[0])
+
+
+# Um nível local por LOCATION, compartilhado entre as threads do processo
+_tiers: Dict[str, LocalTier] = {}
+_tiers_lock = threading.Lock()
+
+
+class TieredCache(BaseCache):
+    """
+    Backend de cache em dois níveis: LRU no processo na frente de um cache compartilhado
+
+    Leituras que faltam no nível local vão ao cache compartilhado
+    (normalmente Redis) e escritas vão aos dois. No nível local nada vale
+    mais que LOCAL_TIMEOUT segundos, para que escritas de outros processos
+    apareçam logo.
+
+    OPTIONS:
+        SHARED: alias do cache compartilhado em ``CACHES``
+        LOCAL_MAX_ENTRIES: entradas no nível local (padrão 1000)
+        LOCAL_MAX_BYTES: bytes no nível local (padrão 64 MB)
+        LOCAL_TIMEOUT: validade máxima no nível local, em segundos (padrão 60)
+    """
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+        self._shared_alias = options.get('SHARED', 'shared')
+        self._local_timeout = float(options.get('LOCAL_TIMEOUT', 60))
+
+        with _tiers_lock:
+            tier = _tiers.get(location)
+            if tier is None:
+                tier = _tiers[location] = LocalTier(
+                    int(options.get('LOCAL_MAX_ENTRIES', 1000)),
+                    int(options.get('LOCAL_MAX_BYTES', 64 * 1024 * 1024)),
+                )
+        self._tier = tier
+
+    @property
+    def shared(self) -> BaseCache:
+        return caches[self._shared_alias]
+
+    def _remember(self, local_key: str, value, timeout):
+        """Copia o valor para o nível local (timeout 0 ou negativo: remove)"""
+        if timeout is not None and timeout <= 0:
+            self._tier.delete(local_key)
+            return
+        ttl = self._local_timeout if timeout is None else min(timeout, self._local_timeout)
+        self._tier.set(local_key, pickle.dumps(value, pickle.HIGHEST_PROTOCOL), ttl)
+
+    def _timeout(self, timeout) -> Optional[float]:
+        return self.default_timeout if timeout is DEFAULT_TIMEOUT else timeout
+
+    def _get_local(self, local_key: str, missing):
+        data = self._tier.get(local_key)
+        if data is None:
+            return missing
+        record_cache(True)
+        return pickle.loads(data)
+
+    def _from_shared(self, local_key: str, value, missing, default):
+        record_cache(value is not missing)
+        if value is missing:
+            self._tier.count('misses')
+            return default
+
+        self._tier.count('shared_hits')
+        self._remember(local_key, value, None)
+        return value
+
+    def get(self, key, default=None, version=None):
+        local_key = self.make_and_validate_key(key, version=version)
+        missing = object()
+        value = self._get_local(local_key, missing)
+        if value is not missing:
+            return value
+        return self._from_shared(local_key, self.shared.get(key, missing, version=version), missing, default)
+
+    async def aget(self, key, default=None, version=None):
+        # Acerto no nível local sem sair do event loop; só a falta vai ao compartilhado
+        local_key = self.make_and_validate_key(key, version=version)
+        missing = object()
+        value = self._get_local(local_key, missing)
+        if value is not missing:
+            return value
+        shared = await self.shared.aget(key, missing, version=version)
+        return self._from_shared(local_key, shared, missing, default)
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        local_key = self.make_and_validate_key(key, version=version)
+        timeout = self._timeout(timeout)
+        self.shared.set(key, value, timeout, version=version)
+        self._tier.count('sets')
+        self._remember(local_key, value, timeout)
+
+    async def aset(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        local_key = self.make_and_validate_key(key, version=version)
+        timeout = self._timeout(timeout)
+        await self.shared.aset(key, value, timeout, version=version)
+        self._tier.count('sets')
+        self._remember(local_key, value, timeout)
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        local_key = self.make_and_validate_key(key, version=version)
+        timeout = self._timeout(timeout)
+        added = self.shared.add(key, value, timeout, version=version)
+        if added:
+            self._remember(local_key, value, timeout)
+        return added
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        self._tier.delete(self.make_and_validate_key(key, version=version))
+        return self.shared.touch(key, self._timeout(timeout), version=version)
+
+    def delete(self, key, version=None):
+        self._tier.delete(self.make_and_validate_key(key, version=version))
+        return self.shared.delete(key, version=version)
+
+    def has_key(self, key, version=None):
+        if self._tier.get(self.make_and_validate_key(key, version=version)) is not None:
+            return True
+        return self.shared.has_key(key, version=version)
+
+    def incr(self, key, delta=1, version=None):
+        # Atômico no compartilhado; a cópia local é descartada
+        self._tier.delete(self.make_and_validate_key(key, version=version))
+        return self.shared.incr(key, delta, version=version)
+
+    def clear(self):
+        self._tier.clear()
+        self.shared.clear()
+
+    def close(self, **kwargs):
+        self.shared.close(**kwargs)
+
+    def stats(self) -> Dict:
+        """Acertos por nível, faltas, escritas e remoções do nível local deste processo"""
+        stats = self._tier.snapshot()
+        reads = stats['local_hits'] + stats['shared_hits'] + stats['misses']
+        stats['hit_rate'] = round((stats['local_hits'] + stats['shared_hits']) / reads, 4) if reads else None
+        stats['shared_backend'] = type(self.shared).__name__
+        return stats
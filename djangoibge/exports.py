@@ -0,0 +1,255 @@
+import csv
+import io
+import json
+import zlib
+from datetime import date, datetime
+from decimal import Decimal
+from itertools import islice
+from typing import AsyncIterator, Callable, Iterable, Iterator, Sequence
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.http import HttpResponse, StreamingHttpResponse
+
+
+# Linhas lidas por ida ao cursor do servidor e por pedaço de resposta
+CHUNK_SIZE = 5000
+
+# Linhas por row group no Parquet
+PARQUET_ROW_GROUP = 100000
+
+# Pedaços da resposta lidos por ida à thread no streaming em ASGI
+ASYNC_STREAM_PARTS = 16
+
+FORMATOS = {
+    'csv': ('text/csv; charset=utf-8', 'csv'),
+    'ndjson': ('application/x-ndjson; charset=utf-8', 'ndjson'),
+    'parquet': ('application/vnd.apache.parquet', 'parquet'),
+}
+
+
+def _chunks(rows: Iterable[tuple], size: int) -> Iterator[list]:
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def _json_default(value):
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return str(value)
+    raise TypeError(f"Tipo não serializável: {type(value)}")
+
+
+def csv_stream(rows: Iterable[tuple], columns: Sequence[str]) -> Iterator[bytes]:
+    """CSV com cabeçalho, um pedaço por CHUNK_SIZE linhas"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+    for chunk in _chunks(rows, CHUNK_SIZE):
+        writer.writerows(chunk)
+        yield buffer.getvalue().encode('utf-8')
+        buffer.seek(0)
+        buffer.truncate()
+    yield buffer.getvalue().encode('utf-8')
+
+
+def ndjson_stream(rows: Iterable[tuple], columns: Sequence[str]) -> Iterator[bytes]:
+    """Um objeto JSON por linha, um pedaço por CHUNK_SIZE linhas"""
+    dumps = json.dumps
+    for chunk in _chunks(rows, CHUNK_SIZE):
+        yield ''.join(
+            dumps(dict(zip(columns, row)), ensure_ascii=False, default=_json_default) + '\n'
+            for row in chunk
+        ).encode('utf-8')
+
+
+class _DrainableSink(io.RawIOBase):
+    """Arquivo de saída que acumula bytes até serem drenados, mantendo a posição"""
+
+    def __init__(self):
+        super().__init__()
+        self._parts = []
+        self._position = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        data = bytes(data)
+        self._parts.append(data)
+        self._position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._position
+
+    def drain(self) -> bytes:
+        data = b''.join(self._parts)
+        self._parts = []
+        return data
+
+
+def _arrow_type(field):
+    """Tipo do pyarrow de um campo do modelo (o da chave apontada, em relações)"""
+    import pyarrow as pa
+
+    if field.is_relation:
+        return _arrow_type(field.target_field)
+    kind = field.get_internal_type()
+    if kind in ('AutoField', 'BigAutoField', 'SmallAutoField', 'IntegerField', 'BigIntegerField',
+                'SmallIntegerField', 'PositiveIntegerField', 'PositiveBigIntegerField',
+                'PositiveSmallIntegerField'):
+        return pa.int64()
+    if kind == 'FloatField':
+        return pa.float64()
+    if kind == 'DecimalField':
+        return pa.decimal128(field.max_digits, field.decimal_places)
+    if kind == 'BooleanField':
+        return pa.bool_()
+    if kind == 'DateField':
+        return pa.date32()
+    if kind == 'DateTimeField':
+        return pa.timestamp('us', tz='UTC' if settings.USE_TZ else None)
+    return pa.string()
+
+
+def parquet_schema(model, fields: Sequence[str], columns: Sequence[str]):
+    """
+    Esquema do Parquet a partir dos campos do modelo (``values_list``, com ``__``)
+
+    Fixo para o arquivo todo: inferido a cada row group, uma coluna só com
+    nulos em um deles (ex: ``ente_federativo_responsavel``) mudaria de tipo
+    no meio do arquivo.
+    """
+    import pyarrow as pa
+
+    types = []
+    for path in fields:
+        current, field = model, None
+        for name in path.split('__'):
+            field = current._meta.get_field(name)
+            current = field.related_model if field.is_relation else None
+        types.append(_arrow_type(field))
+    return pa.schema(list(zip(columns, types)))
+
+
+def parquet_stream(rows: Iterable[tuple], columns: Sequence[str], schema=None) -> Iterator[bytes]:
+    """
+    Parquet escrito em row groups de PARQUET_ROW_GROUP linhas, enviados à medida que ficam prontos
+
+    :param schema: Esquema do arquivo (``parquet_schema``); sem ele, todas as colunas são texto
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    if schema is None:
+        schema = pa.schema([(column, pa.string()) for column in columns])
+
+    sink = _DrainableSink()
+    writer = pq.ParquetWriter(sink, schema, compression='zstd')
+    for chunk in _chunks(rows, PARQUET_ROW_GROUP):
+        table = pa.Table.from_pydict({
+            column: [row[i] for row in chunk] for i, column in enumerate(columns)
+        }, schema=schema)
+        writer.write_table(table, row_group_size=PARQUET_ROW_GROUP)
+        yield sink.drain()
+
+    writer.close()
+    yield sink.drain()
+
+
+STREAMS = {
+    'csv': csv_stream,
+    'ndjson': ndjson_stream,
+    'parquet': parquet_stream,
+}
+
+
+def gzip_stream(chunks: Iterable[bytes]) -> Iterator[bytes]:
+    """Comprime o fluxo em gzip sem acumular a resposta"""
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def export_response(queryset, fields: Sequence[str], formato: str, filename: str,
+                    columns: Sequence[str] = None, compress: bool = False) -> HttpResponse:
+    """
+    Exporta um queryset em streaming com cursor no servidor
+
+    :param fields: Campos passados para ``values_list``
+    :param columns: Nomes das colunas na saída (padrão: os próprios campos)
+    :param formato: csv, ndjson ou parquet
+    :param compress: Comprime a resposta com gzip
+    """
+    if formato not in FORMATOS:
+        return HttpResponse(f"Formato de exportação inválido: {formato}", status=400)
+
+    if formato == 'parquet':
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError:
+            return HttpResponse("Exportação em Parquet requer o pacote pyarrow", status=400)
+
+    columns = list(columns or fields)
+    rows = queryset.values_list(*fields).iterator(chunk_size=CHUNK_SIZE)
+    if formato == 'parquet':
+        stream = parquet_stream(rows, columns, parquet_schema(queryset.model, fields, columns))
+    else:
+        stream = STREAMS[formato](rows, columns)
+
+    content_type, extension = FORMATOS[formato]
+    filename = f"{filename}.{extension}"
+    if compress:
+        stream = gzip_stream(stream)
+        content_type = 'application/gzip'
+        filename += '.gz'
+
+    response = StreamingHttpResponse(stream, content_type=content_type)
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
+
+
+async def _aiter_sync(iterator: Iterator[bytes]) -> AsyncIterator[bytes]:
+    """Lê um iterador síncrono (que usa o banco) em lotes, na thread da requisição"""
+    read = sync_to_async(lambda: list(islice(iterator, ASYNC_STREAM_PARTS)))
+    while True:
+        parts = await read()
+        if not parts:
+            return
+        for part in parts:
+            yield part
+
+
+def stream_for(request, response: HttpResponse) -> HttpResponse:
+    """
+    Adapta uma resposta em streaming ao servidor
+
+    Em ASGI o Django juntaria um iterador síncrono inteiro em memória antes
+    de enviar; aqui ele passa a ser lido aos poucos por uma thread. Em WSGI
+    a resposta fica como está.
+    """
+    if isinstance(request, ASGIRequest) and isinstance(response, StreamingHttpResponse) and not response.is_async:
+        response.streaming_content = _aiter_sync(iter(response.streaming_content))
+    return response
+
+
+def export_action(fields: Sequence[str], filename: str, columns: Sequence[str] = None,
+                  formato: str = 'csv') -> Callable:
+    """Cria uma ação do admin que exporta os registros selecionados"""
+    def action(modeladmin, request, queryset):
+        return stream_for(request, export_response(queryset, fields, formato, filename, columns))
+
+    action.short_description = f"Exportar selecionados ({formato.upper()})"
+    action.__name__ = f"export_{formato}"
+    return action
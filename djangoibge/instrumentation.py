@@ -0,0 +1,409 @@
+"""
+Instrumentação das requisições: SQL, template, view, cache e tempo total
+
+O ``PerformanceMiddleware`` mede cada requisição (o tempo só da view vem
+do ``ViewTimingMiddleware``, o último do MIDDLEWARE), envia os números no
+cabeçalho ``Server-Timing`` e acumula histogramas por view, que a view
+``metrics_view`` exporta no formato texto do Prometheus. Cada worker grava
+periodicamente seus contadores no cache (``METRICS_CACHE``) e o
+``/metrics`` soma os de todos os workers.
+
+Funciona em WSGI e em ASGI: as queries são contadas por um
+``execute_wrapper`` fixo em cada conexão, que registra na requisição do
+contexto atual, então valem também as feitas pelo ORM assíncrono nas
+threads do ``sync_to_async``.
+"""
+import hmac
+import os
+import threading
+import time
+import uuid
+from contextvars import ContextVar
+from typing import Dict, List, Optional, Tuple
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.cache import caches
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.http import HttpResponse
+
+
+# Limites dos buckets do histograma de latência, em segundos
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Intervalo mínimo entre gravações dos contadores do worker no cache
+FLUSH_INTERVAL = 10.0
+SNAPSHOT_TIMEOUT = 24 * 3600
+WORKERS_KEY = 'metrics:workers'
+# Lock (cache.add) que serializa as alterações da lista de workers
+WORKERS_LOCK_KEY = 'metrics:workers:lock'
+WORKERS_LOCK_TIMEOUT = 5
+WORKERS_LOCK_ATTEMPTS = 3
+
+
+class RequestMetrics:
+    """Números de uma requisição"""
+
+    __slots__ = ('sql_count', 'sql_time', 'sql_max', 'template_time', 'view_time', 'cache_hits', 'cache_misses')
+
+    def __init__(self):
+        self.sql_count = 0
+        self.sql_time = 0.0
+        self.sql_max = 0.0
+        self.template_time = 0.0
+        self.view_time = 0.0
+        self.cache_hits = 0
+        self.cache_misses = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        # execute_wrapper: mede cada query
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = time.perf_counter() - start
+            self.sql_count += 1
+            self.sql_time += elapsed
+            if elapsed > self.sql_max:
+                self.sql_max = elapsed
+
+
+_current: ContextVar[Optional[RequestMetrics]] = ContextVar('request_metrics', default=None)
+
+
+def record_cache(hit: bool):
+    """Conta um acerto ou falta de cache na requisição atual (se houver)"""
+    metrics = _current.get()
+    if metrics is not None:
+        if hit:
+            metrics.cache_hits += 1
+        else:
+            metrics.cache_misses += 1
+
+
+def _execute(execute, sql, params, many, context):
+    """execute_wrapper de todas as conexões: mede a query se há uma requisição no contexto"""
+    metrics = _current.get()
+    if metrics is None:
+        return execute(sql, params, many, context)
+    return metrics(execute, sql, params, many, context)
+
+
+def _install_wrapper(sender=None, connection=None, **kwargs):
+    # A lista de wrappers sobrevive às reconexões: instala uma vez só
+    if _execute not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_execute)
+
+
+def _instrument_connections():
+    """Instala ``_execute`` nas conexões já abertas e em todas as próximas, de qualquer thread"""
+    connection_created.connect(_install_wrapper, dispatch_uid='instrumentation_execute')
+    for connection in connections.all(initialized_only=True):
+        _install_wrapper(connection=connection)
+
+
+def _instrument_templates():
+    """Soma o tempo de renderização dos templates na requisição atual"""
+    from django.template.backends.django import Template
+
+    if getattr(Template.render, 'instrumented', False):
+        return
+    original = Template.render
+
+    def render(self, context=None, request=None):
+        metrics = _current.get()
+        if metrics is None:
+            return original(self, context, request)
+        start = time.perf_counter()
+        try:
+            return original(self, context, request)
+        finally:
+            metrics.template_time += time.perf_counter() - start
+
+    render.instrumented = True
+    Template.render = render
+
+
+class Registry:
+    """Contadores e histogramas do processo, por (view, método, status)"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # (view, método, status) -> [requisições, soma das durações, buckets..., sql, sql_s, template_s, hits, misses]
+        self._series: Dict[Tuple[str, str, str], List[float]] = {}
+        self._flushed_at = 0.0
+
+    def observe(self, view: str, method: str, status: int, duration: float, metrics: RequestMetrics):
+        key = (view, method, str(status))
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [0.0] * (2 + len(BUCKETS) + 5)
+            series[0] += 1
+            series[1] += duration
+            for i, bound in enumerate(BUCKETS):
+                if duration <= bound:
+                    series[2 + i] += 1
+            offset = 2 + len(BUCKETS)
+            series[offset] += metrics.sql_count
+            series[offset + 1] += metrics.sql_time
+            series[offset + 2] += metrics.template_time
+            series[offset + 3] += metrics.cache_hits
+            series[offset + 4] += metrics.cache_misses
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            return {key: list(values) for key, values in self._series.items()}
+
+    def flush_due(self) -> bool:
+        return time.monotonic() - self._flushed_at >= FLUSH_INTERVAL
+
+    def maybe_flush(self):
+        """Grava os contadores deste worker no cache, no máximo a cada FLUSH_INTERVAL"""
+        if not self.flush_due():
+            return
+        self._flushed_at = time.monotonic()
+        flush_snapshot(self.snapshot())
+
+
+registry = Registry()
+
+
+def _metrics_cache():
+    return caches[getattr(settings, 'METRICS_CACHE', 'default')]
+
+
+_worker = (None, None)
+
+
+def worker_id() -> str:
+    """
+    Identificador do worker nas métricas: PID e um sufixo aleatório
+
+    Só o PID não basta: um worker novo que recebe o PID de um que morreu
+    sobrescreveria os contadores dele e a soma voltaria para trás.
+    """
+    global _worker
+    pid = os.getpid()
+    if _worker[0] != pid:
+        # Gerado de novo depois do fork
+        _worker = (pid, f'{pid}-{uuid.uuid4().hex[:8]}')
+    return _worker[1]
+
+
+def flush_snapshot(snapshot: Dict):
+    cache = _metrics_cache()
+    worker = worker_id()
+    cache.set(f'metrics:worker:{worker}', snapshot, SNAPSHOT_TIMEOUT)
+    if worker not in (cache.get(WORKERS_KEY) or []):
+        _register_worker(cache, worker)
+
+
+def _register_worker(cache, worker: str):
+    """
+    Inclui o worker na lista, com um lock para não perder o registro de outro
+
+    Ler, alterar e gravar a lista sem lock deixava dois workers gravando ao
+    mesmo tempo e um deles sumia da soma. Workers cujos contadores já
+    expiraram saem da lista; os de workers mortos continuam somados até
+    expirar, para os totais não voltarem para trás. Sem o lock, tenta de
+    novo no próximo flush.
+    """
+    for attempt in range(WORKERS_LOCK_ATTEMPTS):
+        if cache.add(WORKERS_LOCK_KEY, worker, WORKERS_LOCK_TIMEOUT):
+            break
+        time.sleep(0.05 * (attempt + 1))
+    else:
+        return
+
+    try:
+        workers = cache.get(WORKERS_KEY) or []
+        alive = cache.get_many([f'metrics:worker:{w}' for w in workers])
+        workers = [w for w in workers if f'metrics:worker:{w}' in alive and w != worker]
+        cache.set(WORKERS_KEY, workers + [worker], SNAPSHOT_TIMEOUT)
+    finally:
+        cache.delete(WORKERS_LOCK_KEY)
+
+
+def collect() -> Dict:
+    """Soma os contadores de todos os workers (o atual sempre atualizado)"""
+    cache = _metrics_cache()
+    this_worker = worker_id()
+    workers = [w for w in (cache.get(WORKERS_KEY) or []) if w != this_worker]
+    snapshots = list(cache.get_many([f'metrics:worker:{w}' for w in workers]).values())
+    snapshots.append(registry.snapshot())
+
+    total: Dict[Tuple[str, str, str], List[float]] = {}
+    for snapshot in snapshots:
+        for key, values in snapshot.items():
+            current = total.get(key)
+            if current is None:
+                total[key] = list(values)
+            else:
+                for i, value in enumerate(values):
+                    current[i] += value
+    return total
+
+
+def _label(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def render_prometheus(series: Dict) -> str:
+    """Formato texto de exposição do Prometheus"""
+    offset = 2 + len(BUCKETS)
+    lines = [
+        '# HELP django_request_duration_seconds Duração das requisições por view',
+        '# TYPE django_request_duration_seconds histogram',
+    ]
+    for (view, method, status), values in sorted(series.items()):
+        labels = f'view="{_label(view)}",method="{method}",status="{status}"'
+        for i, bound in enumerate(BUCKETS):
+            lines.append(f'django_request_duration_seconds_bucket{{{labels},le="{bound}"}} {int(values[2 + i])}')
+        lines.append(f'django_request_duration_seconds_bucket{{{labels},le="+Inf"}} {int(values[0])}')
+        lines.append(f'django_request_duration_seconds_sum{{{labels}}} {values[1]:.6f}')
+        lines.append(f'django_request_duration_seconds_count{{{labels}}} {int(values[0])}')
+
+    counters = (
+        ('django_request_sql_queries_total', 'Queries SQL executadas', 0, '{:.0f}'),
+        ('django_request_sql_seconds_total', 'Tempo em SQL', 1, '{:.6f}'),
+        ('django_request_template_seconds_total', 'Tempo renderizando templates', 2, '{:.6f}'),
+        ('django_request_cache_hits_total', 'Acertos de cache', 3, '{:.0f}'),
+        ('django_request_cache_misses_total', 'Faltas de cache', 4, '{:.0f}'),
+    )
+    for name, help_text, index, fmt in counters:
+        lines.append(f'# HELP {name} {help_text} por view')
+        lines.append(f'# TYPE {name} counter')
+        totals: Dict[str, float] = {}
+        for (view, _, _), values in series.items():
+            totals[view] = totals.get(view, 0) + values[offset + index]
+        for view, value in sorted(totals.items()):
+            lines.append(f'{name}{{view="{_label(view)}"}} {fmt.format(value)}')
+
+    return '\n'.join(lines) + '\n'
+
+
+def metrics_view(request):
+    """
+    Métricas no formato do Prometheus
+
+    Com ``METRICS_TOKEN`` definido exige ``Authorization: Bearer <token>``;
+    sem ele, só usuários staff.
+    """
+    token = getattr(settings, 'METRICS_TOKEN', '')
+    if token:
+        if not hmac.compare_digest(request.headers.get('Authorization', '').encode(), f'Bearer {token}'.encode()):
+            return HttpResponse(status=401)
+    elif not (request.user.is_authenticated and request.user.is_staff):
+        return HttpResponse(status=403)
+
+    return HttpResponse(
+        render_prometheus(collect()),
+        content_type='text/plain; version=0.0.4; charset=utf-8',
+    )
+
+
+class PerformanceMiddleware:
+    """
+    Mede SQL, templates, cache e tempo total de cada requisição
+
+    Envia ``Server-Timing`` na resposta e alimenta o registro do
+    Prometheus. Usa só ``execute_wrapper`` e contadores em memória, sem
+    guardar o SQL, para poder ficar ligado em produção.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+        _instrument_connections()
+        _instrument_templates()
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+
+        metrics = RequestMetrics()
+        token = _current.set(metrics)
+        start = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        self._observe(request, response, metrics, time.perf_counter() - start)
+        registry.maybe_flush()
+        return response
+
+    async def __acall__(self, request):
+        metrics = RequestMetrics()
+        token = _current.set(metrics)
+        start = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current.reset(token)
+        self._observe(request, response, metrics, time.perf_counter() - start)
+        # A gravação no cache compartilhado é bloqueante: fora do event loop
+        if registry.flush_due():
+            await sync_to_async(registry.maybe_flush, thread_sensitive=False)()
+        return response
+
+    def _observe(self, request, response, metrics: RequestMetrics, duration: float):
+        response['Server-Timing'] = ', '.join((
+            f'total;dur={duration * 1000:.1f}',
+            f'sql;dur={metrics.sql_time * 1000:.1f};desc="{metrics.sql_count} queries"',
+            f'sqlmax;dur={metrics.sql_max * 1000:.1f}',
+            f'view;dur={metrics.view_time * 1000:.1f}',
+            f'tpl;dur={metrics.template_time * 1000:.1f}',
+            f'cache;desc="{metrics.cache_hits} hits, {metrics.cache_misses} misses"',
+        ))
+
+        match = request.resolver_match
+        view = match.view_name if match else '<unresolved>'
+        registry.observe(view, request.method, response.status_code, duration, metrics)
+
+
+class ViewTimingMiddleware:
+    """
+    Mede o tempo da view (com os templates e o SQL dela) para o ``Server-Timing``
+
+    Fica por último no MIDDLEWARE: o ``get_response`` dele é a resolução da
+    URL e a própria view, sem o processamento dos outros middlewares
+    (sessão, CSRF, mensagens...), que fica no ``total``.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+
+        start = time.perf_counter()
+        try:
+            return self.get_response(request)
+        finally:
+            self._add(time.perf_counter() - start)
+
+    async def __acall__(self, request):
+        start = time.perf_counter()
+        try:
+            return await self.get_response(request)
+        finally:
+            self._add(time.perf_counter() - start)
+
+    @staticmethod
+    def _add(elapsed: float):
+        metrics = _current.get()
+        if metrics is not None:
+            metrics.view_time += elapsed
@@ -0,0 +1,231 @@
+"""
+Acompanhamento de memória das importações, por fase
+
+``MemoryTracker`` registra, para cada fase de uma importação, o RSS do
+processo e (com ``trace``) o pico do tracemalloc e os pontos do código que
+mais alocaram. Com um orçamento (``IMPORT_MEMORY_BUDGET_MB``) a importação
+falha com ``MemoryBudgetExceeded`` assim que o RSS passa do limite, ou antes,
+quando a projeção do laço em andamento indica que vai passar.
+
+    tracker = MemoryTracker('distritos')
+    with tracker.phase('montagem'):
+        for i, item in enumerate(items):
+            tracker.step(i, len(items))
+    tracker.report()
+"""
+import logging
+import os
+import resource
+import sys
+import time
+import tracemalloc
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+from django.conf import settings
+
+
+logger = logging.getLogger(__name__)
+
+MB = 1024 * 1024
+
+# Itens entre duas leituras do RSS em ``step``
+CHECK_EVERY = 1000
+
+# Fração mínima do laço antes de confiar na projeção de memória
+PROJECTION_MIN_FRACTION = 0.1
+
+# Frames guardados por alocação (para achar a linha do projeto que alocou)
+TRACE_FRAMES = 10
+
+_PAGE_SIZE = os.sysconf('SC_PAGE_SIZE') if hasattr(os, 'sysconf') else 4096
+
+
+class MemoryBudgetExceeded(Exception):
+    """A importação passou (ou vai passar) do orçamento de memória"""
+
+
+def current_rss() -> int:
+    """RSS atual do processo em bytes (no Linux; nos demais, o pico)"""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * _PAGE_SIZE
+    except (OSError, ValueError, IndexError):
+        return peak_rss()
+
+
+def peak_rss() -> int:
+    """Pico de RSS do processo em bytes (ru_maxrss é em KB no Linux)"""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+def _mb(value: float) -> float:
+    return round(value / MB, 1)
+
+
+class MemoryTracker:
+    """
+    RSS, pico do tracemalloc e maiores alocações por fase de uma importação
+
+    :param name: Nome da importação, usado nas mensagens
+    :param budget_mb: Limite de RSS em MB (None: ``IMPORT_MEMORY_BUDGET_MB``; 0: sem limite)
+    :param trace: Liga o tracemalloc (None: ``IMPORT_MEMORY_TRACE``); deixa a importação mais lenta
+    :param top: Quantos pontos de alocação listar por fase
+    """
+
+    def __init__(self, name: str, budget_mb: Optional[int] = None, trace: Optional[bool] = None, top: int = 5):
+        self.name = name
+        if budget_mb is None:
+            budget_mb = getattr(settings, 'IMPORT_MEMORY_BUDGET_MB', 0)
+        if trace is None:
+            trace = getattr(settings, 'IMPORT_MEMORY_TRACE', False)
+        self.budget = budget_mb * MB if budget_mb else 0
+        self.trace = trace
+        self.top = top
+        self.phases: List[Dict] = []
+        self._phase: Optional[str] = None
+        self._phase_rss = 0
+        self._phase_max = 0
+        self._started_tracing = False
+
+    @contextmanager
+    def phase(self, name: str):
+        """
+        Mede o bloco como uma fase e confere o orçamento no início e no fim
+
+        Com ``trace``, o tracemalloc é ligado no início de cada fase, então
+        as maiores alocações são as feitas na fase que seguem vivas no fim.
+        """
+        if self.trace and not tracemalloc.is_tracing():
+            tracemalloc.start(TRACE_FRAMES)
+            self._started_tracing = True
+        if self.trace:
+            tracemalloc.reset_peak()
+
+        previous = self._phase
+        self._phase = name
+        self._phase_rss = self._phase_max = current_rss()
+        start = time.perf_counter()
+        try:
+            # Dentro do try: se já começa acima do orçamento, o tracemalloc
+            # é desligado e a fase anterior restaurada
+            self.check()
+            yield self
+
+            rss = current_rss()
+            entry = {
+                'phase': name,
+                'seconds': round(time.perf_counter() - start, 3),
+                'rss_start_mb': _mb(self._phase_rss),
+                'rss_mb': _mb(rss),
+                'rss_max_mb': _mb(max(self._phase_max, rss)),
+            }
+            if self.trace and tracemalloc.is_tracing():
+                traced, traced_peak = tracemalloc.get_traced_memory()
+                snapshot = tracemalloc.take_snapshot()
+                # Agrupar as alocações com o tracemalloc ligado é dezenas de
+                # vezes mais lento; a próxima fase liga de novo
+                self.stop()
+                entry['traced_mb'] = _mb(traced)
+                entry['traced_peak_mb'] = _mb(traced_peak)
+                entry['top'] = self._top_sites(snapshot)
+            self.phases.append(entry)
+            logger.info(
+                f"Memória {self.name}/{name}: RSS {entry['rss_mb']} MB "
+                f"(máx. {entry['rss_max_mb']} MB) em {entry['seconds']} s"
+            )
+            self.check()
+        except BaseException:
+            # Importação interrompida: não deixa o tracemalloc ligado
+            self.stop()
+            raise
+        finally:
+            self._phase = previous
+
+    def step(self, done: int, total: Optional[int] = None):
+        """
+        Confere o orçamento a cada ``CHECK_EVERY`` itens de um laço
+
+        Com ``total``, projeta o crescimento do RSS desde o início da fase
+        até o fim do laço e falha já se a projeção passar do orçamento.
+        """
+        if done % CHECK_EVERY or not done:
+            return
+        rss = current_rss()
+        if rss > self._phase_max:
+            self._phase_max = rss
+        if not self.budget:
+            return
+        self._check_rss(rss)
+
+        if total and done >= total * PROJECTION_MIN_FRACTION:
+            projected = self._phase_rss + (rss - self._phase_rss) * total / done
+            if projected > self.budget:
+                raise MemoryBudgetExceeded(
+                    f"Importação de {self.name}: na fase '{self._phase}' o uso de memória deve chegar a "
+                    f"{_mb(projected)} MB ({done} de {total} itens, RSS atual {_mb(rss)} MB), acima do "
+                    f"orçamento de {_mb(self.budget)} MB (IMPORT_MEMORY_BUDGET_MB)"
+                )
+
+    def check(self):
+        """Falha se o RSS atual já passou do orçamento"""
+        if self.budget:
+            self._check_rss(current_rss())
+
+    def _check_rss(self, rss: int):
+        if rss > self.budget:
+            raise MemoryBudgetExceeded(
+                f"Importação de {self.name}: na fase '{self._phase}' o processo usa {_mb(rss)} MB, "
+                f"acima do orçamento de {_mb(self.budget)} MB (IMPORT_MEMORY_BUDGET_MB)"
+            )
+
+    def _top_sites(self, snapshot: tracemalloc.Snapshot) -> List[Dict]:
+        """Linhas que mais alocaram durante a fase e seguem vivas, pela linha do projeto mais interna"""
+        base = str(settings.BASE_DIR) + os.sep
+        sites: Dict[str, List[int]] = {}
+        for stat in snapshot.statistics('traceback'):
+            if stat.traceback[-1].filename in (tracemalloc.__file__, __file__):
+                continue
+            frame = next(
+                (f for f in reversed(stat.traceback) if f.filename.startswith(base) and 'site-packages' not in f.filename),
+                stat.traceback[-1],
+            )
+            filename = frame.filename[len(base):] if frame.filename.startswith(base) else frame.filename
+            site = sites.setdefault(f"{filename}:{frame.lineno}", [0, 0])
+            site[0] += stat.size
+            site[1] += stat.count
+
+        largest = sorted(sites.items(), key=lambda item: item[1][0], reverse=True)[:self.top]
+        return [{'site': site, 'mb': _mb(size), 'blocks': count} for site, (size, count) in largest]
+
+    def stop(self):
+        """Desliga o tracemalloc se foi este tracker que ligou"""
+        if self._started_tracing:
+            tracemalloc.stop()
+            self._started_tracing = False
+
+    def report(self) -> Dict:
+        self.stop()
+        return {
+            'name': self.name,
+            'budget_mb': _mb(self.budget) if self.budget else None,
+            'peak_rss_mb': _mb(peak_rss()),
+            'phases': self.phases,
+        }
+
+
+def format_report(report: Dict) -> List[str]:
+    """Relatório de memória em linhas de texto, para os comandos"""
+    budget = f", orçamento {report['budget_mb']} MB" if report['budget_mb'] else ''
+    lines = [f"  memória ({report['name']}): pico de RSS {report['peak_rss_mb']} MB{budget}"]
+    for phase in report['phases']:
+        line = (
+            f"    {phase['phase']}: RSS {phase['rss_start_mb']} -> {phase['rss_mb']} MB "
+            f"(máx. {phase['rss_max_mb']} MB), {phase['seconds']} s"
+        )
+        if 'traced_peak_mb' in phase:
+            line += f", pico Python {phase['traced_peak_mb']} MB"
+        lines.append(line)
+        for site in phase.get('top', []):
+            lines.append(f"      {site['mb']:>8} MB  {site['blocks']:>8} blocos  {site['site']}")
+    return lines
@@ -0,0 +1,237 @@
+import base64
+import json
+from typing import Dict, List, Optional, Sequence, Tuple
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import Q, QuerySet
+from django.utils.functional import cached_property
+
+
+# Páginas exibidas de cada lado da página atual
+ON_EACH_SIDE = 3
+
+# Parâmetros que não são repassados nos links de paginação
+EXCLUDED_PARAMS = ('page', 'cursor', 'export', 'gzip')
+
+# Abaixo desta estimativa o EstimatedCountPaginator faz o COUNT(*) exato
+EXACT_COUNT_THRESHOLD = 10000
+
+
+class CursorPage(Sequence):
+    """
+    Página de um CursorPaginator
+
+    Se comporta como a ``Page`` do Django nos templates (iterável, com
+    ``has_next``/``has_previous``), mas sem número de página nem total.
+    """
+
+    def __init__(self, object_list: list, next_cursor: Optional[str], previous_cursor: Optional[str]):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    def has_next(self) -> bool:
+        return self.next_cursor is not None
+
+    def has_previous(self) -> bool:
+        return self.previous_cursor is not None
+
+
+class CursorPaginator:
+    """
+    Paginação por chave (keyset) para querysets de ``values_list``
+
+    Em vez de OFFSET e COUNT(*), cada página filtra a partir da última
+    linha da anterior, então o custo é o mesmo na primeira e na milésima
+    página. A ordenação precisa ser única (termine pela chave primária).
+
+    :param queryset: Queryset de ``values_list(*fields)``
+    :param fields: Campos do ``values_list``, na ordem das tuplas
+    :param ordering: Campos da ordenação, todos presentes em ``fields``
+    """
+
+    LAST = 'last'
+
+    def __init__(self, queryset: QuerySet, per_page: int, fields: Sequence[str], ordering: Sequence[str]):
+        self.queryset = queryset
+        self.per_page = per_page
+        self.ordering = tuple(ordering)
+        self._positions = tuple(list(fields).index(field) for field in self.ordering)
+
+    def page(self, cursor: Optional[str] = None) -> CursorPage:
+        """Página a partir do cursor (cursor inválido ou ausente: primeira página)"""
+        direction, values = self._decode(cursor)
+        return self._build(list(self._page_queryset(direction, values)), direction, values)
+
+    async def apage(self, cursor: Optional[str] = None) -> CursorPage:
+        """``page`` com o ORM assíncrono"""
+        direction, values = self._decode(cursor)
+        rows = [row async for row in self._page_queryset(direction, values)]
+        return self._build(rows, direction, values)
+
+    def _page_queryset(self, direction: str, values: Optional[List]) -> QuerySet:
+        limit = self.per_page + 1
+        if direction == 'p':
+            # Página anterior (ou última): lê de trás para frente e inverte
+            queryset = self.queryset.order_by(*('-' + field for field in self.ordering))
+            if values is not None:
+                queryset = queryset.filter(self._keyset(values, 'lt'))
+        else:
+            queryset = self.queryset.order_by(*self.ordering)
+            if values is not None:
+                queryset = queryset.filter(self._keyset(values, 'gt'))
+        return queryset[:limit]
+
+    def _build(self, rows: list, direction: str, values: Optional[List]) -> CursorPage:
+        has_more = len(rows) > self.per_page
+        if direction == 'p':
+            rows = rows[:self.per_page][::-1]
+            has_previous, has_next = has_more, values is not None
+        else:
+            rows = rows[:self.per_page]
+            has_previous, has_next = values is not None, has_more
+
+        return CursorPage(
+            rows,
+            next_cursor=self._encode('n', rows[-1]) if has_next and rows else None,
+            previous_cursor=self._encode('p', rows[0]) if has_previous and rows else None,
+        )
+
+    def _keyset(self, values: List, lookup: str) -> Q:
+        """
+        (a, b) > (x, y) como a >= x AND ((a > x) OR (a = x AND b > y))
+
+        O ``a >= x`` é redundante, mas é o que o PostgreSQL usa como Index
+        Cond para começar o índice no cursor; só com o OR ele percorreria
+        o índice desde o início descartando as linhas anteriores.
+        """
+        condition = Q()
+        for i in range(len(self.ordering)):
+            term = Q(**{field: value for field, value in zip(self.ordering[:i], values[:i])})
+            term &= Q(**{f'{self.ordering[i]}__{lookup}': values[i]})
+            condition |= term
+        return Q(**{f'{self.ordering[0]}__{lookup}e': values[0]}) & condition
+
+    def _encode(self, direction: str, row: tuple) -> str:
+        values = [row[i] for i in self._positions]
+        data = json.dumps(values, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+        return direction + base64.urlsafe_b64encode(data).decode('ascii').rstrip('=')
+
+    def _decode(self, cursor: Optional[str]) -> Tuple[str, Optional[List]]:
+        if not cursor:
+            return 'n', None
+        if cursor == self.LAST:
+            return 'p', None
+        try:
+            data = cursor[1:]
+            values = json.loads(base64.urlsafe_b64decode(data + '=' * (-len(data) % 4)))
+        except ValueError:
+            return 'n', None
+        if cursor[0] not in ('n', 'p') or not isinstance(values, list) or len(values) != len(self.ordering):
+            return 'n', None
+        return cursor[0], values
+
+
+def estimated_count(queryset: QuerySet) -> Optional[int]:
+    """
+    Número de linhas estimado pelo PostgreSQL, sem percorrer a tabela
+
+    Sem filtros usa o ``reltuples`` da tabela; com filtros, a estimativa do
+    plano. None se não há estimativa (outro banco ou tabela sem ANALYZE).
+    """
+    connection = connections[queryset.db]
+    if connection.vendor != 'postgresql':
+        return None
+
+    if not queryset.query.where:
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'SELECT reltuples FROM pg_class WHERE oid = %s::regclass',
+                [connection.ops.quote_name(queryset.model._meta.db_table)],
+            )
+            row = cursor.fetchone()
+        return int(row[0]) if row and row[0] >= 0 else None
+
+    plan = json.loads(queryset.order_by().explain(format='json'))
+    if isinstance(plan, list):
+        # Conforme o driver o EXPLAIN vem como lista de um plano ou o próprio plano
+        plan = plan[0]
+    return int(plan['Plan']['Plan Rows'])
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Paginator do admin para tabelas grandes: total estimado em vez de COUNT(*)
+
+    Usar com ``show_full_result_count = False`` no ModelAdmin. Quando a
+    estimativa é pequena (menos de EXACT_COUNT_THRESHOLD linhas) conta de
+    verdade, então filtros seletivos mostram o total exato.
+    """
+
+    @cached_property
+    def count(self) -> int:
+        estimate = estimated_count(self.object_list)
+        if estimate is None or estimate < EXACT_COUNT_THRESHOLD:
+            return super().count
+        return estimate
+
+
+def _base_query(params) -> str:
+    """Query string dos filtros atuais, montada uma única vez"""
+    params = params.copy()
+    for name in EXCLUDED_PARAMS:
+        params.pop(name, None)
+    query = params.urlencode()
+    return f'?{query}&' if query else '?'
+
+
+def pagination_links(page_obj, params) -> Dict:
+    """
+    Links de paginação para uma ``Page`` do Django ou uma ``CursorPage``
+
+    Calcula só a janela de ON_EACH_SIDE páginas em volta da atual, então o
+    custo não depende do total de páginas.
+
+    :param params: ``request.GET``
+    :return: Dicionário com ``first``, ``previous``, ``next``, ``last``
+        (URL ou None), ``pages`` (lista de (rótulo, URL ou None, é a
+        atual)) e ``label`` da página atual
+    """
+    base = _base_query(params)
+
+    if isinstance(page_obj, CursorPage):
+        return {
+            'first': base.rstrip('&') if page_obj.has_previous() else None,
+            'previous': f'{base}cursor={page_obj.previous_cursor}' if page_obj.has_previous() else None,
+            'next': f'{base}cursor={page_obj.next_cursor}' if page_obj.has_next() else None,
+            'last': f'{base}cursor={CursorPaginator.LAST}' if page_obj.has_next() else None,
+            'pages': [],
+            'label': '',
+        }
+
+    number = page_obj.number
+    num_pages = page_obj.paginator.num_pages
+    label = f'{number} de {num_pages}'
+    pages = []
+    for i in page_obj.paginator.get_elided_page_range(number, on_each_side=ON_EACH_SIDE, on_ends=0):
+        if i == number:
+            pages.append((label, None, True))
+        elif isinstance(i, int):
+            pages.append((i, f'{base}page={i}', False))
+        else:
+            pages.append((i, None, False))
+
+    return {
+        'first': f'{base}page=1' if page_obj.has_previous() else None,
+        'previous': f'{base}page={number - 1}' if page_obj.has_previous() else None,
+        'next': f'{base}page={number + 1}' if page_obj.has_next() else None,
+        'last': f'{base}page={num_pages}' if page_obj.has_next() else None,
+        'pages': pages,
+        'label': label,
+    }
@@ -0,0 +1,347 @@
+"""
+Profiling opcional de comandos e de requisições
+
+Comandos (``import_ibge``, ``import_empresas``, ``delete_data``) aceitam
+``--profile [DIRETORIO]`` e gravam, para cada execução:
+
+- ``<nome>-<data>.prof``: estatísticas do cProfile (``python -m pstats``,
+  snakeviz etc.)
+- ``<nome>-<data>.txt``: as funções com maior tempo acumulado
+- ``<nome>-<data>.collapsed``: pilhas amostradas no formato do
+  flamegraph.pl / speedscope / inferno (``a;b;c 12``)
+
+Requisições de usuários staff são perfiladas com o cabeçalho
+``X-Profile: 1`` ou por sorteio (``PROFILE_SAMPLE_RATE``). Para cada view
+ficam só as ``PROFILE_KEEP`` mais lentas, em ``PROFILE_DIR/requests``, e
+``/api/profiles/`` lista o que foi guardado.
+
+Em WSGI o profile é exato: a requisição inteira roda em uma thread. Em
+ASGI ela se espalha entre o event loop e a thread do ``sync_to_async``
+da requisição (uma por requisição, pelo ``ThreadSensitiveContext`` do
+Django), e o cProfile só enxerga a thread em que foi ligado: o profile
+junta um cProfile de cada uma. O lado do event loop inclui as corrotinas
+de outras requisições que o worker atendeu no meio tempo, e chamadas com
+``thread_sensitive=False`` ficam de fora; sob carga, compare com o mesmo
+endpoint em WSGI (``GUNICORN_ASGI=0``).
+"""
+import cProfile
+import io
+import os
+import pstats
+import random
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, List, Optional
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.contrib.admin.views.decorators import staff_member_required
+from django.http import JsonResponse
+from django.views.decorators.http import require_GET
+
+
+# Intervalo entre amostras de pilha, em segundos
+SAMPLE_INTERVAL = 0.005
+
+# Funções listadas no resumo em texto
+SUMMARY_LINES = 40
+
+PROFILE_HEADER = 'X-Profile'
+
+
+def profile_dir() -> Path:
+    return Path(getattr(settings, 'PROFILE_DIR', 'profiles'))
+
+
+def _short_path(filename: str) -> str:
+    """Caminho curto para as pilhas: a partir do site-packages ou do projeto"""
+    marker = 'site-packages' + os.sep
+    if marker in filename:
+        return filename.split(marker, 1)[1]
+    base = str(settings.BASE_DIR) + os.sep
+    if filename.startswith(base):
+        return filename[len(base):]
+    return filename
+
+
+class StackSampler:
+    """
+    Amostra periodicamente a pilha de uma thread e conta as pilhas iguais
+
+    Roda em uma thread à parte lendo ``sys._current_frames()``, então não
+    depende de hooks por chamada e custa pouco mesmo com cProfile ligado.
+    """
+
+    def __init__(self, interval: float = SAMPLE_INTERVAL, thread_id: Optional[int] = None):
+        self.interval = interval
+        self.thread_id = thread_id
+        self.stacks: Counter = Counter()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._names: Dict = {}
+
+    def start(self):
+        if self.thread_id is None:
+            self.thread_id = threading.get_ident()
+        self._thread = threading.Thread(target=self._run, name='stack-sampler', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def _name(self, code) -> str:
+        name = self._names.get(code)
+        if name is None:
+            name = self._names[code] = f"{code.co_name} ({_short_path(code.co_filename)}:{code.co_firstlineno})"
+        return name
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                stack.append(self._name(frame.f_code))
+                frame = frame.f_back
+            if stack:
+                self.stacks[';'.join(reversed(stack))] += 1
+
+    def collapsed(self) -> str:
+        return ''.join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+
+def _summary(*profilers: cProfile.Profile, sort: str = 'cumulative') -> str:
+    """Funções com maior tempo acumulado, somando os profilers"""
+    output = io.StringIO()
+    stats = pstats.Stats(*profilers, stream=output)
+    stats.sort_stats(sort).print_stats(SUMMARY_LINES)
+    return output.getvalue()
+
+
+@contextmanager
+def profiled(directory: Optional[str], name: str):
+    """
+    Perfila o bloco com cProfile e com o amostrador de pilhas
+
+    Com ``directory`` vazio não faz nada (e devolve None). Senão devolve um
+    dict que, ao sair do bloco, recebe os caminhos dos arquivos gravados.
+    """
+    if not directory:
+        yield None
+        return
+
+    directory = Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+    stem = directory / f"{name}-{time.strftime('%Y%m%d-%H%M%S')}"
+    files: Dict[str, str] = {}
+
+    profiler = cProfile.Profile()
+    sampler = StackSampler()
+    sampler.start()
+    profiler.enable()
+    try:
+        yield files
+    finally:
+        profiler.disable()
+        sampler.stop()
+
+        profiler.dump_stats(f"{stem}.prof")
+        Path(f"{stem}.txt").write_text(_summary(profiler), encoding='utf-8')
+        Path(f"{stem}.collapsed").write_text(sampler.collapsed(), encoding='utf-8')
+        files.update({kind: f"{stem}.{kind}" for kind in ('prof', 'txt', 'collapsed')})
+
+
+def add_profile_argument(parser):
+    """Opção ``--profile [DIRETORIO]`` dos comandos"""
+    parser.add_argument(
+        '--profile',
+        nargs='?',
+        const=str(profile_dir()),
+        default=None,
+        metavar='DIRETORIO',
+        help='Grava cProfile, resumo e pilhas amostradas (flamegraph) da execução '
+             f'(padrão: {profile_dir()})'
+    )
+
+
+def write_profile_files(stdout, files: Optional[Dict[str, str]]):
+    """Mostra onde o comando gravou o profile"""
+    if not files:
+        return
+    stdout.write(f"Profile gravado em {files['prof']}")
+    stdout.write(f"  flamegraph: flamegraph.pl {files['collapsed']} > flamegraph.svg")
+
+
+@contextmanager
+def profiled_command(stdout, directory: Optional[str], name: str):
+    """
+    ``profiled`` para comandos: mostra os arquivos gravados ao sair do bloco
+
+    Também quando o comando falha, que é justamente a execução que se quer
+    examinar.
+    """
+    files = None
+    try:
+        with profiled(directory, name) as files:
+            yield files
+    finally:
+        write_profile_files(stdout, files)
+
+
+# Só um cProfile pode estar ativo por processo
+_request_lock = threading.Lock()
+
+
+def _view_dir(view: str) -> Path:
+    return profile_dir() / 'requests' / re.sub(r'[^\w.-]+', '_', view)
+
+
+def _keep_slowest(directory: Path, keep: int):
+    """Remove os profiles mais rápidos da view além dos ``keep`` mais lentos"""
+    profiles = sorted(directory.glob('*.prof'), key=lambda p: int(p.name.split('-', 1)[0]), reverse=True)
+    for path in profiles[keep:]:
+        for suffix in ('.prof', '.txt'):
+            path.with_suffix(suffix).unlink(missing_ok=True)
+
+
+def _sampled(request) -> bool:
+    if request.headers.get(PROFILE_HEADER) == '1':
+        return True
+    rate = getattr(settings, 'PROFILE_SAMPLE_RATE', 0.0)
+    return rate > 0 and random.random() < rate
+
+
+def _should_profile(request) -> bool:
+    # Sorteia antes de olhar o usuário, para não carregar a sessão à toa
+    if not _sampled(request):
+        return False
+    user = getattr(request, 'user', None)
+    return user is not None and user.is_staff
+
+
+async def _ashould_profile(request) -> bool:
+    if not _sampled(request) or not hasattr(request, 'auser'):
+        return False
+    user = await request.auser()
+    return user.is_staff
+
+
+def _save_request_profile(request, response, elapsed_ms: int, *profilers: cProfile.Profile):
+    """Grava o profile (os cProfiles somados) e mantém só os mais lentos da view"""
+    match = request.resolver_match
+    view = match.view_name if match else '<unresolved>'
+    directory = _view_dir(view)
+    directory.mkdir(parents=True, exist_ok=True)
+    stem = directory / f"{elapsed_ms:08d}-{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}"
+    pstats.Stats(*profilers).dump_stats(f"{stem}.prof")
+    header = f"{request.method} {request.get_full_path()} {response.status_code} {elapsed_ms} ms\n\n"
+    Path(f"{stem}.txt").write_text(header + _summary(*profilers), encoding='utf-8')
+    _keep_slowest(directory, getattr(settings, 'PROFILE_KEEP', 5))
+
+    if Path(f"{stem}.prof").exists():
+        response['X-Profile-Id'] = f"{directory.name}/{stem.name}"
+
+
+class RequestProfilerMiddleware:
+    """
+    Perfila requisições de staff e guarda as mais lentas por view
+
+    Precisa vir depois do ``AuthenticationMiddleware``. Se outra requisição
+    do processo já está sendo perfilada, esta segue sem profile. Em ASGI
+    soma o cProfile do event loop durante o ``await`` da requisição ao da
+    thread do ``sync_to_async`` dela (ver o docstring do módulo).
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+
+        if not _should_profile(request) or not _request_lock.acquire(blocking=False):
+            return self.get_response(request)
+
+        try:
+            profiler = cProfile.Profile()
+            start = time.perf_counter()
+            profiler.enable()
+            try:
+                response = self.get_response(request)
+            finally:
+                profiler.disable()
+            elapsed_ms = int((time.perf_counter() - start) * 1000)
+        finally:
+            _request_lock.release()
+
+        _save_request_profile(request, response, elapsed_ms, profiler)
+        return response
+
+    async def __acall__(self, request):
+        if not await _ashould_profile(request) or not _request_lock.acquire(blocking=False):
+            return await self.get_response(request)
+
+        try:
+            loop_profiler = cProfile.Profile()
+            # Ligado na thread do sync_to_async da requisição, que atende
+            # todas as chamadas thread_sensitive dela (ORM, render etc.)
+            sync_profiler = cProfile.Profile()
+            start = time.perf_counter()
+            await sync_to_async(sync_profiler.enable)()
+            loop_profiler.enable()
+            try:
+                response = await self.get_response(request)
+            finally:
+                loop_profiler.disable()
+                await sync_to_async(sync_profiler.disable)()
+            elapsed_ms = int((time.perf_counter() - start) * 1000)
+        finally:
+            _request_lock.release()
+
+        await sync_to_async(_save_request_profile, thread_sensitive=False)(
+            request, response, elapsed_ms, loop_profiler, sync_profiler,
+        )
+        return response
+
+
+@staff_member_required
+@require_GET
+def profiles_view(request):
+    """Profiles de requisições guardados, por view, do mais lento ao mais rápido"""
+    root = profile_dir() / 'requests'
+
+    profile_id = request.GET.get('id')
+    if profile_id:
+        # Resumo em texto de um profile específico
+        view, _, stem = profile_id.partition('/')
+        summary = root / view / f"{stem}.txt"
+        if '..' in profile_id or not summary.is_file():
+            return JsonResponse({'error': 'profile não encontrado'}, status=404)
+        return JsonResponse({'id': profile_id, 'summary': summary.read_text(encoding='utf-8')})
+
+    views: Dict[str, List[Dict]] = {}
+    if root.is_dir():
+        for directory in sorted(p for p in root.iterdir() if p.is_dir()):
+            entries = []
+            for path in sorted(directory.glob('*.prof'), reverse=True):
+                summary = path.with_suffix('.txt')
+                entries.append({
+                    'id': f"{directory.name}/{path.stem}",
+                    'ms': int(path.name.split('-', 1)[0]),
+                    'request': summary.read_text(encoding='utf-8').split('\n', 1)[0] if summary.exists() else None,
+                    'prof': str(path),
+                })
+            views[directory.name] = entries
+
+    return JsonResponse({'views': views})
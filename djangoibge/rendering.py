@@ -0,0 +1,61 @@
+from html import escape
+from string import Formatter
+from typing import Iterable, Sequence, Tuple, Union
+from django.conf import settings
+from django.utils.formats import localize
+from django.utils.safestring import SafeString, mark_safe
+
+
+class RowTemplate:
+    """
+    Template de linha de tabela pré-compilado para listagens
+
+    Renderiza tuplas vindas de ``values_list(*fields)`` direto em HTML, sem
+    instâncias de modelo nem resolução de atributos do template engine.
+    Cada célula é uma string de formatação com os nomes dos campos, ou um
+    par (formato, vazio): aí, se algum campo usado estiver vazio, a célula
+    mostra o valor vazio (como o filtro ``default`` do Django). Os valores
+    são localizados como no template (números no formato do idioma).
+
+    :param fields: Campos na ordem do ``values_list``
+    :type fields: Sequence[str]
+    :param cells: Formato de cada célula (ex: ``'{uf_nome} ({uf_sigla})'`` ou ``('{regiao__nome}', '-')``)
+    :type cells: Sequence[Union[str, Tuple[str, str]]]
+    """
+
+    def __init__(self, fields: Sequence[str], cells: Sequence[Union[str, Tuple[str, str]]]):
+        self.fields = tuple(fields)
+        positions = {field: i for i, field in enumerate(self.fields)}
+
+        self._cells = []
+        for cell in cells:
+            cell, empty = (cell, None) if isinstance(cell, str) else cell
+            used = [name for _, name, _, _ in Formatter().parse(cell) if name]
+            indexes = tuple(positions[name] for name in used)
+            # Converte os nomes em posições: '{uf_nome} ({uf_sigla})' -> '{2} ({3})'
+            positional = cell.replace('{', '{{').replace('}', '}}')
+            for name in used:
+                positional = positional.replace('{{%s}}' % name, '{%d}' % positions[name])
+            # Sem valor vazio a célula não confere os campos (como {{ campo }} sem default)
+            self._cells.append((positional, indexes if empty is not None else (), empty))
+
+    def render_row(self, row: tuple, plain_ints: bool = False) -> str:
+        # localize() como no template, menos para texto e, sem separador de
+        # milhar, para inteiros (em que ele devolveria o próprio str).
+        # html.escape gera as mesmas entidades do autoescape do Django, sem o custo do wrapper
+        escaped = []
+        for value in row:
+            kind = type(value)
+            if kind is not str:
+                value = str(value) if plain_ints and kind is int else str(localize(value))
+            escaped.append(escape(value))
+        return '<tr><td>' + '</td><td>'.join(
+            fmt.format(*escaped) if all(row[i] for i in indexes) else empty
+            for fmt, indexes, empty in self._cells
+        ) + '</td></tr>'
+
+    def render(self, rows: Iterable[tuple]) -> SafeString:
+        """HTML das linhas, já escapado"""
+        render_row = self.render_row
+        plain_ints = not settings.USE_THOUSAND_SEPARATOR
+        return mark_safe('\n'.join(render_row(row, plain_ints) for row in rows))
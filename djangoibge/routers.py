@@ -0,0 +1,283 @@
+"""
+Leituras das listagens e APIs em uma réplica do PostgreSQL
+
+O ``ReplicaRoutingMiddleware`` marca as requisições GET/HEAD como aptas a
+ler da réplica (``REPLICA_DATABASE``) e o ``ReplicaRouter`` manda para ela
+as leituras dos modelos de ``REPLICA_APPS`` feitas nessas requisições.
+Todo o resto fica no ``default``:
+
+- comandos, importações e qualquer código fora de uma requisição;
+- requisições que escrevem (POST etc.) e, por ``REPLICA_PIN_SECONDS``,
+  as requisições seguintes do mesmo navegador (cookie), para que quem
+  acabou de importar veja os próprios dados;
+- o resto de uma requisição depois da primeira escrita pelo ORM e as
+  leituras dentro de uma transação (``atomic``) no primário, que podem
+  decidir uma escrita;
+- tabelas em que a réplica está atrasada.
+
+O atraso é conferido pelo ``ReplicaMonitor`` a cada
+``REPLICA_CHECK_INTERVAL`` segundos: a réplica precisa estar a menos de
+``REPLICA_MAX_LAG`` segundos do primário e ter a mesma versão dos dados
+(``ibge.versioning``) de cada tabela lida. Como as chaves dos caches usam
+a versão do primário, uma página nunca é montada com dados mais antigos
+que a versão da chave. Uma notificação de mudança marca as tabelas como
+atrasadas até a próxima conferência.
+"""
+import asyncio
+import logging
+import threading
+import time
+from contextvars import ContextVar
+from typing import Dict, Optional, Set
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.apps import apps
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import DEFAULT_DB_ALIAS, connections
+from ibge.versioning import VERSION_TABLE, get_cached_version, get_data_version, listener_active, subscribe
+
+
+logger = logging.getLogger(__name__)
+
+REPLICA_DATABASE = 'replica'
+
+# Apps cujas leituras podem ir para a réplica (sessões, usuários etc. ficam no primário)
+REPLICA_APPS = frozenset({'ibge', 'empresas'})
+
+# Métodos que não escrevem: só eles leem da réplica
+SAFE_METHODS = frozenset({'GET', 'HEAD', 'OPTIONS'})
+
+# Cookie que prende o navegador ao primário depois de uma escrita
+PIN_COOKIE = 'db_primary'
+
+# Atraso de replicação em segundos; zero quando tudo o que chegou já foi
+# aplicado, NULL quando o banco não é uma réplica (dois bancos locais)
+LAG_SQL = """
+    SELECT CASE
+        WHEN NOT pg_is_in_recovery() THEN NULL
+        WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+        ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp())
+    END
+"""
+
+
+class RoutingState:
+    """Situação da requisição atual (mutável, para valer também nas threads do ``sync_to_async``)"""
+
+    __slots__ = ('replica', 'pinned', 'wrote', 'used')
+
+    def __init__(self, replica: bool):
+        self.replica = replica
+        self.pinned = False
+        self.wrote = False
+        self.used: Set[str] = set()
+
+
+_state: ContextVar[Optional[RoutingState]] = ContextVar('db_routing', default=None)
+
+
+def replica_configured() -> bool:
+    return REPLICA_DATABASE in connections
+
+
+def _in_event_loop() -> bool:
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return False
+    return True
+
+
+class ReplicaMonitor:
+    """
+    Atraso e versões dos dados da réplica, relidos no máximo a cada ``REPLICA_CHECK_INTERVAL`` segundos
+
+    Uma thread confere enquanto as outras usam o último resultado. Réplica
+    fora do ar conta como atrasada até a próxima conferência.
+    """
+
+    def __init__(self, alias: str = REPLICA_DATABASE):
+        self.alias = alias
+        self.available = False
+        self.lag: Optional[float] = None
+        self.versions: Dict[str, int] = {}
+        self.primary_versions: Dict[str, int] = {}
+        self.behind: Set[str] = set()
+        self.checked_at: Optional[float] = None
+        self._lock = threading.Lock()
+
+    def ready(self, table: str) -> bool:
+        """Indica se a réplica pode responder pela tabela"""
+        self._maybe_check()
+        if not self.available or table in self.behind:
+            return False
+        if self.lag is not None and self.lag > settings.REPLICA_MAX_LAG:
+            return False
+        # Com o listener a versão do primário está em memória e já reflete
+        # as notificações; sem ele, vale a lida na última conferência
+        if not listener_active():
+            primary = self.primary_versions.get(table, 0)
+        elif _in_event_loop():
+            # Sem consultar o banco no event loop: só com a versão já em memória
+            primary = get_cached_version(table)
+            if primary is None:
+                return False
+        else:
+            primary = get_data_version([table])
+        return self.versions.get(table, 0) >= primary
+
+    def mark_behind(self, tables: Set[str]):
+        """Tabelas alteradas no primário: ficam nele até a réplica alcançar a nova versão"""
+        self.behind |= set(tables)
+
+    def _maybe_check(self):
+        now = time.monotonic()
+        if self.checked_at is not None and now - self.checked_at < settings.REPLICA_CHECK_INTERVAL:
+            return
+        if _in_event_loop():
+            # Sem consultar o banco no event loop: fica a última conferência
+            return
+        if not self._lock.acquire(blocking=False):
+            return
+        try:
+            self.check()
+        finally:
+            self._lock.release()
+
+    def check(self):
+        """Relê o atraso e as versões da réplica (e do primário, sem listener)"""
+        version_sql = f'SELECT "table", version FROM {VERSION_TABLE}'
+        try:
+            with connections[self.alias].cursor() as cursor:
+                cursor.execute(LAG_SQL)
+                lag = cursor.fetchone()[0]
+                cursor.execute(version_sql)
+                versions = dict(cursor.fetchall())
+            if not listener_active():
+                with connections[DEFAULT_DB_ALIAS].cursor() as cursor:
+                    cursor.execute(version_sql)
+                    self.primary_versions = dict(cursor.fetchall())
+        except Exception as e:
+            if self.available or self.checked_at is None:
+                logger.warning(f"Réplica '{self.alias}' indisponível, leituras no primário: {e}")
+            self.available = False
+            connections[self.alias].close()
+        else:
+            if not self.available:
+                logger.info(f"Réplica '{self.alias}' disponível (atraso: {lag} s)")
+            self.available = True
+            self.lag = float(lag) if lag is not None else None
+            self.versions = versions
+            self.behind = set()
+        self.checked_at = time.monotonic()
+
+    def status(self) -> Dict:
+        return {
+            'available': self.available,
+            'lag_seconds': self.lag,
+            'behind': sorted(self.behind),
+            'checked_seconds_ago': round(time.monotonic() - self.checked_at, 1) if self.checked_at else None,
+        }
+
+
+monitor = ReplicaMonitor()
+
+
+def _data_changed(tables: Set[str]):
+    monitor.mark_behind(tables)
+
+
+class ReplicaRouter:
+    """Leituras de ``REPLICA_APPS`` em requisições aptas vão para a réplica; o resto, para o primário"""
+
+    def __init__(self):
+        # Mudanças avisadas pelo listener deixam as tabelas no primário até a próxima conferência
+        tables = [
+            model._meta.db_table for model in apps.get_models(include_auto_created=True)
+            if model._meta.app_label in REPLICA_APPS
+        ]
+        subscribe(tables, _data_changed)
+
+    def db_for_read(self, model, **hints):
+        state = _state.get()
+        alias = DEFAULT_DB_ALIAS
+        if (
+            state is not None and state.replica and not state.pinned
+            and model._meta.app_label in REPLICA_APPS and replica_configured()
+            and not connections[DEFAULT_DB_ALIAS].in_atomic_block
+            and monitor.ready(model._meta.db_table)
+        ):
+            alias = REPLICA_DATABASE
+        if state is not None:
+            state.used.add(alias)
+        return alias
+
+    def db_for_write(self, model, **hints):
+        state = _state.get()
+        if state is not None:
+            # Depois de escrever, a requisição lê o que escreveu
+            state.pinned = state.wrote = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # A réplica é uma cópia do primário: objetos de um e de outro se relacionam
+        databases = {DEFAULT_DB_ALIAS, REPLICA_DATABASE}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+
+class ReplicaRoutingMiddleware:
+    """
+    Marca as requisições que podem ler da réplica e prende ao primário quem escreveu
+
+    Requisições que não são GET/HEAD/OPTIONS, ou que escrevem pelo ORM,
+    gravam o cookie ``PIN_COOKIE`` por ``REPLICA_PIN_SECONDS``; enquanto ele
+    vale, as leituras daquele navegador vão para o primário. Com DEBUG, o
+    cabeçalho ``X-Database`` mostra os bancos lidos.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not replica_configured():
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+
+        state = self._state_for(request)
+        token = _state.set(state)
+        try:
+            response = self.get_response(request)
+        finally:
+            _state.reset(token)
+        return self._finish(request, response, state)
+
+    async def __acall__(self, request):
+        state = self._state_for(request)
+        token = _state.set(state)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _state.reset(token)
+        return self._finish(request, response, state)
+
+    def _state_for(self, request) -> RoutingState:
+        safe = request.method in SAFE_METHODS
+        return RoutingState(replica=safe and PIN_COOKIE not in request.COOKIES)
+
+    def _finish(self, request, response, state: RoutingState):
+        if state.wrote or request.method not in SAFE_METHODS:
+            response.set_cookie(
+                PIN_COOKIE, '1', max_age=settings.REPLICA_PIN_SECONDS, httponly=True, samesite='Lax',
+            )
+        if settings.DEBUG and state.used:
+            response['X-Database'] = ','.join(sorted(state.used))
+        return response
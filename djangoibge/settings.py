@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import tempfile
 from pathlib import Path
 from decouple import config
 
@@ -20,6 +21,29 @@ SECRET_KEY = config('SECRET_KEY')
 EXTERNAL_API_URL = config('API_URL')
 ARCHIVE_URL = config('ARCHIVE_URL')
 
+# Transporte dos downloads (live, record ou replay) - ver djangoibge/transport.py
+HTTP_TRANSPORT = config('HTTP_TRANSPORT', default='live')
+HTTP_FIXTURES_DIR = config('HTTP_FIXTURES_DIR', default=str(BASE_DIR / 'fixtures' / 'http'))
+HTTP_LATENCY_MS = config('HTTP_LATENCY_MS', default=0, cast=float)
+HTTP_BANDWIDTH_KBPS = config('HTTP_BANDWIDTH_KBPS', default=0, cast=float)
+
+# Métricas do Prometheus em /metrics (sem token, só para staff)
+METRICS_TOKEN = config('METRICS_TOKEN', default='')
+METRICS_CACHE = 'shared'
+
+# Token para outros serviços usarem a API de resolução (Authorization: Bearer),
+# sem sessão nem CSRF; vazio: só navegador logado
+RESOLVER_API_TOKEN = config('RESOLVER_API_TOKEN', default='')
+
+# Profiles de comandos (--profile) e de requisições de staff (X-Profile: 1 ou sorteio)
+PROFILE_DIR = config('PROFILE_DIR', default=str(BASE_DIR / 'profiles'))
+PROFILE_SAMPLE_RATE = config('PROFILE_SAMPLE_RATE', default=0.0, cast=float)
+PROFILE_KEEP = config('PROFILE_KEEP', default=5, cast=int)
+
+# Orçamento de memória (RSS) das importações em MB (0: sem limite) e tracemalloc por fase
+IMPORT_MEMORY_BUDGET_MB = config('IMPORT_MEMORY_BUDGET_MB', default=0, cast=int)
+IMPORT_MEMORY_TRACE = config('IMPORT_MEMORY_TRACE', default=False, cast=bool)
+
 # Quick-start development settings - unsuitable for production
 # See https://docs.djangoproject.com/en/5.2/howto/deployment/checklist/
 
@@ -38,6 +62,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     'ibge.apps.IbgeConfig',
     'empresas.apps.EmpresasConfig',
     'custom_auth.apps.AuthConfig',
@@ -50,6 +75,7 @@ LOGIN_REDIRECT_URL = '/'
 LOGOUT_REDIRECT_URL = '/login/'
 
 MIDDLEWARE = [
+    'djangoibge.instrumentation.PerformanceMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -57,6 +83,10 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'djangoibge.routers.ReplicaRoutingMiddleware',
+    'djangoibge.profiling.RequestProfilerMiddleware',
+    # Por último, para medir só a view
+    'djangoibge.instrumentation.ViewTimingMiddleware',
 ]
 
 ROOT_URLCONF = 'djangoibge.urls'
@@ -89,16 +119,66 @@ DATABASES = {
     }
 }
 
+# Réplica de leitura (opcional) - ver djangoibge/routers.py
+# Uma réplica do PostgreSQL (POSTGRES_REPLICA_HOST/PORT) ou, para testar
+# localmente, outro banco no mesmo servidor (POSTGRES_REPLICA_DB)
+POSTGRES_REPLICA_HOST = config('POSTGRES_REPLICA_HOST', default='')
+POSTGRES_REPLICA_DB = config('POSTGRES_REPLICA_DB', default='')
+
+if POSTGRES_REPLICA_HOST or POSTGRES_REPLICA_DB:
+    DATABASES['replica'] = {
+        **DATABASES['default'],
+        'NAME': POSTGRES_REPLICA_DB or DATABASES['default']['NAME'],
+        'USER': config('POSTGRES_REPLICA_USER', default=DATABASES['default']['USER']),
+        'PASSWORD': config('POSTGRES_REPLICA_PASSWORD', default=DATABASES['default']['PASSWORD']),
+        'HOST': POSTGRES_REPLICA_HOST or DATABASES['default']['HOST'],
+        'PORT': config('POSTGRES_REPLICA_PORT', default=DATABASES['default']['PORT']),
+        # Nos testes a réplica é o próprio banco de teste
+        'TEST': {'MIRROR': 'default'},
+    }
+    DATABASE_ROUTERS = ['djangoibge.routers.ReplicaRouter']
+
+# Atraso máximo da réplica em segundos, intervalo entre as conferências e
+# por quanto tempo quem escreveu (POST) lê só do primário
+REPLICA_MAX_LAG = config('REPLICA_MAX_LAG', default=5.0, cast=float)
+REPLICA_CHECK_INTERVAL = config('REPLICA_CHECK_INTERVAL', default=1.0, cast=float)
+REPLICA_PIN_SECONDS = config('REPLICA_PIN_SECONDS', default=15, cast=int)
+
 # Cache configuration
-CACHES = {
-    'default': {
+# Nível local em cada processo na frente de um cache compartilhado: Redis
+# quando REDIS_URL estiver definido, senão o cache em arquivo em FILE_CACHE_DIR
+REDIS_URL = config('REDIS_URL', default='')
+FILE_CACHE_DIR = config('FILE_CACHE_DIR', default=str(Path(tempfile.gettempdir()) / 'djangoibge-cache'))
+
+if REDIS_URL:
+    SHARED_CACHE = {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': REDIS_URL,
+        'TIMEOUT': 3600,  # 1 hora
+    }
+else:
+    SHARED_CACHE = {
         'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
-        'LOCATION': BASE_DIR / 'cache',
+        'LOCATION': FILE_CACHE_DIR,
         'TIMEOUT': 3600,  # 1 hora
         'OPTIONS': {
             'MAX_ENTRIES': 1000,
         }
     }
+
+CACHES = {
+    'default': {
+        'BACKEND': 'djangoibge.cache.TieredCache',
+        'LOCATION': 'default',
+        'TIMEOUT': 3600,  # 1 hora
+        'OPTIONS': {
+            'SHARED': 'shared',
+            'LOCAL_MAX_ENTRIES': 1000,
+            'LOCAL_MAX_BYTES': 64 * 1024 * 1024,
+            'LOCAL_TIMEOUT': 60,
+        }
+    },
+    'shared': SHARED_CACHE,
 }
 
 
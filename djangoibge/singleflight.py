@@ -0,0 +1,102 @@
+import hashlib
+import logging
+import threading
+import time
+from typing import Callable, Dict, Optional, TypeVar
+from django.db import connection
+
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar('T')
+
+# Espera máxima pelo lock entre processos antes de buscar mesmo assim
+LOCK_TIMEOUT = 120.0
+
+# Intervalo entre tentativas do lock (e releituras do cache) enquanto espera
+POLL_INTERVAL = 0.2
+
+_locks: Dict[str, threading.Lock] = {}
+_locks_guard = threading.Lock()
+
+
+def _process_lock(key: str) -> threading.Lock:
+    with _locks_guard:
+        lock = _locks.get(key)
+        if lock is None:
+            lock = _locks[key] = threading.Lock()
+        return lock
+
+
+def _lock_id(key: str) -> int:
+    """Chave do advisory lock (bigint) derivada da chave do cache"""
+    return int.from_bytes(hashlib.blake2b(key.encode('utf-8'), digest_size=8).digest(), 'big', signed=True)
+
+
+def _try_advisory_lock(lock_id: int) -> bool:
+    if connection.vendor != 'postgresql':
+        # Sem advisory locks: só as threads do processo ficam coordenadas
+        return True
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT pg_try_advisory_lock(%s)", [lock_id])
+        return cursor.fetchone()[0]
+
+
+def _advisory_unlock(lock_id: int):
+    if connection.vendor != 'postgresql':
+        return
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT pg_advisory_unlock(%s)", [lock_id])
+
+
+def single_flight(key: str, load: Callable[[], Optional[T]], fetch: Callable[[], T],
+                  timeout: float = LOCK_TIMEOUT) -> T:
+    """
+    Garante uma única busca por chave entre threads e processos
+
+    Quem chega com o cache vazio disputa um lock do processo e depois um
+    advisory lock do PostgreSQL. Só quem obtém os dois chama ``fetch``; os
+    demais releem o cache enquanto esperam e recebem o resultado gravado.
+
+    :param key: Chave do cache
+    :param load: Lê o cache (None quando vazio)
+    :param fetch: Busca e grava o valor no cache
+    :param timeout: Espera máxima pelo lock entre processos
+    """
+    value = load()
+    if value is not None:
+        return value
+
+    with _process_lock(key):
+        value = load()
+        if value is not None:
+            return value
+
+        lock_id = _lock_id(key)
+        deadline = time.monotonic() + timeout
+        while True:
+            acquired = _try_advisory_lock(lock_id)
+            if acquired:
+                break
+            value = load()
+            if value is not None:
+                return value
+            if time.monotonic() >= deadline:
+                logger.warning(f"Lock de {key} não obtido em {timeout:.0f} segundos; buscando sem ele")
+                break
+            time.sleep(POLL_INTERVAL)
+
+        try:
+            # Outro processo pode ter terminado entre a última leitura e o lock
+            value = load()
+            if value is None:
+                value = fetch()
+            return value
+        finally:
+            if acquired:
+                try:
+                    _advisory_unlock(lock_id)
+                except Exception as e:
+                    # Conexão quebrada: o PostgreSQL solta o lock ao encerrar a
+                    # sessão. Não esconde o erro do fetch nem descarta o valor buscado
+                    logger.warning(f"Falha ao liberar o lock de {key}: {e}")
@@ -0,0 +1,626 @@
+import io
+import pstats
+import tempfile
+import threading
+import time
+import tracemalloc
+import uuid
+from decimal import Decimal
+from unittest import mock, skipUnless
+from asgiref.sync import async_to_sync, sync_to_async
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import DEFAULT_DB_ALIAS, connection, connections, transaction
+from django.http import HttpResponse
+from django.test import AsyncRequestFactory, RequestFactory, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import path
+from ibge.models import Regiao
+from empresas.models import Empresa
+from . import exports, instrumentation, profiling, routers, singleflight
+from .cache import TieredCache
+from .memory import MB, MemoryBudgetExceeded, MemoryTracker
+from .rendering import RowTemplate
+from .singleflight import single_flight
+
+
+class RowTemplateTests(SimpleTestCase):
+    template = RowTemplate(
+        ('id', 'nome', 'capital', 'uf_nome', 'uf_sigla'),
+        ('{id}', '{nome}', ('{capital}', '-'), ('{uf_nome} ({uf_sigla})', '-')),
+    )
+
+    def test_localizes_and_escapes(self):
+        html = self.template.render([(1, 'A & B', Decimal('1500.5'), 'São Paulo', 'SP')])
+        self.assertEqual(html, '<tr><td>1</td><td>A &amp; B</td><td>1500,5</td><td>São Paulo (SP)</td></tr>')
+
+    @override_settings(USE_THOUSAND_SEPARATOR=True)
+    def test_thousand_separator(self):
+        html = self.template.render([(1234567, 'x', 1234.5, 'a', 'b')])
+        self.assertIn('<td>1.234.567</td>', html)
+        self.assertIn('<td>1.234,5</td>', html)
+
+    def test_default_only_where_requested(self):
+        html = self.template.render([(0, '', None, 'São Paulo', None)])
+        self.assertEqual(html, '<tr><td>0</td><td></td><td>-</td><td>-</td></tr>')
+
+
+@override_settings(CACHES={
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'tests-default'},
+    'tests-shared': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'tests-shared'},
+})
+class TieredCacheTests(SimpleTestCase):
+    def make_cache(self, **options):
+        # LOCATION nova a cada teste: o nível local é do processo, por LOCATION
+        options.setdefault('SHARED', 'tests-shared')
+        return TieredCache(f'tests-{uuid.uuid4().hex}', {'OPTIONS': options})
+
+    def test_local_hit_does_not_reach_shared(self):
+        cache = self.make_cache()
+        cache.set('chave', {'valor': 1})
+        with mock.patch.object(caches['tests-shared'], 'get') as shared_get:
+            self.assertEqual(cache.get('chave'), {'valor': 1})
+        shared_get.assert_not_called()
+        self.assertEqual(cache.stats()['local_hits'], 1)
+
+    def test_shared_hit_fills_local_tier(self):
+        cache = self.make_cache()
+        caches['tests-shared'].set('chave', 'compartilhado')
+        self.assertEqual(cache.get('chave'), 'compartilhado')
+        self.assertEqual(cache.get('chave'), 'compartilhado')
+        stats = cache.stats()
+        self.assertEqual((stats['shared_hits'], stats['local_hits']), (1, 1))
+
+    def test_lru_bound_and_eviction(self):
+        cache = self.make_cache(LOCAL_MAX_ENTRIES=2)
+        cache.set('a', 1)
+        cache.set('b', 2)
+        cache.get('a')  # 'b' passa a ser a menos usada
+        cache.set('c', 3)
+        stats = cache.stats()
+        self.assertEqual((stats['local_entries'], stats['evictions']), (2, 1))
+
+        with mock.patch.object(caches['tests-shared'], 'get', return_value=None) as shared_get:
+            self.assertEqual(cache.get('a'), 1)
+            self.assertEqual(cache.get('c'), 3)
+            shared_get.assert_not_called()
+            self.assertIsNone(cache.get('b'))
+            shared_get.assert_called_once()
+
+    def test_byte_bound(self):
+        cache = self.make_cache(LOCAL_MAX_BYTES=4096)
+        for i in range(10):
+            cache.set(f'k{i}', 'x' * 500)
+        self.assertLessEqual(cache.stats()['local_bytes'], 4096)
+        # Maior que um quarto do limite: fica só no compartilhado
+        cache.set('grande', 'x' * 2000)
+        self.assertEqual(caches['tests-shared'].get('grande'), 'x' * 2000)
+        with mock.patch.object(caches['tests-shared'], 'get', return_value=None):
+            self.assertIsNone(cache.get('grande'))
+
+    def test_local_ttl_expiry(self):
+        cache = self.make_cache(LOCAL_TIMEOUT=10)
+        now = time.monotonic()
+        with mock.patch('djangoibge.cache.time.monotonic', return_value=now):
+            cache.set('chave', 'local', timeout=3600)
+        caches['tests-shared'].set('chave', 'novo')
+        with mock.patch('djangoibge.cache.time.monotonic', return_value=now + 5):
+            self.assertEqual(cache.get('chave'), 'local')
+        # Passada a validade local, relê do compartilhado
+        with mock.patch('djangoibge.cache.time.monotonic', return_value=now + 11):
+            self.assertEqual(cache.get('chave'), 'novo')
+
+    def test_timeout_shorter_than_local(self):
+        cache = self.make_cache(LOCAL_TIMEOUT=60)
+        now = time.monotonic()
+        with mock.patch('djangoibge.cache.time.monotonic', return_value=now):
+            cache.set('chave', 'valor', timeout=2)
+        caches['tests-shared'].delete('chave')
+        with mock.patch('djangoibge.cache.time.monotonic', return_value=now + 3):
+            self.assertIsNone(cache.get('chave'))
+
+    def test_invalidation_reaches_local_tier(self):
+        cache = self.make_cache()
+        cache.set('chave', 'valor')
+        cache.delete('chave')
+        self.assertIsNone(cache.get('chave'))
+
+        cache.set('contador', 1)
+        self.assertEqual(cache.incr('contador'), 2)
+        self.assertEqual(cache.get('contador'), 2)
+
+        cache.set('chave', 'valor')
+        cache.clear()
+        self.assertIsNone(cache.get('chave'))
+
+
+try:
+    import fakeredis
+except ImportError:
+    fakeredis = None
+
+# Servidor Redis em memória, no lugar do REDIS_URL da produção
+REDIS_SERVER = fakeredis.FakeServer() if fakeredis else None
+
+
+@skipUnless(fakeredis is not None, 'requer fakeredis (requirements-dev.txt)')
+@override_settings(CACHES={
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'tests-default'},
+    'tests-redis': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': 'redis://tests-redis:6379/0',
+        'OPTIONS': {'connection_class': fakeredis.FakeConnection, 'server': REDIS_SERVER} if fakeredis else {},
+    },
+})
+class RedisTieredCacheTests(SimpleTestCase):
+    """Nível compartilhado no RedisCache, como com REDIS_URL definido"""
+
+    def setUp(self):
+        caches['tests-redis'].clear()
+
+    def make_cache(self, **options):
+        options.setdefault('SHARED', 'tests-redis')
+        return TieredCache(f'tests-{uuid.uuid4().hex}', {'OPTIONS': options})
+
+    def redis_client(self):
+        return caches['tests-redis']._cache.get_client(write=False)
+
+    def test_writes_reach_redis_with_timeout(self):
+        cache = self.make_cache()
+        self.assertEqual(cache.stats()['shared_backend'], 'RedisCache')
+        cache.set('chave', {'valor': 1}, timeout=120)
+        key = caches['tests-redis'].make_key('chave')
+        self.assertTrue(0 < self.redis_client().ttl(key) <= 120)
+        self.assertEqual(caches['tests-redis'].get('chave'), {'valor': 1})
+
+    def test_other_process_reads_through_redis(self):
+        # Cada LOCATION tem seu nível local, como dois workers do gunicorn
+        writer, reader = self.make_cache(), self.make_cache()
+        writer.set('chave', [1, 2, 3])
+        self.assertEqual(reader.get('chave'), [1, 2, 3])
+        self.assertEqual(reader.get('chave'), [1, 2, 3])
+        stats = reader.stats()
+        self.assertEqual((stats['shared_hits'], stats['local_hits']), (1, 1))
+
+    def test_add_and_incr_are_decided_by_redis(self):
+        first, second = self.make_cache(), self.make_cache()
+        self.assertTrue(first.add('trava', 'primeiro'))
+        self.assertFalse(second.add('trava', 'segundo'))
+        self.assertEqual(second.get('trava'), 'primeiro')
+
+        first.set('contador', 1)
+        self.assertEqual(second.incr('contador'), 2)
+        self.assertEqual(first.incr('contador', 5), 7)
+        self.assertEqual(int(caches['tests-redis'].get('contador')), 7)
+
+    def test_delete_and_clear(self):
+        cache = self.make_cache()
+        cache.set('chave', 'valor')
+        cache.delete('chave')
+        self.assertIsNone(cache.get('chave'))
+        self.assertFalse(self.redis_client().exists(caches['tests-redis'].make_key('chave')))
+
+        cache.set('chave', 'valor')
+        cache.clear()
+        self.assertIsNone(cache.get('chave'))
+        self.assertEqual(self.redis_client().dbsize(), 0)
+
+    def test_async_api(self):
+        writer, reader = self.make_cache(), self.make_cache()
+
+        async def roundtrip():
+            await writer.aset('chave', 'assíncrono')
+            return await reader.aget('chave')
+
+        self.assertEqual(async_to_sync(roundtrip)(), 'assíncrono')
+        self.assertEqual(reader.stats()['shared_hits'], 1)
+
+
+class SingleFlightTests(TransactionTestCase):
+    """No PostgreSQL as threads disputam também o advisory lock, cada uma na sua conexão"""
+
+    def test_one_fetch_for_concurrent_callers(self):
+        cache = {}
+        calls = []
+        callers = 16
+        barrier = threading.Barrier(callers)
+        results = [None] * callers
+
+        def fetch():
+            calls.append(1)
+            time.sleep(0.05)  # tempo para os outros chegarem com o cache vazio
+            cache['chave'] = {'dados': len(calls)}
+            return cache['chave']
+
+        def caller(i):
+            barrier.wait()
+            try:
+                results[i] = single_flight('chave', lambda: cache.get('chave'), fetch)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=caller, args=(i,)) for i in range(callers)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(results, [{'dados': 1}] * callers)
+
+    def test_waits_for_other_process(self):
+        # Outro processo tem o advisory lock e grava o cache enquanto este espera
+        cache = {}
+        attempts = []
+
+        def try_lock(lock_id):
+            attempts.append(lock_id)
+            if len(attempts) == 3:
+                cache['chave'] = 'do outro processo'
+            return False
+
+        fetch = mock.Mock()
+        with mock.patch.object(singleflight, '_try_advisory_lock', side_effect=try_lock), \
+                mock.patch.object(singleflight, 'POLL_INTERVAL', 0):
+            self.assertEqual(single_flight('chave', lambda: cache.get('chave'), fetch), 'do outro processo')
+        fetch.assert_not_called()
+
+    def test_unlock_failure_keeps_fetch_error(self):
+        with mock.patch.object(singleflight, '_try_advisory_lock', return_value=True), \
+                mock.patch.object(singleflight, '_advisory_unlock', side_effect=RuntimeError('conexão perdida')), \
+                self.assertLogs('djangoibge.singleflight', 'WARNING'):
+            with self.assertRaises(ValueError):
+                single_flight('chave', lambda: None, mock.Mock(side_effect=ValueError('download falhou')))
+            # Busca concluída: o valor não se perde pela falha ao liberar
+            self.assertEqual(single_flight('chave', lambda: None, lambda: 'valor'), 'valor')
+
+
+@override_settings(METRICS_CACHE='tests-metrics', CACHES={
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'tests-default'},
+    'tests-metrics': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'tests-metrics'},
+})
+class MetricsWorkersTests(SimpleTestCase):
+    def setUp(self):
+        caches['tests-metrics'].clear()
+        self.addCleanup(setattr, instrumentation, '_worker', instrumentation._worker)
+
+    def flush_as(self, worker: str, requests: int):
+        with mock.patch.object(instrumentation, 'worker_id', return_value=worker):
+            instrumentation.flush_snapshot({('v', 'GET', '200'): [requests]})
+
+    def test_concurrent_registrations_are_kept(self):
+        barrier = threading.Barrier(8)
+
+        def flush(i):
+            barrier.wait()
+            self.flush_as(f'w{i}', 1)
+
+        threads = [threading.Thread(target=flush, args=(i,)) for i in range(8)]
+        with mock.patch.object(instrumentation, 'WORKERS_LOCK_ATTEMPTS', 100):
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        self.assertEqual(sorted(caches['tests-metrics'].get(instrumentation.WORKERS_KEY)), [f'w{i}' for i in range(8)])
+
+    def test_registration_waits_for_lock(self):
+        caches['tests-metrics'].add(instrumentation.WORKERS_LOCK_KEY, 'outro')
+        with mock.patch.object(instrumentation.time, 'sleep'):
+            self.flush_as('w1', 1)
+        self.assertIsNone(caches['tests-metrics'].get(instrumentation.WORKERS_KEY))
+        caches['tests-metrics'].delete(instrumentation.WORKERS_LOCK_KEY)
+        self.flush_as('w1', 1)
+        self.assertEqual(caches['tests-metrics'].get(instrumentation.WORKERS_KEY), ['w1'])
+
+    def test_reused_pid_does_not_overwrite_counters(self):
+        with mock.patch('os.getpid', return_value=4242):
+            instrumentation._worker = (None, None)
+            first = instrumentation.worker_id()
+            instrumentation._worker = (None, None)  # novo processo com o mesmo PID
+            second = instrumentation.worker_id()
+        self.assertNotEqual(first, second)
+        self.flush_as(first, 5)
+        self.flush_as(second, 1)
+        with mock.patch.object(instrumentation.registry, 'snapshot', return_value={}):
+            self.assertEqual(instrumentation.collect()[('v', 'GET', '200')], [6])
+
+    @override_settings(METRICS_TOKEN='segredo')
+    def test_metrics_token(self):
+        def status(**headers):
+            request = RequestFactory().get('/metrics', headers=headers)
+            request.user = mock.Mock(is_authenticated=True, is_staff=True)
+            return instrumentation.metrics_view(request).status_code
+
+        self.assertEqual(status(Authorization='Bearer segredo'), 200)
+        self.assertEqual(status(Authorization='Bearer segred'), 401)
+        self.assertEqual(status(Authorization='Bearer ségredo'), 401)
+        # Com o token definido, ser staff não basta
+        self.assertEqual(status(), 401)
+
+    def test_expired_workers_leave_the_list(self):
+        self.flush_as('morto', 1)
+        caches['tests-metrics'].delete('metrics:worker:morto')
+        self.flush_as('novo', 1)
+        self.assertEqual(caches['tests-metrics'].get(instrumentation.WORKERS_KEY), ['novo'])
+
+
+try:
+    import pyarrow.parquet as pq
+except ImportError:
+    pq = None
+
+
+@skipUnless(pq is not None, 'requer pyarrow')
+class ParquetExportTests(TestCase):
+    def test_nullable_column_filled_in_a_later_row_group(self):
+        for cnpj, nome, ente in ((1, 'A', None), (2, 'B', None), (3, 'C', 'UNIAO')):
+            Empresa.objects.create(
+                cnpj_basico=cnpj, rasao_social=nome, natureza_juridica=0, clasificacao_do_responsavel=0,
+                capital_social=0, porte=0, ente_federativo_responsavel=ente,
+            )
+        fields = ('cnpj_basico', 'rasao_social', 'ente_federativo_responsavel')
+        with mock.patch.object(exports, 'PARQUET_ROW_GROUP', 2):
+            response = exports.export_response(Empresa.objects.order_by('cnpj_basico'), fields, 'parquet', 'empresas')
+            content = b''.join(response.streaming_content)
+
+        table = pq.read_table(io.BytesIO(content))
+        self.assertEqual(table.num_rows, 3)
+        self.assertEqual(str(table.schema.field('ente_federativo_responsavel').type), 'string')
+        self.assertEqual(table.column('ente_federativo_responsavel').to_pylist(), [None, None, 'UNIAO'])
+        self.assertEqual(str(table.schema.field('cnpj_basico').type), 'int64')
+
+
+class ExportActionTests(TestCase):
+    def setUp(self):
+        Regiao.objects.create(id=1, sigla='N', nome='Norte')
+        self.action = exports.export_action(('id', 'nome'), 'regioes')
+
+    def test_asgi_streams_without_buffering(self):
+        response = self.action(None, AsyncRequestFactory().get('/admin/'), Regiao.objects.all())
+        self.assertTrue(response.is_async)
+
+        async def consume():
+            return b''.join([chunk async for chunk in response.streaming_content])
+
+        self.assertIn(b'Norte', async_to_sync(consume)())
+
+    def test_wsgi_response_unchanged(self):
+        response = self.action(None, RequestFactory().get('/admin/'), Regiao.objects.all())
+        self.assertFalse(response.is_async)
+        self.assertIn(b'Norte', b''.join(response.streaming_content))
+
+
+class MemoryTrackerTests(SimpleTestCase):
+    def test_budget_exceeded_at_phase_start_cleans_up(self):
+        tracker = MemoryTracker('teste', budget_mb=1, trace=True)
+        with mock.patch('djangoibge.memory.current_rss', return_value=2 * MB):
+            with self.assertRaises(MemoryBudgetExceeded):
+                with tracker.phase('download'):
+                    self.fail('a fase não deveria começar acima do orçamento')
+        self.assertIsNone(tracker._phase)
+        self.assertFalse(tracemalloc.is_tracing())
+
+    def test_phase_report(self):
+        tracker = MemoryTracker('teste', budget_mb=0, trace=False)
+        with tracker.phase('montagem'):
+            pass
+        phases = tracker.report()['phases']
+        self.assertEqual([phase['phase'] for phase in phases], ['montagem'])
+
+
+def _profiled_work():
+    return sum(range(1000))
+
+
+def profiled_sync_view(request):
+    return HttpResponse(str(_profiled_work()))
+
+
+async def profiled_async_view(request):
+    return HttpResponse(str(await sync_to_async(_profiled_work)()))
+
+
+def regioes_view(request):
+    return HttpResponse(str(Regiao.objects.count()))
+
+
+async def regioes_api(request):
+    return HttpResponse(str(await Regiao.objects.acount()))
+
+
+def criar_regiao_view(request):
+    Regiao.objects.create(id=9, sigla='T', nome='Teste')
+    return HttpResponse(str(Regiao.objects.count()))
+
+
+def regioes_atomic_view(request):
+    with transaction.atomic():
+        total = Regiao.objects.count()
+        Regiao.objects.filter(sigla='T').update(nome='Teste')
+    return HttpResponse(str(total))
+
+
+urlpatterns = [
+    path('sync/', profiled_sync_view, name='profiled_sync'),
+    path('async/', profiled_async_view, name='profiled_async'),
+    path('regioes/', regioes_view),
+    path('api/regioes/', regioes_api),
+    path('regioes/criar/', criar_regiao_view),
+    path('regioes/atomic/', regioes_atomic_view),
+]
+
+
+@override_settings(ROOT_URLCONF=__name__, PROFILE_SAMPLE_RATE=0.0)
+class RequestProfilerTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.staff = get_user_model().objects.create_user('staff', password='senha', is_staff=True)
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.enterContext(override_settings(PROFILE_DIR=directory.name))
+
+    def functions(self, response) -> set:
+        view, _, stem = response['X-Profile-Id'].partition('/')
+        stats = pstats.Stats(str(profiling.profile_dir() / 'requests' / view / f'{stem}.prof'))
+        return {name for _, _, name in stats.stats}
+
+    def test_wsgi(self):
+        self.client.force_login(self.staff)
+        response = self.client.get('/sync/', headers={'X-Profile': '1'})
+        self.assertLessEqual({'profiled_sync_view', '_profiled_work'}, self.functions(response))
+
+    async def test_asgi_profiles_event_loop_and_sync_thread(self):
+        await self.async_client.aforce_login(self.staff)
+        response = await self.async_client.get('/async/', headers={'X-Profile': '1'})
+        # A view roda no event loop; _profiled_work, na thread do sync_to_async
+        self.assertLessEqual({'profiled_async_view', '_profiled_work'}, self.functions(response))
+
+    async def test_asgi_without_header_is_not_profiled(self):
+        await self.async_client.aforce_login(self.staff)
+        response = await self.async_client.get('/async/')
+        self.assertNotIn('X-Profile-Id', response)
+
+    def test_non_staff_is_not_profiled(self):
+        self.client.force_login(get_user_model().objects.create_user('comum', password='senha'))
+        response = self.client.get('/sync/', headers={'X-Profile': '1'})
+        self.assertNotIn('X-Profile-Id', response)
+
+
+def _reads(captured, table='ibge_regiao'):
+    return [q['sql'] for q in captured.captured_queries if table in q['sql'] and q['sql'].lstrip().startswith('SELECT')]
+
+
+@override_settings(ROOT_URLCONF=__name__, DATABASE_ROUTERS=['djangoibge.routers.ReplicaRouter'])
+class ReplicaRouterTests(TransactionTestCase):
+    """
+    Roteamento com o alias ``replica`` espelhando o banco de teste
+
+    O runner só configura os aliases do settings da inicialização, então o
+    alias é criado aqui como ele faria com ``TEST: {'MIRROR': 'default'}``.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        # Aqui e não na classe: o runner confere os bancos dos testes antes disso
+        cls.databases = {DEFAULT_DB_ALIAS, routers.REPLICA_DATABASE}
+        connections.settings[routers.REPLICA_DATABASE] = {
+            **connections[DEFAULT_DB_ALIAS].settings_dict, 'TEST': {'MIRROR': DEFAULT_DB_ALIAS},
+        }
+        connections[routers.REPLICA_DATABASE].creation.set_as_test_mirror(
+            connections[DEFAULT_DB_ALIAS].settings_dict
+        )
+        super().setUpClass()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        connections[routers.REPLICA_DATABASE].close()
+        del connections[routers.REPLICA_DATABASE]
+        del connections.settings[routers.REPLICA_DATABASE]
+
+    def setUp(self):
+        # A conferência de atraso usa funções do PostgreSQL: aqui a réplica está sempre em dia
+        ready = mock.patch.object(routers.monitor, 'ready', return_value=True)
+        ready.start()
+        self.addCleanup(ready.stop)
+        Regiao.objects.create(id=1, sigla='N', nome='Norte')
+
+    def request(self, method, url, **kwargs):
+        with CaptureQueriesContext(connections[DEFAULT_DB_ALIAS]) as primary, \
+                CaptureQueriesContext(connections[routers.REPLICA_DATABASE]) as replica:
+            response = getattr(self.client, method)(url, **kwargs)
+        self.assertEqual(response.status_code, 200)
+        return response, _reads(primary), _reads(replica)
+
+    @override_settings(DEBUG=True)
+    def test_get_reads_from_replica(self):
+        response, primary, replica = self.request('get', '/regioes/')
+        self.assertEqual((len(primary), len(replica)), (0, 1))
+        self.assertEqual(response['X-Database'], routers.REPLICA_DATABASE)
+        self.assertNotIn(routers.PIN_COOKIE, response.cookies)
+
+    def test_async_api_reads_from_replica(self):
+        # O estado da requisição chega à thread do sync_to_async
+        _, primary, replica = self.request('get', '/api/regioes/')
+        self.assertEqual((len(primary), len(replica)), (0, 1))
+
+    def test_post_reads_and_writes_on_primary(self):
+        response, primary, replica = self.request('post', '/regioes/criar/')
+        self.assertEqual(response.content, b'2')
+        self.assertEqual(replica, [])
+        self.assertEqual(len(primary), 1)
+        self.assertIn(routers.PIN_COOKIE, response.cookies)
+
+    def test_reads_after_a_write_stay_on_primary(self):
+        response, primary, replica = self.request('get', '/regioes/criar/')
+        self.assertEqual(response.content, b'2')
+        self.assertEqual((len(primary), len(replica)), (1, 0))
+        # Quem escreveu fica no primário nas próximas requisições
+        self.assertIn(routers.PIN_COOKIE, response.cookies)
+        _, primary, replica = self.request('get', '/regioes/')
+        self.assertEqual((len(primary), len(replica)), (1, 0))
+
+    def test_reads_inside_a_transaction_stay_on_primary(self):
+        _, primary, replica = self.request('get', '/regioes/atomic/')
+        self.assertEqual((len(primary), len(replica)), (1, 0))
+
+    def test_outside_a_request_reads_primary(self):
+        self.assertEqual(Regiao.objects.all().db, DEFAULT_DB_ALIAS)
+
+    def test_replica_behind_falls_back_to_primary(self):
+        routers.monitor.ready.return_value = False
+        _, primary, replica = self.request('get', '/regioes/')
+        self.assertEqual((len(primary), len(replica)), (1, 0))
+
+
+class ReplicaNotConfiguredTests(SimpleTestCase):
+    def test_router_reads_primary(self):
+        self.assertNotIn(routers.REPLICA_DATABASE, connections)
+        token = routers._state.set(routers.RoutingState(replica=True))
+        try:
+            self.assertEqual(routers.ReplicaRouter().db_for_read(Regiao), DEFAULT_DB_ALIAS)
+        finally:
+            routers._state.reset(token)
+
+    def test_middleware_not_used(self):
+        with self.assertRaises(MiddlewareNotUsed):
+            routers.ReplicaRoutingMiddleware(lambda request: None)
+
+
+@override_settings(REPLICA_MAX_LAG=5.0, REPLICA_CHECK_INTERVAL=60.0)
+class ReplicaMonitorTests(SimpleTestCase):
+    def monitor(self, **state):
+        monitor = routers.ReplicaMonitor()
+        monitor.available = True
+        monitor.checked_at = time.monotonic()
+        for name, value in state.items():
+            setattr(monitor, name, value)
+        return monitor
+
+    def setUp(self):
+        listener = mock.patch.object(routers, 'listener_active', return_value=False)
+        listener.start()
+        self.addCleanup(listener.stop)
+
+    def test_ready(self):
+        monitor = self.monitor(lag=1.0, versions={'ibge_regiao': 2}, primary_versions={'ibge_regiao': 2})
+        self.assertTrue(monitor.ready('ibge_regiao'))
+
+    def test_lag(self):
+        self.assertFalse(self.monitor(lag=10.0).ready('ibge_regiao'))
+
+    def test_unavailable(self):
+        self.assertFalse(self.monitor(available=False).ready('ibge_regiao'))
+
+    def test_older_data_version(self):
+        monitor = self.monitor(lag=0.0, versions={'ibge_regiao': 1}, primary_versions={'ibge_regiao': 2})
+        self.assertFalse(monitor.ready('ibge_regiao'))
+
+    def test_changed_table_waits_for_next_check(self):
+        monitor = self.monitor(lag=0.0)
+        monitor.mark_behind({'ibge_regiao'})
+        self.assertFalse(monitor.ready('ibge_regiao'))
+        self.assertTrue(monitor.ready('ibge_uf'))
@@ -0,0 +1,283 @@
+"""
+Transporte HTTP plugável para os downloads da API do IBGE e do arquivo da Receita
+
+Modos (setting ``HTTP_TRANSPORT``):
+
+- ``live``: requisições normais
+- ``record``: faz a requisição e grava a resposta como fixture comprimida
+- ``replay``: responde só a partir das fixtures, sem rede, com latência
+  (``HTTP_LATENCY_MS``) e banda (``HTTP_BANDWIDTH_KBPS``) simuladas
+
+Também inclui um servidor local com suporte a Range e ETag:
+
+    python -m djangoibge.transport serve DIRETORIO --port 8001 --latency-ms 50 --bandwidth-kbps 2048
+"""
+import argparse
+import gzip
+import hashlib
+import io
+import json
+import os
+import re
+import time
+from email.utils import formatdate
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Dict, Optional
+import requests
+from requests.adapters import BaseAdapter, HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+
+
+# Cabeçalhos da requisição que fazem parte da chave da fixture
+KEY_HEADERS = ('Accept', 'Range', 'If-None-Match', 'If-Modified-Since')
+
+# Cabeçalhos da resposta que não valem para o corpo gravado (já descomprimido)
+DROPPED_HEADERS = ('Content-Encoding', 'Transfer-Encoding', 'Content-Length', 'Connection')
+
+COPY_CHUNK = 1024 * 1024
+
+
+def fixture_key(method: str, url: str, headers: Dict) -> str:
+    """Chave da fixture: método, URL e os cabeçalhos relevantes"""
+    parts = [method.upper(), url] + [f"{name}: {headers[name]}" for name in KEY_HEADERS if headers.get(name)]
+    return hashlib.sha256('\n'.join(parts).encode('utf-8')).hexdigest()
+
+
+class _ThrottledReader(io.RawIOBase):
+    """Leitura limitada a ``bandwidth`` bytes por segundo"""
+
+    def __init__(self, fileobj, bandwidth: Optional[float]):
+        super().__init__()
+        self._file = fileobj
+        self._bandwidth = bandwidth
+        self._start = None
+        self._bytes = 0
+
+    def readable(self):
+        return True
+
+    def read(self, size=-1):
+        if self._start is None:
+            self._start = time.monotonic()
+        data = self._file.read(size)
+        if self._bandwidth and data:
+            self._bytes += len(data)
+            delay = self._bytes / self._bandwidth - (time.monotonic() - self._start)
+            if delay > 0:
+                time.sleep(delay)
+        return data
+
+    def close(self):
+        self._file.close()
+        super().close()
+
+
+class ReplayAdapter(BaseAdapter):
+    """
+    Adapter do requests que responde a partir das fixtures gravadas
+
+    Em modo de gravação, faz a requisição real, copia o corpo em streaming
+    para ``<chave>.body.gz`` (com os metadados em ``<chave>.json``) e
+    devolve a resposta lida da fixture recém-gravada.
+    """
+
+    def __init__(self, directory, record: bool = False, latency: float = 0.0,
+                 bandwidth: Optional[float] = None):
+        super().__init__()
+        self.directory = Path(directory)
+        self.record = record
+        self.latency = latency
+        self.bandwidth = bandwidth
+        self._live = HTTPAdapter() if record else None
+
+    def send(self, request, stream=False, timeout=None, verify=True, cert=None, proxies=None):
+        key = fixture_key(request.method, request.url, request.headers)
+        meta_path = self.directory / f"{key}.json"
+        body_path = self.directory / f"{key}.body.gz"
+
+        if self.record:
+            self._record(request, meta_path, body_path, timeout, verify, cert, proxies)
+        elif not meta_path.exists():
+            raise requests.ConnectionError(f"Sem fixture para {request.method} {request.url}", request=request)
+
+        if self.latency:
+            time.sleep(self.latency)
+
+        meta = json.loads(meta_path.read_text(encoding='utf-8'))
+        response = requests.Response()
+        response.status_code = meta['status']
+        response.reason = meta.get('reason', '')
+        response.headers = CaseInsensitiveDict(meta['headers'])
+        response.url = request.url
+        response.request = request
+        response.encoding = requests.utils.get_encoding_from_headers(response.headers)
+        response.raw = _ThrottledReader(gzip.open(body_path, 'rb'), self.bandwidth)
+        if not stream:
+            response.content  # noqa: B018 - lê o corpo como o HTTPAdapter faria
+        return response
+
+    def _record(self, request, meta_path: Path, body_path: Path, timeout, verify, cert, proxies):
+        self.directory.mkdir(parents=True, exist_ok=True)
+        live = self._live.send(request, stream=True, timeout=timeout, verify=verify, cert=cert, proxies=proxies)
+        try:
+            size = 0
+            tmp_path = body_path.with_suffix('.tmp')
+            with gzip.open(tmp_path, 'wb', compresslevel=6) as body:
+                for chunk in live.iter_content(COPY_CHUNK):
+                    body.write(chunk)
+                    size += len(chunk)
+            os.replace(tmp_path, body_path)
+        finally:
+            live.close()
+
+        headers = {name: value for name, value in live.headers.items() if name not in DROPPED_HEADERS}
+        headers['Content-Length'] = str(size)
+        meta = {
+            'method': request.method,
+            'url': request.url,
+            'request_headers': {name: request.headers[name] for name in KEY_HEADERS if request.headers.get(name)},
+            'status': live.status_code,
+            'reason': live.reason,
+            'headers': headers,
+            'recorded_at': time.time(),
+        }
+        meta_path.write_text(json.dumps(meta, ensure_ascii=False, indent=2), encoding='utf-8')
+
+    def close(self):
+        if self._live is not None:
+            self._live.close()
+
+
+def http_session() -> requests.Session:
+    """Sessão HTTP configurada pelo modo de transporte das settings"""
+    from django.conf import settings
+
+    session = requests.Session()
+    mode = getattr(settings, 'HTTP_TRANSPORT', 'live')
+    if mode == 'live':
+        return session
+    if mode not in ('record', 'replay'):
+        raise ValueError(f"HTTP_TRANSPORT inválido: {mode}")
+
+    latency_ms = getattr(settings, 'HTTP_LATENCY_MS', 0)
+    bandwidth_kbps = getattr(settings, 'HTTP_BANDWIDTH_KBPS', 0)
+    adapter = ReplayAdapter(
+        settings.HTTP_FIXTURES_DIR,
+        record=(mode == 'record'),
+        latency=latency_ms / 1000,
+        bandwidth=bandwidth_kbps * 1024 if bandwidth_kbps else None,
+    )
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+
+class StandInHandler(SimpleHTTPRequestHandler):
+    """
+    Servidor de arquivos com ETag, If-None-Match e Range (um intervalo)
+
+    Caminhos sem extensão com um ``.json`` ao lado (ex: ``municipios`` ->
+    ``municipios.json``) são servidos como JSON, imitando a API do IBGE.
+    """
+
+    latency = 0.0
+    bandwidth: Optional[float] = None
+
+    def send_head(self):
+        path = Path(self.translate_path(self.path))
+        if not path.is_file() and path.with_suffix('.json').is_file():
+            path = path.with_suffix('.json')
+        if not path.is_file():
+            self.send_error(404, "Arquivo não encontrado")
+            return None
+
+        if self.latency:
+            time.sleep(self.latency)
+
+        stat = path.stat()
+        etag = f'"{stat.st_size:x}-{int(stat.st_mtime):x}"'
+        if self.headers.get('If-None-Match') == etag:
+            self.send_response(304)
+            self.send_header('ETag', etag)
+            self.end_headers()
+            return None
+
+        start, end = 0, stat.st_size - 1
+        match = re.fullmatch(r'bytes=(\d*)-(\d*)', self.headers.get('Range', ''))
+        if match and (match.group(1) or match.group(2)):
+            if match.group(1):
+                start = int(match.group(1))
+                end = min(int(match.group(2)), end) if match.group(2) else end
+            else:
+                start = max(stat.st_size - int(match.group(2)), 0)
+            if start > end:
+                self.send_response(416)
+                self.send_header('Content-Range', f'bytes */{stat.st_size}')
+                self.end_headers()
+                return None
+            self.send_response(206)
+            self.send_header('Content-Range', f'bytes {start}-{end}/{stat.st_size}')
+        else:
+            self.send_response(200)
+
+        self.send_header('Content-Type', self.guess_type(str(path)))
+        self.send_header('Content-Length', str(end - start + 1))
+        self.send_header('Accept-Ranges', 'bytes')
+        self.send_header('ETag', etag)
+        self.send_header('Last-Modified', formatdate(stat.st_mtime, usegmt=True))
+        self.end_headers()
+
+        fileobj = open(path, 'rb')
+        fileobj.seek(start)
+        self._remaining = end - start + 1
+        return fileobj
+
+    def copyfile(self, source, outputfile):
+        reader = _ThrottledReader(source, self.bandwidth)
+        remaining = self._remaining
+        while remaining > 0:
+            data = reader.read(min(COPY_CHUNK, remaining))
+            if not data:
+                break
+            outputfile.write(data)
+            remaining -= len(data)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def serve(directory, port: int = 8001, latency_ms: float = 0, bandwidth_kbps: float = 0,
+          host: str = '127.0.0.1') -> ThreadingHTTPServer:
+    """Cria o servidor local (chamar ``serve_forever`` para atender)"""
+    handler = type('Handler', (StandInHandler,), {
+        'latency': latency_ms / 1000,
+        'bandwidth': bandwidth_kbps * 1024 if bandwidth_kbps else None,
+    })
+    directory = os.fspath(directory)
+    return ThreadingHTTPServer((host, port), lambda *args: handler(*args, directory=directory))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m djangoibge.transport')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    serve_parser = subparsers.add_parser('serve', help='Servidor local de arquivos com Range e ETag')
+    serve_parser.add_argument('directory')
+    serve_parser.add_argument('--port', type=int, default=8001)
+    serve_parser.add_argument('--host', default='127.0.0.1')
+    serve_parser.add_argument('--latency-ms', type=float, default=0)
+    serve_parser.add_argument('--bandwidth-kbps', type=float, default=0)
+    args = parser.parse_args(argv)
+
+    server = serve(args.directory, args.port, args.latency_ms, args.bandwidth_kbps, args.host)
+    print(f"Servindo {args.directory} em http://{args.host}:{args.port}/")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == '__main__':
+    main()
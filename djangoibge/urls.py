@@ -20,7 +20,9 @@ from django.contrib.auth import views as auth_views
 from ibge import views as ibge_views
 from empresas import views as empresas_views
 from custom_auth import views as auth_views_custom
-from django.urls import path, include
+from django.urls import path, re_path, include
+from djangoibge.instrumentation import metrics_view
+from djangoibge.profiling import profiles_view
 
 urlpatterns = [
     path("__reload__/", include("django_browser_reload.urls")),
@@ -32,5 +34,13 @@ urlpatterns = [
     path('municipios/', ibge_views.municipios_view, name='municipios'),
     path('distritos/', ibge_views.distritos_view, name='distritos'),
     path('empresas/', empresas_views.empresas_view, name='empresas'),
+    path('api/busca/', ibge_views.busca_api, name='busca_api'),
+    path('api/resolver/', ibge_views.resolver_api, name='resolver_api'),
+    path('api/resolver/csv/', ibge_views.resolver_csv_api, name='resolver_csv_api'),
+    path('api/v1/localidades/estados/<str:uf>/municipios', ibge_views.localidades_uf_municipios_api, name='localidades_uf_municipios'),
+    path('api/cache/', ibge_views.cache_stats_api, name='cache_stats_api'),
+    re_path(r'^api/v1/localidades/(?P<recurso>estados|municipios|distritos)$', ibge_views.localidades_api, name='localidades'),
+    path('metrics', metrics_view, name='metrics'),
+    path('api/profiles/', profiles_view, name='profiles_api'),
     path('admin/', admin.site.urls),
 ]
@@ -1,24 +1,138 @@
 from django.contrib import admin
+from django.contrib.admin.options import IncorrectLookupParameters
+from django.core.cache import caches
+from django.db.models import Count, Q
+from djangoibge.exports import export_action
+from djangoibge.pagination import EstimatedCountPaginator
+from ibge.versioning import get_data_version
+from .filters import CAPITAL_SOCIAL_FAIXAS, EMPRESA_FIELDS, PORTES
 from .models import Empresa
 
 
+# Validade das opções dos filtros (a versão dos dados já faz parte da chave)
+CHOICES_TIMEOUT = 24 * 3600
+
+# Opções por filtro: com mais valores distintos ficam os mais frequentes
+MAX_CHOICES = 100
+
+
+def distinct_values(model, field: str) -> list:
+    """
+    Valores distintos mais frequentes de uma coluna, em ordem
+
+    É um GROUP BY na tabela inteira, então o resultado fica no cache até a
+    próxima importação (a versão da tabela entra na chave).
+    """
+    version = get_data_version([model._meta.db_table])
+    key = f'admin:choices:{model._meta.label_lower}:{field}:v{version}'
+    cache = caches['default']
+    values = cache.get(key)
+    if values is None:
+        rows = (
+            model.objects.filter(**{f'{field}__isnull': False})
+            .values_list(field).annotate(total=Count('*')).order_by('-total')[:MAX_CHOICES]
+        )
+        values = sorted(value for value, _ in rows)
+        cache.set(key, values, CHOICES_TIMEOUT)
+    return values
+
+
+def cached_values_filter(field: str, title: str) -> type:
+    """Cria um filtro lateral com os valores de ``distinct_values``, sem SELECT DISTINCT a cada página"""
+    def lookups(self, request, model_admin):
+        return [(str(value), str(value)) for value in distinct_values(model_admin.model, field)]
+
+    def queryset(self, request, queryset):
+        if self.value() is None:
+            return queryset
+        try:
+            return queryset.filter(**{field: self.value()})
+        except ValueError as e:
+            # Valor que não é da coluna (ex.: texto num campo inteiro)
+            raise IncorrectLookupParameters(e)
+
+    return type(f'{field.title().replace("_", "")}Filter', (admin.SimpleListFilter,), {
+        'title': title,
+        'parameter_name': field,
+        'lookups': lookups,
+        'queryset': queryset,
+    })
+
+
+class PorteFilter(admin.SimpleListFilter):
+    """Porte pela tabela de códigos da Receita Federal"""
+    title = 'porte'
+    parameter_name = 'porte'
+
+    def lookups(self, request, model_admin):
+        return [(str(codigo), nome) for codigo, nome in PORTES.items()]
+
+    def queryset(self, request, queryset):
+        if self.value() is None:
+            return queryset
+        try:
+            return queryset.filter(porte=self.value())
+        except ValueError as e:
+            raise IncorrectLookupParameters(e)
+
+
+class CapitalSocialFilter(admin.SimpleListFilter):
+    """Faixas de capital social (intervalos fixos, sem DISTINCT, atendidos pelo índice de capital_social)"""
+    title = 'capital social'
+    parameter_name = 'capital_social'
+
+    def lookups(self, request, model_admin):
+        return [(faixa, nome) for faixa, nome, _, _ in CAPITAL_SOCIAL_FAIXAS]
+
+    def queryset(self, request, queryset):
+        for faixa, _, minimo, maximo in CAPITAL_SOCIAL_FAIXAS:
+            if faixa == self.value():
+                if minimo is not None:
+                    queryset = queryset.filter(capital_social__gte=minimo)
+                if maximo is not None:
+                    queryset = queryset.filter(capital_social__lt=maximo)
+        return queryset
+
+
 @admin.register(Empresa)
-class Empresa(admin.ModelAdmin):
+class EmpresaAdmin(admin.ModelAdmin):
     list_display = (
-        'cnpj_basico', 
-        'rasao_social', 
-        'natureza_juridica', 
-        'clasificacao_do_responsavel',
-        'capital_social',
-        'porte',
-        'ente_federativo_responsavel',
-        )
-    list_filter = (        
+        'cnpj_basico',
+        'rasao_social',
         'natureza_juridica',
         'clasificacao_do_responsavel',
         'capital_social',
         'porte',
         'ente_federativo_responsavel',
         )
+    list_filter = (
+        cached_values_filter('natureza_juridica', 'natureza jurídica'),
+        cached_values_filter('clasificacao_do_responsavel', 'qualificação do responsável'),
+        CapitalSocialFilter,
+        PorteFilter,
+        cached_values_filter('ente_federativo_responsavel', 'ente federativo responsável'),
+        )
     search_fields = ('rasao_social',)
-    ordering = ('rasao_social',)
\ No newline at end of file
+    search_help_text = 'Início da razão social ou CNPJ básico'
+    # A chave primária no fim deixa a ordem única e igual à do índice
+    ordering = ('rasao_social', 'cnpj_basico')
+    # Tabela com milhões de linhas: total estimado, sem COUNT(*) da tabela inteira
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    actions = [export_action(EMPRESA_FIELDS, 'empresas')]
+
+    def get_search_results(self, request, queryset, search_term):
+        """
+        Busca pelo início da razão social (índice ``empresas_razao_prefix_idx``)
+
+        A Receita publica a razão social em maiúsculas, então o termo vai em
+        maiúsculas e o LIKE 'termo%' usa o índice. Termos numéricos também
+        procuram o CNPJ básico.
+        """
+        term = search_term.strip()
+        if not term:
+            return queryset, False
+        condition = Q(rasao_social__startswith=term.upper())
+        if term.isdigit() and len(term) <= 8:
+            condition |= Q(cnpj_basico=int(term))
+        return queryset.filter(condition), False
@@ -0,0 +1,66 @@
+from typing import Dict, Tuple
+from django.db.models import QuerySet
+from djangoibge.rendering import RowTemplate
+from .models import Empresa
+
+
+EMPRESA_FIELDS = (
+    'cnpj_basico',
+    'rasao_social',
+    'natureza_juridica',
+    'clasificacao_do_responsavel',
+    'capital_social',
+    'porte',
+    'ente_federativo_responsavel',
+)
+
+# Códigos de porte da Receita Federal
+PORTES = {
+    0: 'Não informado',
+    1: 'Micro empresa',
+    3: 'Empresa de pequeno porte',
+    5: 'Demais',
+}
+
+# Faixas de capital social: (parâmetro, nome, mínimo, máximo exclusivo)
+CAPITAL_SOCIAL_FAIXAS = (
+    ('ate-1mil', 'Até R$ 1 mil', None, 1_000),
+    ('1mil-10mil', 'R$ 1 mil a 10 mil', 1_000, 10_000),
+    ('10mil-100mil', 'R$ 10 mil a 100 mil', 10_000, 100_000),
+    ('100mil-1mi', 'R$ 100 mil a 1 milhão', 100_000, 1_000_000),
+    ('1mi-10mi', 'R$ 1 milhão a 10 milhões', 1_000_000, 10_000_000),
+    ('acima-10mi', 'Acima de R$ 10 milhões', 10_000_000, None),
+)
+
+# Razão social e CNPJ aparecem mesmo vazios; os demais campos mostram '-'
+EMPRESA_ROW = RowTemplate(
+    EMPRESA_FIELDS,
+    [
+        '{%s}' % field if field in ('cnpj_basico', 'rasao_social') else ('{%s}' % field, '-')
+        for field in EMPRESA_FIELDS
+    ],
+)
+
+
+def filter_empresas(params) -> Tuple[QuerySet, Dict]:
+    """Aplica os filtros da listagem de empresas (sem ordenação)"""
+    empresas_queryset = Empresa.objects.all()
+
+    rasao_social_filter = params.get('rasao_social')
+    if rasao_social_filter:
+        empresas_queryset = empresas_queryset.filter(rasao_social__icontains=rasao_social_filter)
+
+    cnpj_basico_filter = params.get('cnpj_basico')
+    if cnpj_basico_filter:
+        empresas_queryset = empresas_queryset.filter(cnpj_basico=cnpj_basico_filter)
+
+    porte_filter = params.get('porte')
+    if porte_filter:
+        empresas_queryset = empresas_queryset.filter(porte=porte_filter)
+
+    filters = {
+        'rasao_social': rasao_social_filter or '',
+        'cnpj_basico': cnpj_basico_filter or '',
+        'porte': porte_filter or '',
+    }
+    return empresas_queryset, filters
@@ -1,18 +1,40 @@
 from django.core.management.base import BaseCommand
 from empresas.services import EmpresasService
+from djangoibge.memory import MemoryTracker, format_report
+from djangoibge.profiling import add_profile_argument, profiled_command
 
 
 class Command(BaseCommand):
     help = 'Importa dados das empresas do IBGE'
 
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--trace-memory',
+            action='store_true',
+            help='Liga o tracemalloc e mostra memória e maiores alocações por fase (mais lento)'
+        )
+        add_profile_argument(parser)
+
     def handle(self, *args, **options):
         self.stdout.write('Iniciando importação das empresas...')
         
         try:
-            EmpresasService.get_data()
+            with profiled_command(self.stdout, options['profile'], 'import_empresas'):
+                result = EmpresasService.get_data(
+                    memory=MemoryTracker('empresas', trace=options['trace_memory'] or None)
+                )
             self.stdout.write(
                 self.style.SUCCESS('Importação das empresas concluída com sucesso!')
             )
+            if result and options['verbosity'] > 1:
+                for metrics in result['batch_metrics']:
+                    self.stdout.write(
+                        f"  {metrics['table']}: lotes {metrics['batch_sizes']}, "
+                        f"{metrics['rows_per_second']} linhas/s"
+                    )
+            if result and (options['verbosity'] > 1 or options['trace_memory']):
+                for line in format_report(result['memory']):
+                    self.stdout.write(line)
         except Exception as e:
             self.stdout.write(
                 self.style.ERROR(f'Erro durante a importação: {e}')
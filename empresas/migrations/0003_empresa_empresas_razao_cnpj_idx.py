@@ -0,0 +1,22 @@
+# Generated by Django 5.2.4 on 2026-10-19 14:10
+
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    # O AddIndex comum bloquearia a escrita na tabela de empresas (dezenas
+    # de milhões de linhas) durante todo o build do índice; o CONCURRENTLY
+    # não bloqueia, mas não pode rodar dentro de uma transação
+    atomic = False
+
+    dependencies = [
+        ('empresas', '0002_alter_empresa_ente_federativo_responsavel'),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name='empresa',
+            index=models.Index(fields=['rasao_social', 'cnpj_basico'], name='empresas_razao_cnpj_idx'),
+        ),
+    ]
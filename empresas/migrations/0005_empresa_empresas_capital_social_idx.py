@@ -0,0 +1,20 @@
+# Generated by Django 5.2.4 on 2026-10-19 16:02
+
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    # Como na 0003: sem bloquear a escrita na tabela de empresas
+    atomic = False
+
+    dependencies = [
+        ('empresas', '0004_empresa_empresas_razao_prefix_idx'),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name='empresa',
+            index=models.Index(fields=['capital_social'], name='empresas_capital_social_idx'),
+        ),
+    ]
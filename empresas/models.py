@@ -8,4 +8,14 @@ class Empresa(models.Model):
     clasificacao_do_responsavel = models.IntegerField()
     capital_social = models.IntegerField()
     porte = models.IntegerField()
-    ente_federativo_responsavel = models.TextField(null=True, blank=True)
\ No newline at end of file
+    ente_federativo_responsavel = models.TextField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            # Ordem da listagem e chave da paginação por cursor
+            models.Index(fields=['rasao_social', 'cnpj_basico'], name='empresas_razao_cnpj_idx'),
+            # Busca por início da razão social (LIKE 'termo%') em qualquer collation
+            models.Index(fields=['rasao_social'], opclasses=['text_pattern_ops'], name='empresas_razao_prefix_idx'),
+            # Faixas de capital social do filtro do admin
+            models.Index(fields=['capital_social'], name='empresas_capital_social_idx'),
+        ]
@@ -1,5 +1,4 @@
 import logging
-import requests
 import io
 import zipfile
 import csv
@@ -7,6 +6,10 @@ from tqdm import tqdm
 from math import ceil
 from django.conf import settings
 from django.db import transaction
+from djangoibge.batching import AdaptiveBatcher
+from djangoibge.memory import MemoryTracker
+from djangoibge.transport import http_session
+from ibge.versioning import publish
 from .models import Empresa
 import os
 
@@ -19,10 +22,11 @@ class EmpresasService:
     URL = settings.ARCHIVE_URL
     
     @classmethod
-    def get_data(cls):
+    def get_data(cls, memory=None):
+        memory = memory or MemoryTracker('empresas')
         chunk_size = 1024 * 1024
         
-        response = requests.get(cls.URL, stream=True)
+        response = http_session().get(cls.URL, stream=True)
         response.raise_for_status()
         
         if response.status_code != 200:
@@ -39,18 +43,22 @@ class EmpresasService:
         if os.path.exists(arquivo_zip):
             print(f"O arquivo {arquivo_zip} já existe. Usando arquivo existente.")
         else:
-            with open(arquivo_zip, 'wb') as f:
+            with memory.phase('download'), open(arquivo_zip, 'wb') as f:
                 for chunk in tqdm(response.iter_content(chunk_size), total=total_chunks, unit='MB', desc="Baixando"):
                     if chunk:
                         f.write(chunk)
             print("Download concluído.")
 
         print("Extraindo e processando dados...")
-        cls._extract_and_process(arquivo_zip)
+        result = cls._extract_and_process(arquivo_zip, memory)
+        publish([Empresa._meta.db_table])
+        result['memory'] = memory.report()
+        return result
     
     @classmethod
-    def _extract_and_process(cls, arquivo_zip):
+    def _extract_and_process(cls, arquivo_zip, memory):
         """Extrai o arquivo zip e processa os dados"""
+        batch_metrics = []
         try:
             with zipfile.ZipFile(arquivo_zip, 'r') as zip_ref:
                 # Lista os arquivos no zip
@@ -60,31 +68,34 @@ class EmpresasService:
                 for arquivo in arquivos:
                     if arquivo.endswith('.csv') or arquivo.endswith('.CSV') or arquivo.endswith('.EMPRECSV'):
                         print(f"Processando arquivo: {arquivo}")
-                        with zip_ref.open(arquivo) as csv_file:
-                            cls._process_csv(csv_file)
+                        with memory.phase(f'processamento:{arquivo}'), zip_ref.open(arquivo) as csv_file:
+                            batch_metrics.append(cls._process_csv(csv_file, memory))
                             
         except zipfile.BadZipFile:
             raise Exception("Arquivo zip corrompido ou inválido")
+        
+        return {'batch_metrics': batch_metrics}
     
     @classmethod
-    def _process_csv(cls, csv_file):
+    def _process_csv(cls, csv_file, memory):
         """Processa o arquivo CSV e salva no banco de dados"""
         # Decodifica o arquivo CSV
         text_file = io.TextIOWrapper(csv_file, encoding='latin-1')  # Encoding comum para dados IBGE
         reader = csv.reader(text_file, delimiter=';')
         
-        batch_size = 1000
+        batcher = AdaptiveBatcher(Empresa._meta.db_table, fields_per_row=7, initial_size=1000)
         empresas_batch = []
         
         for row_num, row in enumerate(tqdm(reader, desc="Processando empresas")):
+            memory.step(row_num)
             try:
                 empresa_data = cls._parse_empresa_row(row)
                 if empresa_data:
                     empresas_batch.append(empresa_data)
                     
                     # Salva em lotes para melhor performance
-                    if len(empresas_batch) >= batch_size:
-                        cls._save_batch(empresas_batch)
+                    if len(empresas_batch) >= batcher.size:
+                        batcher.flush(empresas_batch, cls._save_batch)
                         empresas_batch = []
                         
             except Exception as e:
@@ -93,7 +104,9 @@ class EmpresasService:
         
         # Salva o último lote
         if empresas_batch:
-            cls._save_batch(empresas_batch)
+            batcher.flush(empresas_batch, cls._save_batch)
+        
+        return batcher.metrics()
     
     @classmethod
     def _parse_empresa_row(cls, row):
@@ -144,14 +157,17 @@ class EmpresasService:
         """Salva um lote de empresas no banco de dados"""
         try:
             with transaction.atomic():
-                empresas_to_create = []
-                
-                for empresa_data in empresas_batch:
-                    cnpj_basico = empresa_data['cnpj_basico']
-                    
-                    # Verifica se a empresa já existe
-                    if not Empresa.objects.filter(cnpj_basico=cnpj_basico).exists():
-                        empresas_to_create.append(Empresa(**empresa_data))
+                # Verifica as empresas já existentes com uma única query por lote
+                existing = set(
+                    Empresa.objects.filter(
+                        cnpj_basico__in=[e['cnpj_basico'] for e in empresas_batch]
+                    ).values_list('cnpj_basico', flat=True)
+                )
+                empresas_to_create = [
+                    Empresa(**empresa_data)
+                    for empresa_data in empresas_batch
+                    if empresa_data['cnpj_basico'] not in existing
+                ]
                 
                 # Bulk create para novas empresas
                 if empresas_to_create:
@@ -1,68 +1,57 @@
+from asgiref.sync import sync_to_async
 from django.shortcuts import render, redirect
 from django.contrib.auth.decorators import login_required
-from django.core.paginator import Paginator
 from django.contrib import messages
+from djangoibge.exports import export_response, stream_for
+from djangoibge.pagination import CursorPaginator
+from ibge.conditional import conditional_page
 from .models import Empresa
+from .filters import EMPRESA_FIELDS, EMPRESA_ROW, filter_empresas
 from .services import EmpresasService
 
 
+def _import_empresas(request):
+    """Importação de empresas pela página (POST)"""
+    try:
+        EmpresasService.get_data()
+        messages.success(request, "Empresas importadas com sucesso!")
+    except Exception as e:
+        messages.error(request, f"Erro na importação: {e}")
+
+    return redirect('empresas')
+
+
 @login_required
-def empresas_view(request):
+@conditional_page([Empresa._meta.db_table])
+async def empresas_view(request):
     """View otimizada para exibir a página de empresas"""
     if request.method == 'POST':
-        try:
-            EmpresasService.get_data()
-            messages.success(request, "Empresas importadas com sucesso!")
-        except Exception as e:
-            messages.error(request, f"Erro na importação: {e}")
-        
-        return redirect('empresas')
-    
+        return await sync_to_async(_import_empresas)(request)
+
     # Constrói o queryset com filtros ANTES da paginação
-    empresas_queryset = Empresa.objects.only(
-        'cnpj_basico', 
-        'rasao_social', 
-        'natureza_juridica', 
-        'clasificacao_do_responsavel', 
-        'capital_social', 
-        'porte', 
-        'ente_federativo_responsavel'
-    )
+    empresas_queryset, filters = filter_empresas(request.GET)
 
-    # Aplicar filtros
-    rasao_social_filter = request.GET.get('rasao_social')
-    if rasao_social_filter:
-        empresas_queryset = empresas_queryset.filter(rasao_social__icontains=rasao_social_filter)
-    
-    cnpj_basico_filter = request.GET.get('cnpj_basico')
-    if cnpj_basico_filter:
-        empresas_queryset = empresas_queryset.filter(cnpj_basico=cnpj_basico_filter)
-    
-    porte_filter = request.GET.get('porte')
-    if porte_filter:
-        empresas_queryset = empresas_queryset.filter(porte=porte_filter)
-    
-    # Ordenação
-    empresas_queryset = empresas_queryset.order_by('rasao_social')
+    # Exportação em streaming (ordenada pela chave primária, sem sort na tabela inteira)
+    export_format = request.GET.get('export')
+    if export_format:
+        return stream_for(request, export_response(
+            empresas_queryset.order_by('cnpj_basico'), EMPRESA_FIELDS, export_format, 'empresas',
+            compress=bool(request.GET.get('gzip')),
+        ))
 
-    # Paginação otimizada - só carrega os registros da página atual
-    paginator = Paginator(empresas_queryset, 30)
-    page_number = request.GET.get('page', 1)
-    
-    try:
-        page_obj = paginator.page(page_number)
-    except:
-        page_obj = paginator.page(1)
+    # Paginação por cursor na ordem (razão social, CNPJ) - sem COUNT(*) nem OFFSET
+    paginator = CursorPaginator(
+        empresas_queryset.values_list(*EMPRESA_ROW.fields), 30,
+        fields=EMPRESA_ROW.fields, ordering=('rasao_social', 'cnpj_basico'),
+    )
+    page_obj = await paginator.apage(request.GET.get('cursor'))
 
     context = {
         'title': 'Empresas',
         'empresas': page_obj,
+        'rows': EMPRESA_ROW.render(page_obj),
         'paginator': paginator,
         'page_obj': page_obj,
-        'filters': {
-            'rasao_social': rasao_social_filter or '',
-            'cnpj_basico': cnpj_basico_filter or '',
-            'porte': porte_filter or '',
-        }
+        'filters': filters
     }
-    return render(request, 'empresas.html', context)
\ No newline at end of file
+    return await sync_to_async(render)(request, 'empresas.html', context)
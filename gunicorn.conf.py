@@ -0,0 +1,24 @@
+# Configuração do gunicorn (carregada automaticamente a partir do diretório atual)
+import os
+
+
+# Por padrão os workers são do uvicorn (ASGI): as listagens e as APIs JSON
+# são views assíncronas e um worker atende várias requisições enquanto as
+# consultas esperam o banco. GUNICORN_ASGI=0 volta aos workers síncronos (WSGI).
+if os.environ.get('GUNICORN_ASGI', '1') != '0':
+    wsgi_app = 'djangoibge.asgi:application'
+    worker_class = 'uvicorn_worker.UvicornWorker'
+else:
+    wsgi_app = 'djangoibge.wsgi:application'
+
+
+def post_worker_init(worker):
+    """Inicia o listener de versões e carrega o gazetteer em cada worker"""
+    from ibge.gazetteer import get_gazetteer
+    from ibge.versioning import start_listener
+
+    try:
+        start_listener()
+        get_gazetteer()
+    except Exception as e:
+        worker.log.warning(f"Gazetteer não carregado na inicialização: {e}")
@@ -1,4 +1,6 @@
 from django.contrib import admin
+from djangoibge.exports import export_action
+from .filters import DISTRITO_EXPORT_FIELDS, DISTRITO_EXPORT_COLUMNS
 from .models import (
     Regiao, Uf, RegiaoIntermediaria, RegiaoImediata, 
     Mesorregiao, Microrregiao, Estado, Municipio, Distrito
@@ -18,6 +20,7 @@ class UfAdmin(admin.ModelAdmin):
     list_display = ('id', 'sigla', 'nome', 'regiao')
     list_filter = ('regiao',)
     search_fields = ('nome', 'sigla')
+    list_select_related = ('regiao',)
     ordering = ('sigla',)
 
 # Admin customizado para Estados  
@@ -26,6 +29,7 @@ class EstadoAdmin(admin.ModelAdmin):
     list_display = ('id', 'nome', 'sigla', 'regiao')
     list_filter = ('regiao',)
     search_fields = ('nome', 'sigla')
+    list_select_related = ('regiao',)
     ordering = ('sigla',)
 
 # Admin customizado para Regiões Intermediárias
@@ -34,6 +38,7 @@ class RegiaoIntermediariaAdmin(admin.ModelAdmin):
     list_display = ('id', 'nome', 'uf')
     list_filter = ('uf',)
     search_fields = ('nome',)
+    list_select_related = ('uf',)
     ordering = ('nome',)
 
 # Admin customizado para Regiões Imediatas
@@ -42,6 +47,7 @@ class RegiaoImediataAdmin(admin.ModelAdmin):
     list_display = ('id', 'nome', 'regiao_intermediaria')
     list_filter = ('regiao_intermediaria__uf',)
     search_fields = ('nome',)
+    list_select_related = ('regiao_intermediaria',)
     ordering = ('nome',)
 
 # Admin customizado para Mesorregiões
@@ -50,6 +56,7 @@ class MesorregiaoAdmin(admin.ModelAdmin):
     list_display = ('id', 'nome', 'uf')
     list_filter = ('uf',)
     search_fields = ('nome',)
+    list_select_related = ('uf',)
     ordering = ('nome',)
 
 # Admin customizado para Microrregiões
@@ -58,6 +65,7 @@ class MicroregiaoAdmin(admin.ModelAdmin):
     list_display = ('id', 'nome', 'mesorregiao')
     list_filter = ('mesorregiao__uf',)
     search_fields = ('nome',)
+    list_select_related = ('mesorregiao',)
     ordering = ('nome',)
 
 # Admin customizado para Municípios
@@ -66,8 +74,16 @@ class MunicipioAdmin(admin.ModelAdmin):
     list_display = ('id', 'nome', 'microrregiao', 'get_uf')
     list_filter = ('microrregiao__mesorregiao__uf',)
     search_fields = ('nome', 'id')
+    list_select_related = ('microrregiao__mesorregiao__uf',)  # get_uf sem uma query por linha
     ordering = ('nome',)
     list_per_page = 50  # Paginação para performance
+    actions = [
+        export_action(
+            ('id', 'nome', 'listagem__uf_sigla', 'listagem__regiao_nome', 'microrregiao__nome'),
+            'municipios',
+            columns=('id', 'nome', 'uf_sigla', 'regiao', 'microrregiao'),
+        ),
+    ]
     
     def get_uf(self, obj):
         return obj.microrregiao.mesorregiao.uf if obj.microrregiao and obj.microrregiao.mesorregiao else '-'
@@ -79,8 +95,10 @@ class DistritoAdmin(admin.ModelAdmin):
     list_display = ('id', 'nome', 'municipio', 'get_uf')
     list_filter = ('uf',)
     search_fields = ('nome', 'id')
+    list_select_related = ('municipio', 'uf')
     ordering = ('nome',)
     list_per_page = 100  # Paginação para performance
+    actions = [export_action(DISTRITO_EXPORT_FIELDS, 'distritos', columns=DISTRITO_EXPORT_COLUMNS)]
     
     def get_uf(self, obj):
         return obj.uf if obj.uf else '-'
@@ -0,0 +1,85 @@
+import hashlib
+from functools import wraps
+from typing import Callable, Iterable, Optional
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from django.conf import settings
+from django.contrib.messages import get_messages
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+from .versioning import get_data_version
+
+
+def page_etag(request, tables: Iterable[str]) -> Optional[str]:
+    """
+    ETag forte da página: versão dos dados, caminho, parâmetros e usuário
+
+    Retorna None (sem ETag) fora de GET/HEAD e quando há mensagens
+    pendentes, que só aparecem na próxima renderização.
+    """
+    if request.method not in ('GET', 'HEAD') or len(get_messages(request)):
+        return None
+
+    user = request.user
+    parts = [
+        request.path,
+        repr(sorted(request.GET.lists())),
+        str(user.pk),
+        str(user.is_staff),
+        str(user.is_superuser),
+        # Formulários da página levam o token CSRF, que muda no login
+        request.COOKIES.get(settings.CSRF_COOKIE_NAME, ''),
+    ]
+    digest = hashlib.sha1('\n'.join(parts).encode('utf-8')).hexdigest()
+    return f'"ibge-v{get_data_version(tables)}-{digest}"'
+
+
+def conditional_page(tables: Iterable[str]) -> Callable:
+    """
+    Responde 304 quando o ETag do navegador ainda vale, antes de executar a view
+
+    A view só roda (e só consulta o banco) se os dados das tabelas, os
+    filtros ou o usuário mudaram. Usar depois de ``login_required``.
+
+    :param tables: Tabelas cuja versão compõe o ETag
+    """
+    tables = sorted(set(tables))
+
+    def decorator(view):
+        if iscoroutinefunction(view):
+            @wraps(view)
+            async def async_wrapper(request, *args, **kwargs):
+                # Mensagens e usuário vêm da sessão e do banco: fora do event loop
+                etag = await sync_to_async(page_etag)(request, tables)
+                if etag is None:
+                    return await view(request, *args, **kwargs)
+
+                response = get_conditional_response(request, etag=etag)
+                if response is None:
+                    response = await view(request, *args, **kwargs)
+                    if response.status_code != 200 or response.has_header('ETag'):
+                        return response
+                    response['ETag'] = etag
+                return _revalidate(response)
+            return async_wrapper
+
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            etag = page_etag(request, tables)
+            if etag is None:
+                return view(request, *args, **kwargs)
+
+            response = get_conditional_response(request, etag=etag)
+            if response is None:
+                response = view(request, *args, **kwargs)
+                if response.status_code != 200 or response.has_header('ETag'):
+                    return response
+                response['ETag'] = etag
+            return _revalidate(response)
+        return wrapper
+    return decorator
+
+
+def _revalidate(response):
+    # Cache só no navegador, sempre revalidado pelo ETag
+    patch_cache_control(response, private=True, no_cache=True)
+    patch_vary_headers(response, ('Cookie',))
+    return response
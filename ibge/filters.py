@@ -0,0 +1,125 @@
+from typing import Dict, Tuple
+from django.db.models import QuerySet
+from djangoibge.rendering import RowTemplate
+from .models import Estado, MunicipioListagem, Distrito
+from .search import search_ids
+
+
+# Campos e nomes de coluna usados nas exportações
+MUNICIPIO_EXPORT_FIELDS = (
+    'municipio_id', 'nome', 'uf_sigla', 'uf_nome', 'regiao_nome', 'microrregiao_nome', 'mesorregiao_nome'
+)
+MUNICIPIO_EXPORT_COLUMNS = (
+    'id', 'nome', 'uf_sigla', 'uf_nome', 'regiao', 'microrregiao', 'mesorregiao'
+)
+DISTRITO_EXPORT_FIELDS = (
+    'id', 'nome', 'municipio_id', 'municipio__nome', 'uf__sigla', 'uf__nome', 'regiao__nome'
+)
+DISTRITO_EXPORT_COLUMNS = (
+    'id', 'nome', 'municipio_id', 'municipio', 'uf_sigla', 'uf_nome', 'regiao'
+)
+
+
+# Colunas exibidas em cada listagem, renderizadas a partir de values_list
+ESTADO_ROW = RowTemplate(
+    ('id', 'nome', 'sigla', 'regiao__nome'),
+    ('{id}', '{nome}', '{sigla}', ('{regiao__nome}', '-')),
+)
+MUNICIPIO_ROW = RowTemplate(
+    ('municipio_id', 'nome', 'uf_nome', 'uf_sigla', 'regiao_nome', 'microrregiao_nome', 'mesorregiao_nome'),
+    (
+        '{municipio_id}', '{nome}', ('{uf_nome} ({uf_sigla})', '-'),
+        ('{regiao_nome}', '-'), ('{microrregiao_nome}', '-'), ('{mesorregiao_nome}', '-'),
+    ),
+)
+DISTRITO_ROW = RowTemplate(
+    ('id', 'nome', 'municipio__nome', 'uf__nome', 'uf__sigla', 'regiao__nome'),
+    ('{id}', '{nome}', ('{municipio__nome}', '-'), ('{uf__nome} ({uf__sigla})', '-'), ('{regiao__nome}', '-')),
+)
+
+
+def filter_estados(params) -> Tuple[QuerySet, Dict]:
+    """Aplica os filtros da listagem de estados"""
+    estados_list = Estado.objects.all()
+
+    # Filtro por região
+    regiao_filter = params.get('regiao')
+    if regiao_filter:
+        estados_list = estados_list.filter(regiao__nome__icontains=regiao_filter)
+
+    # Filtro por nome
+    nome_filter = params.get('nome')
+    if nome_filter:
+        estados_list = estados_list.filter(nome__icontains=nome_filter)
+
+    # Filtro por sigla
+    sigla_filter = params.get('sigla')
+    if sigla_filter:
+        estados_list = estados_list.filter(sigla__icontains=sigla_filter)
+
+    filters = {
+        'regiao': regiao_filter or '',
+        'nome': nome_filter or '',
+        'sigla': sigla_filter or '',
+    }
+    return estados_list.order_by('nome'), filters
+
+
+def filter_municipios(params) -> Tuple[QuerySet, Dict]:
+    """Aplica os filtros da listagem de municípios sobre a listagem desnormalizada"""
+    municipios_list = MunicipioListagem.objects.all()
+
+    # Filtro por nome (sem acentos, via índice de busca)
+    nome_filter = params.get('nome')
+    if nome_filter:
+        municipios_list = municipios_list.filter(municipio_id__in=search_ids('municipio', nome_filter))
+
+    # Filtro por UF (busca exata, usa o índice uf_sigla)
+    uf_filter = params.get('uf')
+    if uf_filter:
+        municipios_list = municipios_list.filter(uf_sigla=uf_filter.upper())
+
+    # Filtro por região (busca exata, usa o índice regiao_nome)
+    regiao_filter = params.get('regiao')
+    if regiao_filter:
+        municipios_list = municipios_list.filter(regiao_nome=regiao_filter)
+
+    filters = {
+        'nome': nome_filter or '',
+        'uf': uf_filter or '',
+        'regiao': regiao_filter or '',
+    }
+    return municipios_list.order_by('nome'), filters
+
+
+def filter_distritos(params) -> Tuple[QuerySet, Dict]:
+    """Aplica os filtros da listagem de distritos"""
+    distritos_list = Distrito.objects.all()
+
+    # Filtro por nome (sem acentos, via índice de busca)
+    nome_filter = params.get('nome')
+    if nome_filter:
+        distritos_list = distritos_list.filter(id__in=search_ids('distrito', nome_filter))
+
+    # Filtro por município
+    municipio_filter = params.get('municipio')
+    if municipio_filter:
+        distritos_list = distritos_list.filter(municipio__nome__icontains=municipio_filter)
+
+    # Filtro por UF
+    uf_filter = params.get('uf')
+    if uf_filter:
+        distritos_list = distritos_list.filter(uf__sigla__icontains=uf_filter)
+
+    # Filtro por região
+    regiao_filter = params.get('regiao')
+    if regiao_filter:
+        distritos_list = distritos_list.filter(regiao__nome__icontains=regiao_filter)
+
+    filters = {
+        'nome': nome_filter or '',
+        'municipio': municipio_filter or '',
+        'uf': uf_filter or '',
+        'regiao': regiao_filter or '',
+    }
+    return distritos_list.order_by('nome'), filters
@@ -0,0 +1,331 @@
+import logging
+import threading
+import time
+import unicodedata
+from array import array
+from bisect import bisect_left
+from typing import Dict, List, Optional, Tuple
+from .models import (
+    Regiao, Uf, RegiaoIntermediaria, RegiaoImediata,
+    Mesorregiao, Microrregiao, Municipio, Distrito
+)
+from .versioning import get_data_version, listener_active, subscribe
+
+
+logger = logging.getLogger(__name__)
+
+
+def normalize_name(nome: str) -> str:
+    """Remove acentos, converte para minúsculas e normaliza espaços"""
+    decomposed = unicodedata.normalize('NFKD', nome)
+    stripped = ''.join(c for c in decomposed if not unicodedata.combining(c))
+    return ' '.join(stripped.lower().split())
+
+
+class RegiaoRecord:
+    __slots__ = ('id', 'sigla', 'nome')
+
+    def __init__(self, id, sigla, nome):
+        self.id = id
+        self.sigla = sigla
+        self.nome = nome
+
+
+class UfRecord:
+    __slots__ = ('id', 'sigla', 'nome', 'regiao_id')
+
+    def __init__(self, id, sigla, nome, regiao_id):
+        self.id = id
+        self.sigla = sigla
+        self.nome = nome
+        self.regiao_id = regiao_id
+
+
+class DivisaoRecord:
+    """Mesorregião, microrregião, região intermediária ou imediata"""
+    __slots__ = ('id', 'nome', 'parent_id')
+
+    def __init__(self, id, nome, parent_id):
+        self.id = id
+        self.nome = nome
+        self.parent_id = parent_id
+
+
+class MunicipioRecord:
+    __slots__ = (
+        'id', 'nome', 'uf_id', 'regiao_id', 'mesorregiao_id', 'microrregiao_id',
+        'regiao_intermediaria_id', 'regiao_imediata_id'
+    )
+
+    def __init__(self, id, nome, uf_id, regiao_id, mesorregiao_id, microrregiao_id,
+                 regiao_intermediaria_id, regiao_imediata_id):
+        self.id = id
+        self.nome = nome
+        self.uf_id = uf_id
+        self.regiao_id = regiao_id
+        self.mesorregiao_id = mesorregiao_id
+        self.microrregiao_id = microrregiao_id
+        self.regiao_intermediaria_id = regiao_intermediaria_id
+        self.regiao_imediata_id = regiao_imediata_id
+
+
+class DistritoRecord:
+    __slots__ = ('id', 'nome', 'municipio_id')
+
+    def __init__(self, id, nome, municipio_id):
+        self.id = id
+        self.nome = nome
+        self.municipio_id = municipio_id
+
+
+# Colunas de Gazetteer.municipio_rows
+MUNICIPIO_COLUMNS = (
+    'municipio_id', 'municipio_nome',
+    'microrregiao_id', 'microrregiao_nome',
+    'mesorregiao_id', 'mesorregiao_nome',
+    'regiao_imediata_id', 'regiao_imediata_nome',
+    'regiao_intermediaria_id', 'regiao_intermediaria_nome',
+    'uf_id', 'uf_sigla', 'uf_nome',
+    'regiao_id', 'regiao_sigla', 'regiao_nome',
+)
+
+
+class Gazetteer:
+    """
+    Índice territorial imutável em memória, construído a partir das tabelas do IBGE
+
+    Todo o conjunto (regiões, UFs, divisões, municípios e distritos) cabe em
+    poucos MB; uma instância é carregada por processo e substituída por
+    inteiro quando a versão dos dados muda.
+
+    :param version: Versão dos dados usada na construção
+    :type version: int
+    """
+
+    MODELS = (
+        Regiao, Uf, RegiaoIntermediaria, RegiaoImediata,
+        Mesorregiao, Microrregiao, Municipio, Distrito
+    )
+
+    def __init__(self, version: int = 0):
+        self.version = version
+        self.regioes: Dict[int, RegiaoRecord] = {}
+        self.ufs: Dict[int, UfRecord] = {}
+        self.ufs_by_sigla: Dict[str, UfRecord] = {}
+        self.mesorregioes: Dict[int, DivisaoRecord] = {}
+        self.microrregioes: Dict[int, DivisaoRecord] = {}
+        self.regioes_intermediarias: Dict[int, DivisaoRecord] = {}
+        self.regioes_imediatas: Dict[int, DivisaoRecord] = {}
+        self.municipios: Dict[int, MunicipioRecord] = {}
+        self.distritos: Dict[int, DistritoRecord] = {}
+        self.municipios_by_uf: Dict[int, array] = {}
+        self.municipios_by_regiao: Dict[int, array] = {}
+        self.distritos_by_municipio: Dict[int, array] = {}
+        # Lista ordenada de (nome normalizado, tipo, id)
+        self.name_index: List[Tuple[str, str, int]] = []
+        # Hierarquia achatada por município, na ordem de MUNICIPIO_COLUMNS
+        self.municipio_rows: Dict[int, tuple] = {}
+
+    @classmethod
+    def tables(cls) -> List[str]:
+        """Tabelas cujas alterações invalidam o gazetteer"""
+        return [model._meta.db_table for model in cls.MODELS]
+
+    @classmethod
+    def load(cls, version: Optional[int] = None) -> 'Gazetteer':
+        """Constrói o índice com uma query simples por tabela (sem joins)"""
+        start_time = time.time()
+        gaz = cls(get_data_version(cls.tables()) if version is None else version)
+
+        for id, sigla, nome in Regiao.objects.values_list('id', 'sigla', 'nome'):
+            gaz.regioes[id] = RegiaoRecord(id, sigla, nome)
+
+        for id, sigla, nome, regiao_id in Uf.objects.values_list('id', 'sigla', 'nome', 'regiao_id'):
+            uf = UfRecord(id, sigla, nome, regiao_id)
+            gaz.ufs[id] = uf
+            gaz.ufs_by_sigla[sigla.upper()] = uf
+
+        for target, model, parent in (
+            (gaz.mesorregioes, Mesorregiao, 'uf_id'),
+            (gaz.microrregioes, Microrregiao, 'mesorregiao_id'),
+            (gaz.regioes_intermediarias, RegiaoIntermediaria, 'uf_id'),
+            (gaz.regioes_imediatas, RegiaoImediata, 'regiao_intermediaria_id'),
+        ):
+            for id, nome, parent_id in model.objects.values_list('id', 'nome', parent):
+                target[id] = DivisaoRecord(id, nome, parent_id)
+
+        for id, nome, micro_id, rim_id in Municipio.objects.values_list(
+            'id', 'nome', 'microrregiao_id', 'regiao_imediata_id'
+        ):
+            gaz.municipios[id] = gaz._build_municipio(id, nome, micro_id, rim_id)
+
+        for id, nome, municipio_id in Distrito.objects.values_list('id', 'nome', 'municipio_id'):
+            gaz.distritos[id] = DistritoRecord(id, nome, municipio_id)
+
+        gaz._build_indexes()
+
+        logger.info(
+            f"Gazetteer v{gaz.version} carregado: {len(gaz.municipios)} municípios, "
+            f"{len(gaz.distritos)} distritos em {time.time() - start_time:.2f} segundos"
+        )
+        return gaz
+
+    def _build_municipio(self, id, nome, micro_id, rim_id) -> MunicipioRecord:
+        """Resolve a hierarquia completa do município uma única vez"""
+        micro = self.microrregioes.get(micro_id)
+        meso = self.mesorregioes.get(micro.parent_id) if micro else None
+        rim = self.regioes_imediatas.get(rim_id)
+        rin = self.regioes_intermediarias.get(rim.parent_id) if rim else None
+
+        uf_id = meso.parent_id if meso else (rin.parent_id if rin else None)
+        uf = self.ufs.get(uf_id)
+
+        return MunicipioRecord(
+            id, nome, uf_id, uf.regiao_id if uf else None,
+            meso.id if meso else None, micro_id,
+            rin.id if rin else None, rim_id
+        )
+
+    def _build_indexes(self):
+        """Monta as listas por UF/região/município e o índice de nomes"""
+        by_uf: Dict[int, list] = {}
+        by_regiao: Dict[int, list] = {}
+        by_municipio: Dict[int, list] = {}
+
+        for municipio in sorted(self.municipios.values(), key=lambda m: normalize_name(m.nome)):
+            if municipio.uf_id is not None:
+                by_uf.setdefault(municipio.uf_id, []).append(municipio.id)
+            if municipio.regiao_id is not None:
+                by_regiao.setdefault(municipio.regiao_id, []).append(municipio.id)
+
+        for distrito in sorted(self.distritos.values(), key=lambda d: normalize_name(d.nome)):
+            by_municipio.setdefault(distrito.municipio_id, []).append(distrito.id)
+
+        self.municipio_rows = {m.id: self._municipio_row(m) for m in self.municipios.values()}
+
+        self.municipios_by_uf = {k: array('q', v) for k, v in by_uf.items()}
+        self.municipios_by_regiao = {k: array('q', v) for k, v in by_regiao.items()}
+        self.distritos_by_municipio = {k: array('q', v) for k, v in by_municipio.items()}
+
+        entries = []
+        for tipo, records in (
+            ('regiao', self.regioes), ('uf', self.ufs),
+            ('municipio', self.municipios), ('distrito', self.distritos),
+        ):
+            entries.extend((normalize_name(r.nome), tipo, r.id) for r in records.values())
+        entries.sort()
+        self.name_index = entries
+
+    def _municipio_row(self, municipio: MunicipioRecord) -> tuple:
+        micro = self.microrregioes.get(municipio.microrregiao_id)
+        meso = self.mesorregioes.get(municipio.mesorregiao_id)
+        rim = self.regioes_imediatas.get(municipio.regiao_imediata_id)
+        rin = self.regioes_intermediarias.get(municipio.regiao_intermediaria_id)
+        uf = self.ufs.get(municipio.uf_id)
+        regiao = self.regioes.get(municipio.regiao_id)
+        return (
+            municipio.id, municipio.nome,
+            micro.id if micro else None, micro.nome if micro else None,
+            meso.id if meso else None, meso.nome if meso else None,
+            rim.id if rim else None, rim.nome if rim else None,
+            rin.id if rin else None, rin.nome if rin else None,
+            uf.id if uf else None, uf.sigla if uf else None, uf.nome if uf else None,
+            regiao.id if regiao else None, regiao.sigla if regiao else None, regiao.nome if regiao else None,
+        )
+
+    def uf_by_sigla(self, sigla: str) -> Optional[UfRecord]:
+        """Busca UF pela sigla"""
+        return self.ufs_by_sigla.get(sigla.upper()) if sigla else None
+
+    def siglas(self) -> List[str]:
+        """Siglas das UFs em ordem alfabética"""
+        return sorted(self.ufs_by_sigla)
+
+    def regiao_nomes(self) -> List[str]:
+        """Nomes das regiões em ordem de id"""
+        return [self.regioes[id].nome for id in sorted(self.regioes)]
+
+    def hierarchy(self, codigo: int) -> Optional[Dict]:
+        """Hierarquia completa de um município ou distrito pelo código IBGE"""
+        distrito = self.distritos.get(codigo)
+        municipio = self.municipios.get(distrito.municipio_id if distrito else codigo)
+        if municipio is None:
+            return None
+
+        uf = self.ufs.get(municipio.uf_id)
+        regiao = self.regioes.get(municipio.regiao_id)
+        return {
+            'distrito': {'id': distrito.id, 'nome': distrito.nome} if distrito else None,
+            'municipio': {'id': municipio.id, 'nome': municipio.nome},
+            'microrregiao': self._divisao(self.microrregioes, municipio.microrregiao_id),
+            'mesorregiao': self._divisao(self.mesorregioes, municipio.mesorregiao_id),
+            'regiao_imediata': self._divisao(self.regioes_imediatas, municipio.regiao_imediata_id),
+            'regiao_intermediaria': self._divisao(self.regioes_intermediarias, municipio.regiao_intermediaria_id),
+            'uf': {'id': uf.id, 'sigla': uf.sigla, 'nome': uf.nome} if uf else None,
+            'regiao': {'id': regiao.id, 'sigla': regiao.sigla, 'nome': regiao.nome} if regiao else None,
+        }
+
+    @staticmethod
+    def _divisao(records: Dict[int, DivisaoRecord], id) -> Optional[Dict]:
+        record = records.get(id)
+        return {'id': record.id, 'nome': record.nome} if record else None
+
+    def search_prefix(self, prefix: str, limit: int = 10) -> List[Tuple[str, int]]:
+        """Busca por prefixo no índice de nomes normalizados, retorna (tipo, id)"""
+        prefix = normalize_name(prefix)
+        if not prefix:
+            return []
+
+        results = []
+        position = bisect_left(self.name_index, (prefix,))
+        while position < len(self.name_index) and len(results) < limit:
+            nome, tipo, id = self.name_index[position]
+            if not nome.startswith(prefix):
+                break
+            results.append((tipo, id))
+            position += 1
+        return results
+
+
+_gazetteer: Optional[Gazetteer] = None
+_checked_at = 0.0
+_lock = threading.Lock()
+
+# Intervalo mínimo entre consultas à versão dos dados quando não há listener
+VERSION_CHECK_INTERVAL = 5.0
+
+
+def get_gazetteer() -> Gazetteer:
+    """
+    Retorna o gazetteer do processo, recarregando se a versão dos dados mudou
+
+    Com o listener de versões ativo a invalidação chega por notificação; sem
+    ele, a versão é conferida no banco no máximo a cada ``VERSION_CHECK_INTERVAL``.
+    """
+    global _gazetteer, _checked_at
+
+    gaz = _gazetteer
+    now = time.monotonic()
+    if gaz is not None and (listener_active() or now - _checked_at < VERSION_CHECK_INTERVAL):
+        return gaz
+
+    with _lock:
+        if _gazetteer is not None and (listener_active() or now - _checked_at < VERSION_CHECK_INTERVAL):
+            return _gazetteer
+
+        version = get_data_version(Gazetteer.tables())
+        if _gazetteer is None or _gazetteer.version != version:
+            _gazetteer = Gazetteer.load(version)
+        _checked_at = now
+
+    return _gazetteer
+
+
+def invalidate_gazetteer(tables=None):
+    """Descarta o gazetteer do processo; o próximo acesso recarrega"""
+    global _gazetteer
+    with _lock:
+        _gazetteer = None
+
+
+subscribe(Gazetteer.tables(), invalidate_gazetteer)
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand, CommandError
+from ibge.mirror import MirrorService
+
+
+class Command(BaseCommand):
+    help = 'Gera as respostas da API espelho de localidades a partir das tabelas do IBGE já importadas'
+
+    def handle(self, *args, **options):
+        try:
+            result = MirrorService().build()
+        except Exception as e:
+            raise CommandError(f"Erro ao gerar a API espelho: {e}")
+
+        self.stdout.write(
+            self.style.SUCCESS(f"API espelho v{result['version']}: {result['blobs']} respostas geradas")
+        )
@@ -1,12 +1,59 @@
 from django.core.management.base import BaseCommand, CommandError
 from django.apps import apps
-from django.db import transaction
+from django.db import connection, models, transaction
+from ibge.services import refresh_derived_data
+from ibge.versioning import publish
+from djangoibge.profiling import add_profile_argument, profiled_command
 import time
 
 
+MODES = ('orm', 'truncate', 'chunked')
+
+# Tabelas que referenciam a tabela (direta ou indiretamente) por chave estrangeira
+DEPENDENT_TABLES_SQL = """
+    WITH RECURSIVE deps(oid) AS (
+        SELECT %s::regclass::oid
+        UNION
+        SELECT c.conrelid FROM pg_constraint c JOIN deps d ON c.confrelid = d.oid
+        WHERE c.contype = 'f'
+    )
+    SELECT relname FROM pg_class WHERE oid IN (SELECT oid FROM deps)
+"""
+
+
+def estimated_rows(tables):
+    """Linhas por tabela segundo as estatísticas do PostgreSQL (None sem ANALYZE ou em outro banco)"""
+    if connection.vendor != 'postgresql':
+        return {table: None for table in tables}
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT relname, reltuples FROM pg_class WHERE relname = ANY(%s) AND relkind = 'r'", [list(tables)])
+        rows = {name: int(reltuples) if reltuples >= 0 else None for name, reltuples in cursor.fetchall()}
+    return {table: rows.get(table) for table in tables}
+
+
+def dependent_tables(model):
+    """Tabelas esvaziadas por ``TRUNCATE ... CASCADE`` na tabela do modelo, ela primeiro"""
+    table = model._meta.db_table
+    with connection.cursor() as cursor:
+        cursor.execute(DEPENDENT_TABLES_SQL, [connection.ops.quote_name(table)])
+        others = sorted(name for name, in cursor.fetchall() if name != table)
+    return [table] + others
+
+
+def cascade_models(model):
+    """Modelos apagados em cascata pelo ORM (on_delete=CASCADE), o próprio modelo primeiro"""
+    found = [model]
+    for current in found:
+        for relation in current._meta.related_objects:
+            related = relation.related_model
+            if relation.on_delete is models.CASCADE and related not in found:
+                found.append(related)
+    return found
+
+
 class Command(BaseCommand):
     help = 'Deleta todos os dados de uma tabela específica'
-    
+
     def add_arguments(self, parser):
         parser.add_argument(
             'tabela',
@@ -24,12 +71,60 @@ class Command(BaseCommand):
             default='ibge',
             help='Nome da app onde está o modelo (padrão: ibge)'
         )
-    
+        parser.add_argument(
+            '--mode',
+            choices=MODES,
+            default='orm',
+            help='orm: delete() do Django, com cascata em memória; truncate: TRUNCATE ... RESTART IDENTITY '
+                 'CASCADE (PostgreSQL, esvazia também as tabelas dependentes); chunked: lotes por faixa de '
+                 'chave primária, cada um em sua transação (padrão: orm)'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=50000,
+            help='Registros por lote no modo chunked (padrão: 50000)'
+        )
+        parser.add_argument(
+            '--sleep',
+            type=float,
+            default=0.0,
+            help='Pausa em segundos entre os lotes do modo chunked, para aliviar o banco (padrão: 0)'
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Só mostra as tabelas afetadas e as linhas estimadas pelas estatísticas, sem deletar'
+        )
+        add_profile_argument(parser)
+
     def handle(self, *args, **options):
+        with profiled_command(self.stdout, options['profile'], f"delete_data-{options['tabela']}"):
+            self._delete(options)
+
+    def _delete(self, options):
         tabela = options['tabela']
         app_name = options['app']
         confirm = options['confirm']
-        
+        mode = options['mode']
+
+        # Buscar o modelo na app especificada
+        try:
+            model = apps.get_model(app_name, tabela)
+        except LookupError:
+            raise CommandError(
+                f"Modelo '{tabela}' não encontrado na app '{app_name}'. "
+                f"Verifique se o nome está correto."
+            )
+        if mode == 'truncate' and connection.vendor != 'postgresql':
+            raise CommandError("--mode truncate requer PostgreSQL")
+        if mode == 'chunked' and options['batch_size'] < 1:
+            raise CommandError("--batch-size precisa ser positivo")
+
+        if options['dry_run']:
+            self._dry_run(model, mode)
+            return
+
         if not confirm:
             self.stdout.write(
                 self.style.ERROR(
@@ -42,53 +137,141 @@ class Command(BaseCommand):
                 )
             )
             return
-        
+
         try:
-            # Buscar o modelo na app especificada
-            try:
-                model = apps.get_model(app_name, tabela)
-            except LookupError:
-                raise CommandError(
-                    f"Modelo '{tabela}' não encontrado na app '{app_name}'. "
-                    f"Verifique se o nome está correto."
-                )
-            
-            # Contar registros antes da deleção
-            count_before = model.objects.count()
-            
-            if count_before == 0:
+            # Sem COUNT(*): em tabelas grandes ele custa quase tanto quanto a deleção
+            if not model.objects.exists():
                 self.stdout.write(
                     self.style.WARNING(f"A tabela {tabela} já está vazia.")
                 )
                 return
-            
+
+            estimate = estimated_rows([model._meta.db_table])[model._meta.db_table]
             self.stdout.write(
                 self.style.WARNING(
-                    f"Deletando {count_before} registros da tabela {tabela}..."
+                    f"Deletando ~{estimate} registros da tabela {tabela} (modo {mode})..."
+                    if estimate is not None else f"Deletando os registros da tabela {tabela} (modo {mode})..."
                 )
             )
-            
+
             start_time = time.time()
-            
-            # Usar transação para garantir atomicidade
-            with transaction.atomic():
-                deleted_count, details = model.objects.all().delete()
-            
+
+            if mode == 'truncate':
+                deleted_count, details = self._truncate(model)
+            elif mode == 'chunked':
+                deleted_count, details = self._chunked(model, options['batch_size'], options['sleep'])
+            else:
+                # Usar transação para garantir atomicidade
+                with transaction.atomic():
+                    deleted_count, details = model.objects.all().delete()
+                details = {apps.get_model(label)._meta.db_table: count for label, count in details.items()}
+
+            # Atualiza os modelos derivados e avisa os workers para
+            # invalidarem os caches das tabelas afetadas
+            affected_tables = list(details)
+            if app_name == 'ibge':
+                refresh_derived_data(affected_tables, listagem=True)
+            else:
+                publish(affected_tables)
+
             elapsed_time = time.time() - start_time
-            
+
+            approximate = '~' if mode == 'truncate' else ''
             self.stdout.write(
                 self.style.SUCCESS(
-                    f"✓ {deleted_count} registros deletados da tabela {tabela} "
+                    f"✓ {approximate}{deleted_count} registros deletados da tabela {tabela} "
                     f"em {elapsed_time:.2f} segundos"
                 )
             )
-            
+
             # Mostrar detalhes se houver relacionamentos deletados
             if len(details) > 1:
                 self.stdout.write("\nDetalhes da deleção:")
-                for model_name, count in details.items():
-                    if count > 0:
-                        self.stdout.write(f"  - {model_name}: {count} registros")
-        
+                for table, count in details.items():
+                    if count is None:
+                        self.stdout.write(f"  - {table}: sem estimativa")
+                    elif count > 0:
+                        self.stdout.write(f"  - {table}: {approximate}{count} registros")
+
+        except CommandError:
+            raise
         except Exception as e:
             raise CommandError(f"Erro ao deletar dados: {e}")
+
+    def _dry_run(self, model, mode):
+        """Tabelas que o modo apagaria e linhas estimadas de cada uma"""
+        if mode == 'truncate':
+            tables = dependent_tables(model)
+        else:
+            tables = [related._meta.db_table for related in cascade_models(model)]
+        estimates = estimated_rows(tables)
+
+        self.stdout.write(f"Simulação (modo {mode}), linhas estimadas pelas estatísticas do banco:")
+        for table in tables:
+            estimate = estimates[table]
+            self.stdout.write(f"  - {table}: {'~' + str(estimate) if estimate is not None else 'sem estimativa'}")
+        known = [estimate for estimate in estimates.values() if estimate is not None]
+        self.stdout.write(f"Total estimado: ~{sum(known)} registros em {len(tables)} tabela(s). Nada foi deletado.")
+
+    def _truncate(self, model):
+        """TRUNCATE com cascata; devolve as linhas estimadas de cada tabela esvaziada"""
+        tables = dependent_tables(model)
+        details = estimated_rows(tables)
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(
+                f"TRUNCATE TABLE {connection.ops.quote_name(model._meta.db_table)} RESTART IDENTITY CASCADE"
+            )
+        if len(tables) > 1:
+            self.stdout.write(f"TRUNCATE em cascata esvaziou também: {', '.join(tables[1:])}")
+        return sum(count or 0 for count in details.values()), details
+
+    def _chunked(self, model, batch_size, sleep):
+        """
+        Deleta em lotes de ``batch_size`` pela ordem da chave primária
+
+        Cada lote é uma faixa (último apagado, limite] achada pelo índice da
+        chave primária e apagada em uma transação curta, então a cascata do
+        ORM só carrega os dependentes do lote e o progresso fica salvo se o
+        comando for interrompido.
+        """
+        total = estimated_rows([model._meta.db_table])[model._meta.db_table]
+        pks = model.objects.order_by('pk').values_list('pk', flat=True)
+        deleted_count = 0
+        details = {}
+        last = None
+        batch = 0
+        start = time.time()
+
+        while True:
+            remaining = pks if last is None else pks.filter(pk__gt=last)
+            upper = next(iter(remaining[batch_size - 1:batch_size]), None)
+            if upper is None:
+                # Último lote, menor que batch_size
+                upper = remaining.last()
+                if upper is None:
+                    break
+
+            chunk = model.objects.filter(pk__lte=upper)
+            if last is not None:
+                chunk = chunk.filter(pk__gt=last)
+            with transaction.atomic():
+                count, chunk_details = chunk.delete()
+
+            batch += 1
+            deleted_count += count
+            for label, rows in chunk_details.items():
+                table = apps.get_model(label)._meta.db_table
+                details[table] = details.get(table, 0) + rows
+            last = upper
+
+            rows_done = details.get(model._meta.db_table, 0)
+            elapsed = time.time() - start
+            progress = f" de ~{total} ({rows_done / total:.0%})" if total else ''
+            self.stdout.write(
+                f"  lote {batch}: {count} registros, {rows_done}{progress} em {elapsed:.1f} s "
+                f"({rows_done / elapsed if elapsed else 0:.0f} reg/s)"
+            )
+            if sleep:
+                time.sleep(sleep)
+
+        return deleted_count, details
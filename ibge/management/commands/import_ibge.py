@@ -1,5 +1,7 @@
 from django.core.management.base import BaseCommand, CommandError
 from ibge.services import MunicipioImportService, DistritoImportService, EstadoImportService
+from djangoibge.memory import MemoryTracker, format_report
+from djangoibge.profiling import add_profile_argument, profiled_command
 import time
 
 
@@ -18,15 +20,26 @@ class Command(BaseCommand):
             action='store_true',
             help='Força reimportação mesmo se dados já existem'
         )
+        parser.add_argument(
+            '--trace-memory',
+            action='store_true',
+            help='Liga o tracemalloc e mostra memória e maiores alocações por fase (mais lento)'
+        )
+        add_profile_argument(parser)
     
     def handle(self, *args, **options):
+        with profiled_command(self.stdout, options['profile'], f"import_ibge-{options['tipo']}"):
+            self._import(options)
+    
+    def _import(self, options):
         tipo = options['tipo']
+        trace = options['trace_memory'] or None
         start_time = time.time()
         
         try:
             if tipo == 'estados' or tipo == 'todos':
                 self.stdout.write("Importando estados...")
-                service = EstadoImportService()
+                service = EstadoImportService(memory=MemoryTracker('estados', trace=trace))
                 result = service.import_estados()
                 self.stdout.write(
                     self.style.SUCCESS(
@@ -34,26 +47,29 @@ class Command(BaseCommand):
                         f"{result['created_regioes']} regiões criadas"
                     )
                 )
+                self._write_batch_metrics(result, options)
             
             if tipo == 'municipios' or tipo == 'todos':
                 self.stdout.write("Importando municípios...")
-                service = MunicipioImportService()
+                service = MunicipioImportService(memory=MemoryTracker('municipios', trace=trace))
                 result = service.import_municipios()
                 self.stdout.write(
                     self.style.SUCCESS(
                         f"Municípios: {result['created']} criados de {result['total_processed']} processados"
                     )
                 )
+                self._write_batch_metrics(result, options)
             
             if tipo == 'distritos' or tipo == 'todos':
                 self.stdout.write("Importando distritos...")
-                service = DistritoImportService()
+                service = DistritoImportService(memory=MemoryTracker('distritos', trace=trace))
                 result = service.import_distritos()
                 self.stdout.write(
                     self.style.SUCCESS(
                         f"Distritos: {result['created']} criados de {result['total_processed']} processados"
                     )
                 )
+                self._write_batch_metrics(result, options)
             
             elapsed_time = time.time() - start_time
             self.stdout.write(
@@ -64,3 +80,16 @@ class Command(BaseCommand):
             
         except Exception as e:
             raise CommandError(f"Erro na importação: {e}")
+    
+    def _write_batch_metrics(self, result, options):
+        """Mostra os lotes escolhidos pelo controlador adaptativo e a memória por fase"""
+        if options['verbosity'] >= 2:
+            for metrics in result.get('batch_metrics', []):
+                self.stdout.write(
+                    f"  {metrics['table']}: lotes {metrics['batch_sizes']}, "
+                    f"{metrics['rows_per_second']} linhas/s, "
+                    f"latência máx. {metrics['max_latency_ms']} ms"
+                )
+        if result.get('memory') and (options['verbosity'] >= 2 or options['trace_memory']):
+            for line in format_report(result['memory']):
+                self.stdout.write(line)
@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand, CommandError
+from ibge.models import SearchEntry
+from ibge.search import SearchIndexService
+from ibge.versioning import publish
+
+
+class Command(BaseCommand):
+    help = 'Reconstrói o índice unificado de busca a partir das tabelas do IBGE já importadas'
+
+    def handle(self, *args, **options):
+        try:
+            result = SearchIndexService().rebuild()
+        except Exception as e:
+            raise CommandError(f"Erro ao reconstruir o índice de busca: {e}")
+
+        # Avisa os workers para invalidarem os caches da busca
+        publish([SearchEntry._meta.db_table])
+        self.stdout.write(
+            self.style.SUCCESS(f"Índice de busca reconstruído: {result['entries']} entradas")
+        )
@@ -0,0 +1,68 @@
+# Generated by Django 5.2.4 on 2026-10-19 09:12
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+CREATE_VIEW = """
+CREATE MATERIALIZED VIEW ibge_municipio_listagem AS
+SELECT
+    m.id AS municipio_id,
+    m.nome AS nome,
+    uf.id AS uf_id,
+    uf.sigla AS uf_sigla,
+    uf.nome AS uf_nome,
+    r.id AS regiao_id,
+    r.nome AS regiao_nome,
+    mi.nome AS microrregiao_nome,
+    me.nome AS mesorregiao_nome
+FROM ibge_municipio m
+LEFT JOIN ibge_microrregiao mi ON mi.id = m.microrregiao_id
+LEFT JOIN ibge_mesorregiao me ON me.id = mi.mesorregiao_id
+LEFT JOIN ibge_regiaoimediata rim ON rim.id = m.regiao_imediata_id
+LEFT JOIN ibge_regiaointermediaria rin ON rin.id = rim.regiao_intermediaria_id
+LEFT JOIN ibge_uf uf ON uf.id = COALESCE(me.uf_id, rin.uf_id)
+LEFT JOIN ibge_regiao r ON r.id = uf.regiao_id
+WITH DATA;
+
+-- Índice único exigido pelo REFRESH MATERIALIZED VIEW CONCURRENTLY
+CREATE UNIQUE INDEX ibge_munlist_pk ON ibge_municipio_listagem (municipio_id);
+CREATE INDEX ibge_munlist_nome ON ibge_municipio_listagem (nome);
+CREATE INDEX ibge_munlist_uf_sigla_nome ON ibge_municipio_listagem (uf_sigla, nome);
+CREATE INDEX ibge_munlist_regiao_nome_nome ON ibge_municipio_listagem (regiao_nome, nome);
+CREATE INDEX ibge_munlist_uf_id ON ibge_municipio_listagem (uf_id);
+CREATE INDEX ibge_munlist_regiao_id ON ibge_municipio_listagem (regiao_id);
+"""
+
+DROP_VIEW = "DROP MATERIALIZED VIEW IF EXISTS ibge_municipio_listagem;"
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ibge', '0005_alter_distrito_mesorregiao_and_more'),
+    ]
+
+    operations = [
+        migrations.RunSQL(CREATE_VIEW, DROP_VIEW),
+        migrations.CreateModel(
+            name='MunicipioListagem',
+            fields=[
+                ('municipio', models.OneToOneField(on_delete=django.db.models.deletion.DO_NOTHING, primary_key=True, related_name='listagem', serialize=False, to='ibge.municipio')),
+                ('nome', models.TextField()),
+                ('uf_id', models.IntegerField(null=True)),
+                ('uf_sigla', models.TextField(null=True)),
+                ('uf_nome', models.TextField(null=True)),
+                ('regiao_id', models.IntegerField(null=True)),
+                ('regiao_nome', models.TextField(null=True)),
+                ('microrregiao_nome', models.TextField(null=True)),
+                ('mesorregiao_nome', models.TextField(null=True)),
+            ],
+            options={
+                'verbose_name': 'Listagem de município',
+                'verbose_name_plural': 'Listagem de municípios',
+                'db_table': 'ibge_municipio_listagem',
+                'managed': False,
+            },
+        ),
+    ]
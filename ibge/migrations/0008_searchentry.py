@@ -0,0 +1,34 @@
+# Generated by Django 5.2.4 on 2026-10-19 10:48
+
+import django.contrib.postgres.indexes
+from django.contrib.postgres.operations import TrigramExtension
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ibge', '0007_dataversion'),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        migrations.CreateModel(
+            name='SearchEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tipo', models.TextField(choices=[('regiao', 'Região'), ('uf', 'UF'), ('municipio', 'Município'), ('distrito', 'Distrito'), ('regiao_intermediaria', 'Região intermediária'), ('regiao_imediata', 'Região imediata'), ('mesorregiao', 'Mesorregião'), ('microrregiao', 'Microrregião')])),
+                ('entity_id', models.BigIntegerField()),
+                ('nome', models.TextField()),
+                ('nome_normalizado', models.TextField()),
+                ('caminho', models.TextField(blank=True)),
+                ('uf_sigla', models.TextField(blank=True, null=True)),
+            ],
+            options={
+                'verbose_name': 'Entrada de busca',
+                'verbose_name_plural': 'Índice de busca',
+                'indexes': [django.contrib.postgres.indexes.GinIndex(fields=['nome_normalizado'], name='ibge_search_nome_trgm', opclasses=['gin_trgm_ops']), models.Index(fields=['nome_normalizado'], name='ibge_search_nome_prefix', opclasses=['text_pattern_ops'])],
+                'constraints': [models.UniqueConstraint(fields=('tipo', 'entity_id'), name='ibge_search_tipo_entity_uniq')],
+            },
+        ),
+    ]
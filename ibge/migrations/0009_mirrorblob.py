@@ -0,0 +1,30 @@
+# Generated by Django 5.2.4 on 2026-10-19 11:37
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ibge', '0008_searchentry'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MirrorBlob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('path', models.TextField()),
+                ('version', models.BigIntegerField()),
+                ('etag', models.TextField()),
+                ('content', models.BinaryField()),
+                ('content_gzip', models.BinaryField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'verbose_name': 'Resposta pré-serializada',
+                'verbose_name_plural': 'Respostas pré-serializadas',
+                'constraints': [models.UniqueConstraint(fields=('path', 'version'), name='ibge_mirror_path_version_uniq')],
+            },
+        ),
+    ]
@@ -0,0 +1,169 @@
+import gzip
+import json
+import logging
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+from asgiref.sync import sync_to_async
+from django.db import transaction
+from .gazetteer import Gazetteer, MunicipioRecord
+from .models import MirrorBlob
+from .versioning import get_data_version, listener_active, publish, subscribe
+
+
+logger = logging.getLogger(__name__)
+
+# Versões anteriores mantidas para requisições em andamento
+KEEP_VERSIONS = 2
+
+
+class MirrorService:
+    """
+    Service para geração das respostas da API espelho de localidades
+
+    Reproduz o formato de servicodados.ibge.gov.br/api/v1/localidades a partir
+    do gazetteer e grava cada resposta já serializada e comprimida.
+    """
+
+    def build(self) -> Dict:
+        """Gera todas as respostas para a versão atual dos dados"""
+        start_time = time.time()
+        version = get_data_version(Gazetteer.tables())
+        gaz = Gazetteer.load(version)
+        etag_prefix = f"ibge-v{version}"
+
+        blobs = []
+        for path, payload in self._payloads(gaz):
+            content = json.dumps(payload, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+            blobs.append(MirrorBlob(
+                path=path,
+                version=version,
+                etag=f'"{etag_prefix}-{path.replace("/", "-")}"',
+                content=content,
+                content_gzip=gzip.compress(content, compresslevel=9),
+            ))
+
+        with transaction.atomic():
+            MirrorBlob.objects.filter(version=version).delete()
+            MirrorBlob.objects.bulk_create(blobs)
+            old_versions = (
+                MirrorBlob.objects.order_by('-version')
+                .values_list('version', flat=True).distinct()[KEEP_VERSIONS:]
+            )
+            MirrorBlob.objects.filter(version__in=list(old_versions)).delete()
+
+        publish([MirrorBlob._meta.db_table])
+        logger.info(f"API espelho v{version}: {len(blobs)} respostas geradas em {time.time() - start_time:.2f} segundos")
+        return {'version': version, 'blobs': len(blobs)}
+
+    def _payloads(self, gaz: Gazetteer):
+        """Caminhos e corpos no formato da API de localidades do IBGE"""
+        ufs = {id: self._uf(gaz, id) for id in gaz.ufs}
+
+        yield 'estados', sorted(ufs.values(), key=lambda uf: uf['nome'])
+
+        municipios = {m.id: self._municipio(gaz, m, ufs) for m in gaz.municipios.values()}
+        yield 'municipios', sorted(municipios.values(), key=lambda m: m['nome'])
+
+        for uf_id, ids in gaz.municipios_by_uf.items():
+            yield f'estados/{uf_id}/municipios', [municipios[id] for id in ids]
+
+        distritos = [
+            {'id': d.id, 'nome': d.nome, 'municipio': municipios.get(d.municipio_id)}
+            for d in gaz.distritos.values()
+        ]
+        yield 'distritos', sorted(distritos, key=lambda d: d['nome'])
+
+    @staticmethod
+    def _uf(gaz: Gazetteer, uf_id) -> Optional[Dict]:
+        uf = gaz.ufs.get(uf_id)
+        if uf is None:
+            return None
+        regiao = gaz.regioes.get(uf.regiao_id)
+        return {
+            'id': uf.id,
+            'sigla': uf.sigla,
+            'nome': uf.nome,
+            'regiao': {'id': regiao.id, 'sigla': regiao.sigla, 'nome': regiao.nome} if regiao else None,
+        }
+
+    @staticmethod
+    def _municipio(gaz: Gazetteer, municipio: MunicipioRecord, ufs: Dict) -> Dict:
+        micro = gaz.microrregioes.get(municipio.microrregiao_id)
+        meso = gaz.mesorregioes.get(municipio.mesorregiao_id)
+        rim = gaz.regioes_imediatas.get(municipio.regiao_imediata_id)
+        rin = gaz.regioes_intermediarias.get(municipio.regiao_intermediaria_id)
+        return {
+            'id': municipio.id,
+            'nome': municipio.nome,
+            'microrregiao': {
+                'id': micro.id,
+                'nome': micro.nome,
+                'mesorregiao': {
+                    'id': meso.id,
+                    'nome': meso.nome,
+                    'UF': ufs.get(meso.parent_id),
+                } if meso else None,
+            } if micro else None,
+            'regiao-imediata': {
+                'id': rim.id,
+                'nome': rim.nome,
+                'regiao-intermediaria': {
+                    'id': rin.id,
+                    'nome': rin.nome,
+                    'UF': ufs.get(rin.parent_id),
+                } if rin else None,
+            } if rim else None,
+        }
+
+
+# (etag, conteúdo, conteúdo gzip) por caminho, da versão mais recente
+_blobs: Dict[str, Tuple[str, bytes, bytes]] = {}
+_loaded_at = 0.0
+_lock = threading.Lock()
+
+# Validade do cache local quando não há listener de versões
+LOCAL_TTL = 5.0
+
+
+def get_blob(path: str) -> Optional[Tuple[str, bytes, bytes]]:
+    """Retorna (etag, json, json gzip) do caminho, do cache do processo ou do banco"""
+    global _loaded_at
+
+    if not listener_active() and time.monotonic() - _loaded_at > LOCAL_TTL:
+        invalidate_blobs()
+
+    blob = _blobs.get(path)
+    if blob is not None:
+        return blob
+
+    with _lock:
+        row = (
+            MirrorBlob.objects.filter(path=path).order_by('-version')
+            .values_list('etag', 'content', 'content_gzip').first()
+        )
+        if row is None:
+            return None
+        blob = (row[0], bytes(row[1]), bytes(row[2]))
+        if not _blobs:
+            _loaded_at = time.monotonic()
+        _blobs[path] = blob
+    return blob
+
+
+async def aget_blob(path: str) -> Optional[Tuple[str, bytes, bytes]]:
+    """``get_blob`` para views assíncronas: da memória sem sair do event loop, do banco em uma thread"""
+    if listener_active() or time.monotonic() - _loaded_at <= LOCAL_TTL:
+        blob = _blobs.get(path)
+        if blob is not None:
+            return blob
+    return await sync_to_async(get_blob)(path)
+
+
+def invalidate_blobs(tables=None):
+    """Descarta as respostas em cache no processo"""
+    with _lock:
+        _blobs.clear()
+
+
+subscribe([MirrorBlob._meta.db_table], invalidate_blobs)
@@ -1,3 +1,4 @@
+from django.contrib.postgres.indexes import GinIndex
 from django.db import models
 
 # Modelo de tabelas 
@@ -215,3 +216,161 @@ class Distrito(models.Model):
     
     def __str__(self): 
         return self.nome
+
+
+class MunicipioListagem(models.Model):
+    """
+    Modelo de leitura desnormalizado (materialized view) para a listagem de municípios
+
+    Mantido pela view materializada ``ibge_municipio_listagem``, atualizada após
+    cada importação. A UF é resolvida pela mesorregião ou, na ausência dela,
+    pela região intermediária.
+
+    :param municipio: Município de origem (chave primária)
+    :type municipio: Municipio
+    :param nome: Nome do município
+    :type nome: string
+    :param uf_id: Identificador da UF
+    :type uf_id: int
+    :param uf_sigla: Sigla da UF
+    :type uf_sigla: string
+    :param regiao_id: Identificador da região
+    :type regiao_id: int
+    :param regiao_nome: Nome da região
+    :type regiao_nome: string
+    """
+    municipio = models.OneToOneField(Municipio, on_delete=models.DO_NOTHING, primary_key=True, related_name='listagem')
+    nome = models.TextField()
+    uf_id = models.IntegerField(null=True)
+    uf_sigla = models.TextField(null=True)
+    uf_nome = models.TextField(null=True)
+    regiao_id = models.IntegerField(null=True)
+    regiao_nome = models.TextField(null=True)
+    microrregiao_nome = models.TextField(null=True)
+    mesorregiao_nome = models.TextField(null=True)
+
+    class Meta:
+        managed = False
+        db_table = 'ibge_municipio_listagem'
+        verbose_name = "Listagem de município"
+        verbose_name_plural = "Listagem de municípios"
+
+    def __str__(self):
+        return self.nome
+
+
+class DataVersion(models.Model):
+    """
+    Modelo para registrar a versão dos dados de cada tabela
+
+    Incrementado a cada importação ou deleção; os caches em memória dos
+    workers usam essas versões (e o canal LISTEN/NOTIFY) para invalidação.
+
+    :param table: Nome da tabela no banco
+    :type table: string
+    :param version: Versão atual dos dados da tabela
+    :type version: int
+    :param updated_at: Data da última alteração
+    :type updated_at: datetime
+    """
+    table = models.TextField(primary_key=True)
+    version = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = "Versão de dados"
+        verbose_name_plural = "Versões de dados"
+
+    def __str__(self):
+        return f"{self.table} v{self.version}"
+
+
+
+class SearchEntry(models.Model):
+    """
+    Modelo para o índice unificado de busca por nome em todos os níveis do IBGE
+
+    Reconstruído após cada importação. O nome normalizado (sem acentos, em
+    minúsculas) é indexado com pg_trgm para buscas por trecho e similaridade.
+
+    :param tipo: Nível territorial (regiao, uf, municipio, distrito, ...)
+    :type tipo: string
+    :param entity_id: Identificador da entidade no seu nível
+    :type entity_id: int
+    :param nome: Nome original
+    :type nome: string
+    :param nome_normalizado: Nome sem acentos e em minúsculas
+    :type nome_normalizado: string
+    :param caminho: Hierarquia acima da entidade (ex: Sudeste > SP)
+    :type caminho: string
+    :param uf_sigla: Sigla da UF da entidade, quando houver
+    :type uf_sigla: string
+    """
+    TIPOS = (
+        ('regiao', 'Região'),
+        ('uf', 'UF'),
+        ('municipio', 'Município'),
+        ('distrito', 'Distrito'),
+        ('regiao_intermediaria', 'Região intermediária'),
+        ('regiao_imediata', 'Região imediata'),
+        ('mesorregiao', 'Mesorregião'),
+        ('microrregiao', 'Microrregião'),
+    )
+
+    tipo = models.TextField(choices=TIPOS)
+    entity_id = models.BigIntegerField()
+    nome = models.TextField()
+    nome_normalizado = models.TextField()
+    caminho = models.TextField(blank=True)
+    uf_sigla = models.TextField(null=True, blank=True)
+
+    class Meta:
+        verbose_name = "Entrada de busca"
+        verbose_name_plural = "Índice de busca"
+        constraints = [
+            models.UniqueConstraint(fields=['tipo', 'entity_id'], name='ibge_search_tipo_entity_uniq'),
+        ]
+        indexes = [
+            GinIndex(fields=['nome_normalizado'], opclasses=['gin_trgm_ops'], name='ibge_search_nome_trgm'),
+            models.Index(fields=['nome_normalizado'], opclasses=['text_pattern_ops'], name='ibge_search_nome_prefix'),
+        ]
+
+    def __str__(self):
+        return f"{self.nome} ({self.tipo})"
+
+
+class MirrorBlob(models.Model):
+    """
+    Modelo para as respostas pré-serializadas da API espelho de localidades
+
+    Cada caminho (ex: ``municipios``, ``estados/35/municipios``) é gerado
+    após as importações, em JSON e JSON comprimido com gzip, e guardado junto
+    com a versão dos dados que o originou.
+
+    :param path: Caminho relativo a /localidades
+    :type path: string
+    :param version: Versão dos dados do IBGE usada na geração
+    :type version: int
+    :param etag: ETag derivado da versão dos dados
+    :type etag: string
+    :param content: Corpo JSON
+    :type content: bytes
+    :param content_gzip: Corpo JSON comprimido com gzip
+    :type content_gzip: bytes
+    """
+    path = models.TextField()
+    version = models.BigIntegerField()
+    etag = models.TextField()
+    content = models.BinaryField()
+    content_gzip = models.BinaryField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        verbose_name = "Resposta pré-serializada"
+        verbose_name_plural = "Respostas pré-serializadas"
+        constraints = [
+            models.UniqueConstraint(fields=['path', 'version'], name='ibge_mirror_path_version_uniq'),
+        ]
+
+    def __str__(self):
+        return f"{self.path} v{self.version}"
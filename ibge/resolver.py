@@ -0,0 +1,163 @@
+import csv
+import io
+import json
+from typing import Dict, Iterable, Iterator, Optional, Union
+from .gazetteer import Gazetteer, MUNICIPIO_COLUMNS, get_gazetteer
+
+
+# Limite de códigos por requisição
+MAX_CODIGOS = 100000
+
+# Linhas por pedaço enviado no streaming
+CHUNK_ROWS = 2000
+
+COLUMNS = ('codigo', 'tipo', 'distrito_id', 'distrito_nome') + MUNICIPIO_COLUMNS + ('erro',)
+
+ERRO_INVALIDO = 'código inválido'
+ERRO_NAO_ENCONTRADO = 'não encontrado'
+
+
+class TooManyCodes(ValueError):
+    """Requisição com mais códigos que o permitido"""
+
+
+class InvalidCodigo:
+    """Código que não é um número, com o valor enviado (devolvido na resposta)"""
+    __slots__ = ('value',)
+
+    def __init__(self, value):
+        self.value = value
+
+
+def parse_codigos(values: Iterable, limit: int = MAX_CODIGOS) -> Iterator[Union[int, InvalidCodigo]]:
+    """Converte os códigos para int (``InvalidCodigo`` se inválido), respeitando o limite"""
+    for count, value in enumerate(values, 1):
+        if count > limit:
+            raise TooManyCodes(f"Máximo de {limit} códigos por requisição")
+        try:
+            yield int(str(value).strip())
+        except (TypeError, ValueError):
+            yield InvalidCodigo(value)
+
+
+class HierarchyResolver:
+    """
+    Resolve códigos IBGE de municípios e distritos para a hierarquia completa
+
+    Toda a resolução é feita no gazetteer em memória; os fragmentos JSON de
+    cada município são montados uma única vez por versão dos dados.
+
+    :param gazetteer: Gazetteer a usar (o do processo, se omitido)
+    :type gazetteer: Gazetteer
+    """
+
+    # (gazetteer, fragmentos) da versão atual dos dados
+    _fragment_cache: tuple = (None, {})
+
+    def __init__(self, gazetteer: Optional[Gazetteer] = None):
+        self.gaz = gazetteer or get_gazetteer()
+
+    def _fragments(self) -> Dict[int, str]:
+        """Fragmentos JSON pré-serializados da hierarquia de cada município"""
+        cached_gaz, fragments = HierarchyResolver._fragment_cache
+        if cached_gaz is not self.gaz:
+            fragments = {
+                municipio_id: json.dumps(dict(zip(MUNICIPIO_COLUMNS, row)), ensure_ascii=False, separators=(',', ':'))[1:-1]
+                for municipio_id, row in self.gaz.municipio_rows.items()
+            }
+            HierarchyResolver._fragment_cache = (self.gaz, fragments)
+        return fragments
+
+    def rows(self, codigos: Iterable[Union[int, InvalidCodigo]]) -> Iterator[tuple]:
+        """Uma tupla por código, na ordem de COLUMNS (só com o código e o erro se não encontrado)"""
+        distritos = self.gaz.distritos
+        municipio_rows = self.gaz.municipio_rows
+        empty = (None,) * len(MUNICIPIO_COLUMNS)
+
+        for codigo in codigos:
+            if isinstance(codigo, InvalidCodigo):
+                yield (codigo.value, None, None, None) + empty + (ERRO_INVALIDO,)
+                continue
+
+            row = municipio_rows.get(codigo)
+            if row is not None:
+                yield (codigo, 'municipio', None, None) + row + (None,)
+                continue
+
+            distrito = distritos.get(codigo)
+            if distrito is not None:
+                yield (
+                    (codigo, 'distrito', distrito.id, distrito.nome)
+                    + municipio_rows.get(distrito.municipio_id, empty) + (None,)
+                )
+            else:
+                yield (codigo, None, None, None) + empty + (ERRO_NAO_ENCONTRADO,)
+
+    def ndjson(self, codigos: Iterable[Union[int, InvalidCodigo]]) -> Iterator[str]:
+        """Resultado em NDJSON, enviado em pedaços de CHUNK_ROWS linhas"""
+        fragments = self._fragments()
+        distritos = self.gaz.distritos
+        dumps = json.dumps
+        lines = []
+
+        for codigo in codigos:
+            if isinstance(codigo, InvalidCodigo):
+                # Devolve o valor enviado, para o cliente achar a entrada com erro
+                lines.append(
+                    f'{{"codigo":{dumps(codigo.value, ensure_ascii=False)},"erro":{dumps(ERRO_INVALIDO, ensure_ascii=False)}}}\n'
+                )
+                continue
+
+            fragment = fragments.get(codigo)
+            if fragment is not None:
+                lines.append(f'{{"codigo":{codigo},"tipo":"municipio","distrito_id":null,"distrito_nome":null,{fragment}}}\n')
+            else:
+                distrito = distritos.get(codigo)
+                fragment = fragments.get(distrito.municipio_id) if distrito else None
+                if fragment is not None:
+                    lines.append(
+                        f'{{"codigo":{codigo},"tipo":"distrito","distrito_id":{distrito.id},'
+                        f'"distrito_nome":{dumps(distrito.nome, ensure_ascii=False)},{fragment}}}\n'
+                    )
+                else:
+                    lines.append(f'{{"codigo":{codigo},"erro":{dumps(ERRO_NAO_ENCONTRADO, ensure_ascii=False)}}}\n')
+
+            if len(lines) >= CHUNK_ROWS:
+                yield ''.join(lines)
+                lines = []
+
+        if lines:
+            yield ''.join(lines)
+
+    def csv(self, codigos: Iterable[Union[int, InvalidCodigo]]) -> Iterator[str]:
+        """Resultado em CSV com cabeçalho, enviado em pedaços de CHUNK_ROWS linhas"""
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(COLUMNS)
+
+        for count, row in enumerate(self.rows(codigos), 1):
+            writer.writerow(row)
+            if count % CHUNK_ROWS == 0:
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate()
+
+        yield buffer.getvalue()
+
+
+def read_csv_codigos(uploaded) -> Iterator[str]:
+    """Lê a primeira coluna de um CSV enviado, ignorando cabeçalho e linhas vazias"""
+    text = io.TextIOWrapper(getattr(uploaded, 'file', uploaded), encoding='utf-8-sig', newline='')
+    sample = text.read(4096)
+    text.seek(0)
+    try:
+        dialect = csv.Sniffer().sniff(sample, delimiters=',;\t') if sample else csv.excel
+    except csv.Error:
+        dialect = csv.excel
+
+    for line_num, row in enumerate(csv.reader(text, dialect)):
+        if not row or not row[0].strip():
+            continue
+        if line_num == 0 and not row[0].strip().isdigit():
+            continue
+        yield row[0]
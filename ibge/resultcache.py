@@ -0,0 +1,121 @@
+import hashlib
+import json
+import threading
+from typing import Dict, Iterable, List
+from django.core.cache import caches
+from django.core.paginator import Page, Paginator
+from .versioning import aget_data_version, get_data_version
+
+
+# Validade das páginas (a versão dos dados já faz parte da chave)
+CACHE_TIMEOUT = 3600
+CACHE_ALIAS = 'default'
+
+_registry: Dict[str, 'ResultCache'] = {}
+
+
+class ResultCache:
+    """
+    Cache das páginas de uma listagem, por filtros, página e versão dos dados
+
+    Guarda o total de linhas e as tuplas da página no cache do Django (o
+    TieredCache: memória do processo na frente do Redis). A versão das
+    tabelas entra na chave, então uma importação invalida tudo sem apagar
+    nada.
+
+    :param name: Nome da listagem (prefixo das chaves e nas estatísticas)
+    :param tables: Tabelas cuja versão invalida o cache
+    :param per_page: Linhas por página
+    """
+
+    def __init__(self, name: str, tables: Iterable[str], per_page: int, timeout: int = CACHE_TIMEOUT):
+        self.name = name
+        self.tables = sorted(set(tables))
+        self.per_page = per_page
+        self.timeout = timeout
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+        _registry[name] = self
+
+    def key(self, filters: Dict, page: int, version: int) -> str:
+        """Chave dos filtros normalizados (sem vazios, em ordem)"""
+        normalized = sorted((name, str(value)) for name, value in filters.items() if value)
+        digest = hashlib.sha1(json.dumps(normalized, ensure_ascii=False).encode('utf-8')).hexdigest()
+        return f'resultcache:{self.name}:v{version}:{digest}:{page}'
+
+    def get_page(self, queryset, filters: Dict, page_number) -> Page:
+        """
+        Página da listagem, do cache ou do banco
+
+        :param queryset: Queryset de ``values_list`` já filtrado e ordenado
+        :param filters: Filtros aplicados ao queryset
+        :param page_number: Número da página da requisição (inválido: primeira)
+        """
+        page = _page_number(page_number)
+        key = self.key(filters, page, get_data_version(self.tables))
+
+        entry = caches[CACHE_ALIAS].get(key)
+        self._count(entry is not None)
+        if entry is None:
+            paginator = Paginator(queryset, self.per_page)
+            page_obj = paginator.get_page(page)
+            entry = (paginator.count, page_obj.number, list(page_obj.object_list))
+            caches[CACHE_ALIAS].set(key, entry, self.timeout)
+        return self._page(queryset, entry)
+
+    async def aget_page(self, queryset, filters: Dict, page_number) -> Page:
+        """``get_page`` para views assíncronas: cache e ORM sem bloquear o event loop"""
+        page = _page_number(page_number)
+        key = self.key(filters, page, await aget_data_version(self.tables))
+
+        entry = await caches[CACHE_ALIAS].aget(key)
+        self._count(entry is not None)
+        if entry is None:
+            paginator = Paginator(queryset, self.per_page)
+            paginator.count = await queryset.acount()
+            # Como o get_page: página além da última mostra a última
+            number = min(page, paginator.num_pages)
+            bottom = (number - 1) * self.per_page
+            rows = [row async for row in queryset[bottom:bottom + self.per_page]]
+            entry = (paginator.count, number, rows)
+            await caches[CACHE_ALIAS].aset(key, entry, self.timeout)
+        return self._page(queryset, entry)
+
+    def _page(self, queryset, entry) -> Page:
+        count, number, rows = entry
+        paginator = Paginator(queryset, self.per_page)
+        paginator.count = count
+        return Page(rows, number, paginator)
+
+    def _count(self, hit: bool):
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def stats(self) -> Dict:
+        """Acertos e faltas desta listagem no processo"""
+        requests = self.hits + self.misses
+        return {
+            'name': self.name,
+            'tables': self.tables,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': round(self.hits / requests, 4) if requests else None,
+        }
+
+
+def _page_number(value) -> int:
+    try:
+        page = int(value)
+    except (TypeError, ValueError):
+        return 1
+    return page if page > 0 else 1
+
+
+def cache_stats() -> List[Dict]:
+    """Estatísticas de todos os caches de listagem do processo"""
+    return [cache.stats() for cache in _registry.values()]
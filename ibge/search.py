@@ -0,0 +1,150 @@
+import logging
+import time
+from typing import Dict, List, Optional
+from django.contrib.postgres.search import TrigramSimilarity
+from django.db import transaction
+from django.db.models import Case, IntegerField, Q, Value, When
+from djangoibge.batching import AdaptiveBatcher
+from .gazetteer import Gazetteer, normalize_name
+from .models import SearchEntry
+
+
+logger = logging.getLogger(__name__)
+
+# Ordem de desempate entre níveis com a mesma relevância
+TIPO_PRIORIDADE = {tipo: i for i, (tipo, _) in enumerate(SearchEntry.TIPOS)}
+
+# Abaixo deste tamanho a busca usa apenas prefixo (trigramas precisam de 3 caracteres)
+MIN_TRIGRAM_LENGTH = 3
+
+
+class SearchIndexService:
+    """Service para reconstrução do índice unificado de busca"""
+
+    def rebuild(self) -> Dict:
+        """Reconstrói o índice a partir das tabelas do IBGE"""
+        start_time = time.time()
+        entries = self._build_entries(Gazetteer.load())
+
+        batcher = AdaptiveBatcher(SearchEntry._meta.db_table, fields_per_row=6)
+        with transaction.atomic():
+            SearchEntry.objects.all().delete()
+            batcher.run(entries, SearchEntry.objects.bulk_create)
+
+        logger.info(f"Índice de busca reconstruído: {len(entries)} entradas em {time.time() - start_time:.2f} segundos")
+        return {'entries': len(entries), 'batch_metrics': [batcher.metrics()]}
+
+    def _build_entries(self, gaz: Gazetteer) -> List[SearchEntry]:
+        """Gera as entradas de todos os níveis com o caminho hierárquico"""
+        entries = []
+
+        def add(tipo, id, nome, caminho, uf=None):
+            entries.append(SearchEntry(
+                tipo=tipo,
+                entity_id=id,
+                nome=nome,
+                nome_normalizado=normalize_name(nome),
+                caminho=' > '.join(p for p in caminho if p),
+                uf_sigla=uf.sigla if uf else None,
+            ))
+
+        def uf_path(uf_id):
+            uf = gaz.ufs.get(uf_id)
+            regiao = gaz.regioes.get(uf.regiao_id) if uf else None
+            return uf, [regiao.nome if regiao else None, uf.sigla if uf else None]
+
+        for regiao in gaz.regioes.values():
+            add('regiao', regiao.id, regiao.nome, [])
+
+        for uf in gaz.ufs.values():
+            regiao = gaz.regioes.get(uf.regiao_id)
+            add('uf', uf.id, uf.nome, [regiao.nome if regiao else None], uf)
+
+        for meso in gaz.mesorregioes.values():
+            uf, path = uf_path(meso.parent_id)
+            add('mesorregiao', meso.id, meso.nome, path, uf)
+
+        for micro in gaz.microrregioes.values():
+            meso = gaz.mesorregioes.get(micro.parent_id)
+            uf, path = uf_path(meso.parent_id if meso else None)
+            add('microrregiao', micro.id, micro.nome, path + [meso.nome if meso else None], uf)
+
+        for rin in gaz.regioes_intermediarias.values():
+            uf, path = uf_path(rin.parent_id)
+            add('regiao_intermediaria', rin.id, rin.nome, path, uf)
+
+        for rim in gaz.regioes_imediatas.values():
+            rin = gaz.regioes_intermediarias.get(rim.parent_id)
+            uf, path = uf_path(rin.parent_id if rin else None)
+            add('regiao_imediata', rim.id, rim.nome, path + [rin.nome if rin else None], uf)
+
+        for municipio in gaz.municipios.values():
+            uf, path = uf_path(municipio.uf_id)
+            add('municipio', municipio.id, municipio.nome, path, uf)
+
+        for distrito in gaz.distritos.values():
+            municipio = gaz.municipios.get(distrito.municipio_id)
+            uf, path = uf_path(municipio.uf_id if municipio else None)
+            add('distrito', distrito.id, distrito.nome, path + [municipio.nome if municipio else None], uf)
+
+        return entries
+
+
+def search_ids(tipo: str, termo: str):
+    """Subquery com os ids de um nível cujo nome contém o termo (sem acentos)"""
+    return SearchEntry.objects.filter(
+        tipo=tipo,
+        nome_normalizado__contains=normalize_name(termo),
+    ).values('entity_id')
+
+
+def search(termo: str, tipos: Optional[List[str]] = None, uf: Optional[str] = None, limit: int = 10) -> List[Dict]:
+    """
+    Busca por nome em todos os níveis, ordenada por relevância
+
+    Prefixos exatos vêm primeiro, depois similaridade de trigramas e, no
+    empate, a ordem de ``SearchEntry.TIPOS`` (regiões antes de distritos).
+    """
+    termo = normalize_name(termo)
+    if not termo:
+        return []
+
+    queryset = SearchEntry.objects.all()
+    if tipos:
+        queryset = queryset.filter(tipo__in=tipos)
+    if uf:
+        queryset = queryset.filter(uf_sigla=uf.upper())
+
+    if len(termo) < MIN_TRIGRAM_LENGTH:
+        queryset = queryset.filter(nome_normalizado__startswith=termo).annotate(
+            similarity=Value(1.0)
+        )
+    else:
+        queryset = queryset.filter(
+            Q(nome_normalizado__contains=termo) | Q(nome_normalizado__trigram_similar=termo)
+        ).annotate(similarity=TrigramSimilarity('nome_normalizado', termo))
+
+    queryset = queryset.annotate(
+        prefix=Case(
+            When(nome_normalizado__startswith=termo, then=Value(1)),
+            default=Value(0),
+            output_field=IntegerField(),
+        ),
+        prioridade=Case(
+            *[When(tipo=tipo, then=Value(p)) for tipo, p in TIPO_PRIORIDADE.items()],
+            output_field=IntegerField(),
+        ),
+    ).order_by('-prefix', '-similarity', 'prioridade', 'nome_normalizado')
+
+    return [
+        {
+            'tipo': tipo,
+            'id': entity_id,
+            'nome': nome,
+            'caminho': caminho,
+            'uf': uf_sigla,
+        }
+        for tipo, entity_id, nome, caminho, uf_sigla in queryset.values_list(
+            'tipo', 'entity_id', 'nome', 'caminho', 'uf_sigla'
+        )[:limit]
+    ]
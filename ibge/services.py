@@ -1,12 +1,19 @@
 import logging
 import requests
 import time
-from typing import Dict, List
+from typing import Dict, List, Optional
 from django.core.cache import cache
 from django.core.exceptions import ValidationError
-from django.db import transaction
+from django.db import connection, transaction
 from django.conf import settings
+from djangoibge.batching import AdaptiveBatcher
+from djangoibge.memory import MemoryTracker
+from djangoibge.singleflight import single_flight
+from djangoibge.transport import http_session
 from .models import *
+from .mirror import MirrorService
+from .search import SearchIndexService
+from .versioning import publish
 
 
 logger = logging.getLogger(__name__)
@@ -20,26 +27,37 @@ class IBGEAPIService:
     
     @classmethod
     def get_data(cls, endpoint: str) -> List[Dict]:
-        """Busca dados da API com cache"""
+        """Busca dados da API com cache (uma única busca por vez para cada endpoint)"""
         url = f"{cls.BASE_URL}/{endpoint}"
         cache_key = f"api_data_{url.replace('/', '_').replace(':', '_')}"
         data = cache.get(cache_key)
         
         if data is None:
-            try:
-                response = requests.get(url, timeout=30)
-                response.raise_for_status()
-                data = response.json()
-                cache.set(cache_key, data, cls.CACHE_TIMEOUT)
-                logger.info(f"Dados de {len(data)} {endpoint} carregados da API")
-            except requests.RequestException as e:
-                logger.error(f"Erro ao buscar dados da API: {e}")
-                raise
+            data = single_flight(
+                cache_key,
+                lambda: cache.get(cache_key),
+                lambda: cls._fetch(url, endpoint, cache_key),
+            )
         else:
             logger.info(f"Usando cache: {len(data)} {endpoint}")
         
         return data
     
+    @classmethod
+    def _fetch(cls, url: str, endpoint: str, cache_key: str) -> List[Dict]:
+        """Baixa o endpoint e grava no cache"""
+        try:
+            with http_session() as session:
+                response = session.get(url, timeout=30)
+            response.raise_for_status()
+            data = response.json()
+            cache.set(cache_key, data, cls.CACHE_TIMEOUT)
+            logger.info(f"Dados de {len(data)} {endpoint} carregados da API")
+            return data
+        except requests.RequestException as e:
+            logger.error(f"Erro ao buscar dados da API: {e}")
+            raise
+    
     @classmethod
     def get_municipios(cls) -> List[Dict]:
         """Busca municípios da API"""
@@ -192,36 +210,91 @@ class DataValidationService:
         return hierarchy
 
 
-class MunicipioImportService:
+class ListagemService:
+    """Service para manutenção dos modelos de leitura desnormalizados"""
+    
+    @staticmethod
+    def refresh_municipios():
+        """Atualiza a listagem de municípios sem bloquear as leituras"""
+        table = MunicipioListagem._meta.db_table
+        with connection.cursor() as cursor:
+            cursor.execute(f"REFRESH MATERIALIZED VIEW CONCURRENTLY {table}")
+        logger.info(f"Listagem {table} atualizada")
+
+
+def refresh_derived_data(tables: List[str], listagem: bool = False):
+    """
+    Atualiza os modelos derivados após alterações nas tabelas do IBGE
+
+    Reconstrói a listagem de municípios (se pedido) e o índice de busca,
+    publica a nova versão das tabelas e gera as respostas da API espelho
+    com essa versão.
+    """
+    tables = list(tables)
+    if listagem:
+        ListagemService.refresh_municipios()
+        tables.append(MunicipioListagem._meta.db_table)
+    
+    SearchIndexService().rebuild()
+    tables.append(SearchEntry._meta.db_table)
+    
+    publish(tables)
+    MirrorService().build()
+
+
+class BulkWriterMixin:
+    """Gravação em bulk com tamanho de lote adaptativo"""
+    
+    def _bulk_create(self, model, objects: List, fields_per_row: int) -> int:
+        """Grava objetos em lotes adaptativos e registra as métricas do lote"""
+        batcher = AdaptiveBatcher(model._meta.db_table, fields_per_row=fields_per_row)
+        created = batcher.run(objects, model.objects.bulk_create)
+        self.batch_metrics.append(batcher.metrics())
+        return created
+
+
+class MunicipioImportService(BulkWriterMixin):
     """Service para importação de municípios"""
     
-    def __init__(self):
+    def __init__(self, memory: Optional[MemoryTracker] = None):
         self.api_service = IBGEAPIService()
         self.validation_service = DataValidationService()
-        self.batch_size = 500
+        self.batch_metrics = []
+        self.memory = memory or MemoryTracker('municipios')
     
     def import_municipios(self) -> Dict:
         """Importa municípios da API para o banco"""
         try:
-            raw_data = self.api_service.get_municipios()
+            with self.memory.phase('download'):
+                raw_data = self.api_service.get_municipios()
             logger.info(f"Iniciando importação de {len(raw_data)} municípios")
             
             valid_municipios = []
-            for raw_municipio in raw_data:
-                try:
-                    municipio_data = self.validation_service.validate_municipio_data(raw_municipio)
-                    hierarchy = self.validation_service.extract_hierarchy_data(raw_municipio)
-                    
-                    valid_municipios.append({
-                        'municipio': municipio_data,
-                        'hierarchy': hierarchy
-                    })
-                except ValidationError as e:
-                    logger.warning(f"Município inválido ignorado: {e}")
+            with self.memory.phase('validacao'):
+                for index, raw_municipio in enumerate(raw_data):
+                    self.memory.step(index, len(raw_data))
+                    try:
+                        municipio_data = self.validation_service.validate_municipio_data(raw_municipio)
+                        hierarchy = self.validation_service.extract_hierarchy_data(raw_municipio)
+                        
+                        valid_municipios.append({
+                            'municipio': municipio_data,
+                            'hierarchy': hierarchy
+                        })
+                    except ValidationError as e:
+                        logger.warning(f"Município inválido ignorado: {e}")
             
             with transaction.atomic():
-                self._create_hierarchy_objects(valid_municipios)
-                created_count = self._create_municipios(valid_municipios)
+                with self.memory.phase('hierarquia'):
+                    self._create_hierarchy_objects(valid_municipios)
+                with self.memory.phase('gravacao'):
+                    created_count = self._create_municipios(valid_municipios)
+            
+            with self.memory.phase('derivados'):
+                refresh_derived_data([model._meta.db_table for model in (
+                    Regiao, Uf, RegiaoIntermediaria, RegiaoImediata,
+                    Mesorregiao, Microrregiao, Municipio
+                )], listagem=True)
             
             logger.info(f"Importação concluída: {created_count} municípios criados")
             
@@ -229,7 +302,9 @@ class MunicipioImportService:
                 'success': True,
                 'total_processed': len(raw_data),
                 'valid_municipios': len(valid_municipios),
-                'created': created_count
+                'created': created_count,
+                'batch_metrics': self.batch_metrics,
+                'memory': self.memory.report()
             }
             
         except Exception as e:
@@ -293,7 +368,7 @@ class MunicipioImportService:
         ]
         
         if new_regioes:
-            Regiao.objects.bulk_create(new_regioes, batch_size=self.batch_size)
+            self._bulk_create(Regiao, new_regioes, fields_per_row=3)
             logger.info(f"Criadas {len(new_regioes)} regiões")
     
     def _bulk_create_ufs(self, ufs_data: List[Dict]):
@@ -310,7 +385,7 @@ class MunicipioImportService:
         ]
         
         if new_ufs:
-            Uf.objects.bulk_create(new_ufs, batch_size=self.batch_size)
+            self._bulk_create(Uf, new_ufs, fields_per_row=4)
             logger.info(f"Criadas {len(new_ufs)} UFs")
     
     def _bulk_create_regioes_intermediarias(self, regioes_data: List[Dict]):
@@ -327,7 +402,7 @@ class MunicipioImportService:
         ]
         
         if new_regioes:
-            RegiaoIntermediaria.objects.bulk_create(new_regioes, batch_size=self.batch_size)
+            self._bulk_create(RegiaoIntermediaria, new_regioes, fields_per_row=3)
             logger.info(f"Criadas {len(new_regioes)} regiões intermediárias")
     
     def _bulk_create_regioes_imediatas(self, regioes_data: List[Dict]):
@@ -348,7 +423,7 @@ class MunicipioImportService:
         ]
         
         if new_regioes:
-            RegiaoImediata.objects.bulk_create(new_regioes, batch_size=self.batch_size)
+            self._bulk_create(RegiaoImediata, new_regioes, fields_per_row=3)
             logger.info(f"Criadas {len(new_regioes)} regiões imediatas")
     
     def _bulk_create_mesorregioes(self, mesorregioes_data: List[Dict]):
@@ -365,7 +440,7 @@ class MunicipioImportService:
         ]
         
         if new_mesorregioes:
-            Mesorregiao.objects.bulk_create(new_mesorregioes, batch_size=self.batch_size)
+            self._bulk_create(Mesorregiao, new_mesorregioes, fields_per_row=3)
             logger.info(f"Criadas {len(new_mesorregioes)} mesorregiões")
     
     def _bulk_create_microrregioes(self, microrregioes_data: List[Dict]):
@@ -382,7 +457,7 @@ class MunicipioImportService:
         ]
         
         if new_microrregioes:
-            Microrregiao.objects.bulk_create(new_microrregioes, batch_size=self.batch_size)
+            self._bulk_create(Microrregiao, new_microrregioes, fields_per_row=3)
             logger.info(f"Criadas {len(new_microrregioes)} microrregiões")
     
     def _create_municipios(self, municipios_data: List[Dict]) -> int:
@@ -411,64 +486,68 @@ class MunicipioImportService:
                 ))
         
         if municipios_to_create:
-            Municipio.objects.bulk_create(municipios_to_create, batch_size=self.batch_size)
+            self._bulk_create(Municipio, municipios_to_create, fields_per_row=4)
         
         return len(municipios_to_create)
 
 
-class DistritoImportService:
+class DistritoImportService(BulkWriterMixin):
     """Service para importação de distritos"""
     
-    def __init__(self):
+    def __init__(self, memory: Optional[MemoryTracker] = None):
         self.api_service = IBGEAPIService()
         self.validation_service = DataValidationService()
-        self.batch_size = 1000 # 500 => 2.25s // 1000 => 2.02s // 1500 => 1.75s // 10000 => 1.39s mas usa mais processador
+        self.batch_metrics = []
+        self.memory = memory or MemoryTracker('distritos')
     
     def import_distritos(self) -> Dict:
         """Importa distritos da API para o banco"""
         try:
             start_time = time.time()
-            municipios_map = self._load_municipios_map()
-            raw_data = self.api_service.get_distritos()
-            existing_distritos = set(Distrito.objects.values_list('id', flat=True))
+            with self.memory.phase('mapa_municipios'):
+                municipios_map = self._load_municipios_map()
+            with self.memory.phase('download'):
+                raw_data = self.api_service.get_distritos()
+                existing_distritos = set(Distrito.objects.values_list('id', flat=True))
             
             logger.info(f"Analisando {len(raw_data)} distritos")
             
             distritos_to_create = []
-            for distrito_data in raw_data:
-                if distrito_data['id'] in existing_distritos:
-                    continue
+            with self.memory.phase('montagem'):
+                for index, distrito_data in enumerate(raw_data):
+                    self.memory.step(index, len(raw_data))
+                    if distrito_data['id'] in existing_distritos:
+                        continue
                 
-                try:
-                    distrito = self.validation_service.validate_distrito_data(distrito_data)
-                    municipio_id = distrito_data['municipio']['id']
-                    municipio_obj = municipios_map.get(municipio_id)
+                    try:
+                        distrito = self.validation_service.validate_distrito_data(distrito_data)
+                        municipio_id = distrito_data['municipio']['id']
+                        municipio_obj = municipios_map.get(municipio_id)
                     
-                    if municipio_obj:
-                        distritos_to_create.append(Distrito(
-                            id=distrito['id'],
-                            nome=distrito['nome'],
-                            municipio=municipio_obj,
-                            microrregiao=municipio_obj.microrregiao,
-                            mesorregiao=municipio_obj.microrregiao.mesorregiao if municipio_obj.microrregiao else None,
-                            uf=municipio_obj.microrregiao.mesorregiao.uf if municipio_obj.microrregiao and municipio_obj.microrregiao.mesorregiao else None,
-                            regiao=municipio_obj.microrregiao.mesorregiao.uf.regiao if municipio_obj.microrregiao and municipio_obj.microrregiao.mesorregiao and municipio_obj.microrregiao.mesorregiao.uf else None,
-                            regiao_imediata=municipio_obj.regiao_imediata,
-                            regiao_intermediaria=municipio_obj.regiao_imediata.regiao_intermediaria if municipio_obj.regiao_imediata else None
-                        ))
-                except ValidationError as e:
-                    logger.warning(f"Distrito inválido ignorado: {e}")
-                except Exception as e:
-                    logger.error(f"Erro ao processar distrito {distrito_data.get('nome')}: {e}")
+                        if municipio_obj:
+                            distritos_to_create.append(Distrito(
+                                id=distrito['id'],
+                                nome=distrito['nome'],
+                                municipio=municipio_obj,
+                                microrregiao=municipio_obj.microrregiao,
+                                mesorregiao=municipio_obj.microrregiao.mesorregiao if municipio_obj.microrregiao else None,
+                                uf=municipio_obj.microrregiao.mesorregiao.uf if municipio_obj.microrregiao and municipio_obj.microrregiao.mesorregiao else None,
+                                regiao=municipio_obj.microrregiao.mesorregiao.uf.regiao if municipio_obj.microrregiao and municipio_obj.microrregiao.mesorregiao and municipio_obj.microrregiao.mesorregiao.uf else None,
+                                regiao_imediata=municipio_obj.regiao_imediata,
+                                regiao_intermediaria=municipio_obj.regiao_imediata.regiao_intermediaria if municipio_obj.regiao_imediata else None
+                            ))
+                    except ValidationError as e:
+                        logger.warning(f"Distrito inválido ignorado: {e}")
+                    except Exception as e:
+                        logger.error(f"Erro ao processar distrito {distrito_data.get('nome')}: {e}")
             
             created_count = 0
             if distritos_to_create:
-                with transaction.atomic():
-                    for i in range(0, len(distritos_to_create), self.batch_size):
-                        batch = distritos_to_create[i:i + self.batch_size]
-                        Distrito.objects.bulk_create(batch, batch_size=self.batch_size)
-                        created_count += len(batch)
-                        logger.info(f"Salvos {min(i + self.batch_size, len(distritos_to_create))}/{len(distritos_to_create)}")
+                with self.memory.phase('gravacao'), transaction.atomic():
+                    created_count = self._bulk_create(Distrito, distritos_to_create, fields_per_row=9)
+                logger.info(f"Salvos {created_count}/{len(distritos_to_create)}")
+                with self.memory.phase('derivados'):
+                    refresh_derived_data([Distrito._meta.db_table])
             
             logger.info(f"Importação de distritos concluída: {created_count} criados")
             
@@ -477,7 +556,9 @@ class DistritoImportService:
             return {
                 'success': True,
                 'total_processed': len(raw_data),
-                'created': created_count
+                'created': created_count,
+                'batch_metrics': self.batch_metrics,
+                'memory': self.memory.report()
             }
             
         except Exception as e:
@@ -496,20 +577,22 @@ class DistritoImportService:
         return {m.id: m for m in municipios}
 
 
-class EstadoImportService:
+class EstadoImportService(BulkWriterMixin):
     """Service para importação de estados"""
     
-    def __init__(self):
+    def __init__(self, memory: Optional[MemoryTracker] = None):
         self.api_service = IBGEAPIService()
-        self.batch_size = 500
+        self.batch_metrics = []
+        self.memory = memory or MemoryTracker('estados')
     
     def import_estados(self) -> Dict:
         """Importa estados da API para o banco"""
         try:
-            raw_data = self.api_service.get_estados()
+            with self.memory.phase('download'):
+                raw_data = self.api_service.get_estados()
             logger.info(f"Iniciando importação de {len(raw_data)} estados")
             
-            with transaction.atomic():
+            with self.memory.phase('gravacao'), transaction.atomic():
                 regioes_data = {}
                 estados_data = []
                 
@@ -527,7 +610,7 @@ class EstadoImportService:
                 ]
                 
                 if new_regioes:
-                    Regiao.objects.bulk_create(new_regioes, batch_size=self.batch_size)
+                    self._bulk_create(Regiao, new_regioes, fields_per_row=3)
                     logger.info(f"Criadas {len(new_regioes)} regiões")
                 
                 # Criar estados
@@ -544,14 +627,19 @@ class EstadoImportService:
                 ]
                 
                 if new_estados:
-                    Estado.objects.bulk_create(new_estados, batch_size=self.batch_size)
+                    self._bulk_create(Estado, new_estados, fields_per_row=4)
                     logger.info(f"Criados {len(new_estados)} estados")
             
+            with self.memory.phase('derivados'):
+                refresh_derived_data([Regiao._meta.db_table, Estado._meta.db_table])
+            
             return {
                 'success': True,
                 'total_processed': len(raw_data),
                 'created_estados': len(new_estados) if 'new_estados' in locals() else 0,
-                'created_regioes': len(new_regioes) if 'new_regioes' in locals() else 0
+                'created_regioes': len(new_regioes) if 'new_regioes' in locals() else 0,
+                'batch_metrics': self.batch_metrics,
+                'memory': self.memory.report()
             }
             
         except Exception as e:
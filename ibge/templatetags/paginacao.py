@@ -0,0 +1,11 @@
+from django import template
+from djangoibge.pagination import pagination_links
+
+
+register = template.Library()
+
+
+@register.simple_tag(takes_context=True)
+def paginacao(context):
+    """Links de paginação da página atual, preservando os filtros da requisição"""
+    return pagination_links(context['page_obj'], context['request'].GET)
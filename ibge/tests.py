@@ -0,0 +1,122 @@
+import io
+import json
+from unittest import mock, skipUnless
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connection
+from django.test import Client, SimpleTestCase, TestCase, override_settings
+from . import versioning
+from .gazetteer import MUNICIPIO_COLUMNS, DistritoRecord
+from .models import MirrorBlob, Regiao, SearchEntry, Uf
+from .resolver import HierarchyResolver, parse_codigos
+
+
+class DataVersionTests(SimpleTestCase):
+    def setUp(self):
+        versioning._versions.clear()
+        listener = mock.patch.object(versioning, 'listener_active', return_value=True)
+        listener.start()
+        self.addCleanup(listener.stop)
+        self.addCleanup(versioning._versions.clear)
+
+    def test_cached_after_read(self):
+        with mock.patch.object(versioning, '_read_versions', return_value={'ibge_uf': 3}) as read:
+            self.assertEqual(versioning.get_data_version(['ibge_uf']), 3)
+            self.assertEqual(versioning.get_data_version(['ibge_uf']), 3)
+        self.assertEqual(read.call_count, 1)
+
+    def test_notification_during_read_is_not_overwritten(self):
+        def read_then_notify(tables):
+            # A notificação chega depois da leitura e antes de gravar em memória
+            versioning._dispatch(['ibge_uf'])
+            return {'ibge_uf': 3}
+
+        with mock.patch.object(versioning, '_read_versions', side_effect=read_then_notify):
+            self.assertEqual(versioning.get_data_version(['ibge_uf']), 3)
+        self.assertNotIn('ibge_uf', versioning._versions)
+
+        with mock.patch.object(versioning, '_read_versions', return_value={'ibge_uf': 4}):
+            self.assertEqual(versioning.get_data_version(['ibge_uf']), 4)
+        self.assertEqual(versioning._versions['ibge_uf'], 4)
+
+
+class FakeGazetteer:
+    """Um município (3550308) com um distrito (355030805)"""
+
+    def __init__(self):
+        row = (3550308, 'São Paulo') + (None,) * (len(MUNICIPIO_COLUMNS) - 2)
+        self.municipio_rows = {3550308: row}
+        self.distritos = {355030805: DistritoRecord(355030805, 'Bela Vista', 3550308)}
+
+
+class ResolverTests(SimpleTestCase):
+    def resolve(self, values):
+        resolver = HierarchyResolver(FakeGazetteer())
+        return [json.loads(line) for line in ''.join(resolver.ndjson(parse_codigos(values))).splitlines()]
+
+    def test_ndjson(self):
+        municipio, distrito = self.resolve([3550308, '355030805'])
+        self.assertEqual((municipio['tipo'], municipio['municipio_nome']), ('municipio', 'São Paulo'))
+        self.assertEqual((distrito['tipo'], distrito['distrito_nome']), ('distrito', 'Bela Vista'))
+
+    def test_errors_echo_the_sent_value(self):
+        invalid, missing, empty = self.resolve(['35x', 1234567, None])
+        self.assertEqual(invalid, {'codigo': '35x', 'erro': 'código inválido'})
+        self.assertEqual(missing, {'codigo': 1234567, 'erro': 'não encontrado'})
+        self.assertEqual(empty, {'codigo': None, 'erro': 'código inválido'})
+
+    def test_csv_error_column(self):
+        resolver = HierarchyResolver(FakeGazetteer())
+        lines = ''.join(resolver.csv(parse_codigos(['abc', '3550308']))).splitlines()
+        self.assertTrue(lines[0].endswith(',erro'))
+        self.assertTrue(lines[1].startswith('abc,') and lines[1].endswith('código inválido'))
+        self.assertTrue(lines[2].endswith(','))
+
+
+@override_settings(RESOLVER_API_TOKEN='segredo')
+class ResolverAuthTests(TestCase):
+    def setUp(self):
+        patcher = mock.patch('ibge.resolver.get_gazetteer', return_value=FakeGazetteer())
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.client = Client(enforce_csrf_checks=True)
+        self.body = json.dumps({'codigos': [3550308]})
+
+    def post(self, **headers):
+        return self.client.post('/api/resolver/', self.body, content_type='application/json', headers=headers)
+
+    def test_token(self):
+        response = self.post(Authorization='Bearer segredo')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(json.loads(b''.join(response.streaming_content))['municipio_id'], 3550308)
+
+    def test_wrong_token_needs_login(self):
+        self.assertEqual(self.post(Authorization='Bearer outro').status_code, 302)
+
+    def test_session_still_checks_csrf(self):
+        user = get_user_model().objects.create_user('resolver', password='senha')
+        self.client.force_login(user)
+        self.assertEqual(self.post().status_code, 403)
+
+
+@skipUnless(connection.vendor == 'postgresql', 'os modelos derivados só são gerados no PostgreSQL')
+class BackfillCommandTests(TestCase):
+    def setUp(self):
+        # Dados importados antes das migrações que criaram os modelos derivados
+        regiao = Regiao.objects.create(id=3, sigla='SE', nome='Sudeste')
+        Uf.objects.create(id=35, sigla='SP', nome='São Paulo', regiao=regiao)
+
+    def test_rebuild_search_index(self):
+        self.assertFalse(SearchEntry.objects.exists())
+
+        call_command('rebuild_search_index', stdout=io.StringIO())
+        entries = SearchEntry.objects.values_list('tipo', 'entity_id', 'caminho')
+        self.assertCountEqual(entries, [('regiao', 3, ''), ('uf', 35, 'Sudeste')])
+
+    def test_build_mirror(self):
+        self.assertEqual(self.client.get('/api/v1/localidades/estados').status_code, 404)
+
+        call_command('build_mirror', stdout=io.StringIO())
+        response = self.client.get('/api/v1/localidades/estados')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([uf['sigla'] for uf in json.loads(response.content)], ['SP'])
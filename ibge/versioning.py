@@ -0,0 +1,232 @@
+import logging
+import select
+import threading
+import time
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+from asgiref.sync import sync_to_async
+from django.db import connection, connections, transaction
+
+
+logger = logging.getLogger(__name__)
+
+# Canal do PostgreSQL usado para avisar os workers sobre mudanças nos dados
+CHANNEL = 'ibge_data_changed'
+VERSION_TABLE = 'ibge_dataversion'
+
+_subscribers: List[Tuple[frozenset, Callable[[set], None]]] = []
+_versions: Dict[str, int] = {}
+# Notificações recebidas por tabela: uma leitura do banco só volta para
+# ``_versions`` se nenhuma notificação da tabela chegou durante ela
+_generations: Dict[str, int] = {}
+_versions_lock = threading.Lock()
+_listener: Optional['DataVersionListener'] = None
+
+
+def subscribe(tables: Iterable[str], callback: Callable[[set], None]):
+    """Registra um callback chamado com as tabelas alteradas que interessam a ele"""
+    _subscribers.append((frozenset(tables), callback))
+
+
+def _dispatch(tables: Iterable[str]):
+    """Descarta as versões locais e avisa os caches afetados"""
+    changed = set(tables)
+    with _versions_lock:
+        for table in changed:
+            _versions.pop(table, None)
+            _generations[table] = _generations.get(table, 0) + 1
+
+    for interest, callback in _subscribers:
+        affected = changed & interest
+        if affected:
+            try:
+                callback(affected)
+            except Exception as e:
+                logger.error(f"Erro ao invalidar cache para {sorted(affected)}: {e}")
+
+
+def listener_active() -> bool:
+    """Indica se este processo recebe notificações de mudança"""
+    return _listener is not None and _listener.connected
+
+
+def get_data_version(tables: Optional[Iterable[str]] = None) -> int:
+    """
+    Retorna a versão combinada dos dados das tabelas (todas, se omitido)
+
+    Com o listener ativo as versões ficam em memória e só são relidas do
+    banco depois de uma notificação; sem ele, cada chamada consulta o banco.
+    """
+    tables = sorted(set(tables)) if tables is not None else None
+
+    generations = None
+    if listener_active():
+        with _versions_lock:
+            if tables is not None and all(t in _versions for t in tables):
+                return sum(_versions[t] for t in tables)
+            generations = dict(_generations)
+
+    versions = _read_versions(tables)
+    if generations is not None:
+        read = dict(versions)
+        if tables is not None:
+            read.update({t: 0 for t in tables if t not in versions})
+        with _versions_lock:
+            # Uma notificação durante a leitura torna o valor lido antigo
+            _versions.update({
+                t: v for t, v in read.items() if _generations.get(t, 0) == generations.get(t, 0)
+            })
+
+    return sum(versions.values())
+
+
+def get_cached_version(table: str) -> Optional[int]:
+    """Versão da tabela em memória (None sem o listener ou antes da primeira leitura)"""
+    if not listener_active():
+        return None
+    with _versions_lock:
+        return _versions.get(table)
+
+
+async def aget_data_version(tables: Iterable[str]) -> int:
+    """
+    ``get_data_version`` para views assíncronas
+
+    Com o listener ativo e as versões em memória responde sem sair do event
+    loop; senão consulta o banco em uma thread.
+    """
+    tables = sorted(set(tables))
+    if listener_active():
+        with _versions_lock:
+            if all(t in _versions for t in tables):
+                return sum(_versions[t] for t in tables)
+    return await sync_to_async(get_data_version)(tables)
+
+
+def _read_versions(tables: Optional[List[str]] = None) -> Dict[str, int]:
+    """Lê as versões das tabelas do banco"""
+    with connection.cursor() as cursor:
+        if tables is None:
+            cursor.execute(f"SELECT \"table\", version FROM {VERSION_TABLE}")
+        else:
+            cursor.execute(
+                f"SELECT \"table\", version FROM {VERSION_TABLE} WHERE \"table\" = ANY(%s)",
+                [list(tables)]
+            )
+        return dict(cursor.fetchall())
+
+
+def publish(tables: Iterable[str]) -> Dict[str, int]:
+    """
+    Incrementa a versão das tabelas e notifica todos os workers
+
+    A notificação só é entregue quando a transação atual é confirmada.
+    """
+    tables = sorted(set(tables))
+    if not tables:
+        return {}
+
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"""
+            INSERT INTO {VERSION_TABLE} ("table", version, updated_at)
+            SELECT t, 1, now() FROM unnest(%s::text[]) AS t
+            ON CONFLICT ("table") DO UPDATE
+                SET version = {VERSION_TABLE}.version + 1, updated_at = now()
+            RETURNING "table", version
+            """,
+            [tables]
+        )
+        versions = dict(cursor.fetchall())
+        cursor.execute("SELECT pg_notify(%s, %s)", [CHANNEL, ','.join(tables)])
+
+    transaction.on_commit(lambda: _dispatch(tables))
+    logger.info(f"Versão dos dados atualizada: {versions}")
+    return versions
+
+
+class DataVersionListener(threading.Thread):
+    """
+    Thread que escuta o canal de mudanças em uma conexão dedicada
+
+    Ao (re)conectar, compara as versões do banco com as conhecidas e
+    invalida o que mudou enquanto estava desconectada.
+    """
+
+    POLL_TIMEOUT = 5.0
+    RECONNECT_DELAY = 5.0
+
+    def __init__(self, alias: str = 'default'):
+        super().__init__(name='ibge-data-version-listener', daemon=True)
+        self.alias = alias
+        self.connected = False
+        self._stop_event = threading.Event()
+        self._known: Dict[str, int] = {}
+
+    def stop(self):
+        self._stop_event.set()
+
+    def run(self):
+        while not self._stop_event.is_set():
+            conn = None
+            try:
+                conn = self._connect()
+                self._resync(conn)
+                self.connected = True
+                self._listen(conn)
+            except Exception as e:
+                logger.warning(f"Listener de versões desconectado: {e}")
+            finally:
+                self.connected = False
+                if conn is not None:
+                    try:
+                        conn.close()
+                    except Exception:
+                        pass
+            self._stop_event.wait(self.RECONNECT_DELAY)
+
+    def _connect(self):
+        wrapper = connections[self.alias]
+        conn = wrapper.get_new_connection(wrapper.get_connection_params())
+        conn.autocommit = True
+        with conn.cursor() as cursor:
+            cursor.execute(f"LISTEN {CHANNEL}")
+        return conn
+
+    def _resync(self, conn):
+        """Invalida as tabelas cujas versões mudaram enquanto estava desconectado"""
+        with conn.cursor() as cursor:
+            cursor.execute(f"SELECT \"table\", version FROM {VERSION_TABLE}")
+            current = dict(cursor.fetchall())
+
+        changed = {t for t, v in current.items() if self._known.get(t) != v}
+        self._known = current
+        if changed:
+            _dispatch(changed)
+
+    def _listen(self, conn):
+        while not self._stop_event.is_set():
+            ready, _, _ = select.select([conn], [], [], self.POLL_TIMEOUT)
+            if not ready:
+                continue
+
+            conn.poll()
+            changed = set()
+            while conn.notifies:
+                notify = conn.notifies.pop(0)
+                changed.update(t for t in notify.payload.split(',') if t)
+            if changed:
+                logger.info(f"Dados alterados em outro processo: {sorted(changed)}")
+                _dispatch(changed)
+
+
+def start_listener(alias: str = 'default') -> DataVersionListener:
+    """Inicia o listener do processo (chamar depois do fork do worker)"""
+    global _listener
+    if _listener is None or not _listener.is_alive():
+        _listener = DataVersionListener(alias)
+        _listener.start()
+        # Aguarda a primeira conexão para que as leituras usem o cache local
+        deadline = time.monotonic() + 2.0
+        while not _listener.connected and time.monotonic() < deadline:
+            time.sleep(0.05)
+    return _listener
@@ -1,18 +1,59 @@
 from django.shortcuts import render, redirect
-from django.http import HttpResponse, JsonResponse
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
-from django.core.paginator import Paginator
+from django.contrib.admin.views.decorators import staff_member_required
+from django.views.decorators.http import require_GET, require_POST
+from django.views.decorators.csrf import csrf_exempt, csrf_protect
+from django.conf import settings
+from django.utils.cache import patch_vary_headers
+from django.core.cache import caches
+from asgiref.sync import sync_to_async
 from .services import MunicipioImportService, DistritoImportService, EstadoImportService
+from .gazetteer import get_gazetteer
+from .search import search
+from .resolver import HierarchyResolver, TooManyCodes, parse_codigos, read_csv_codigos
+from .mirror import aget_blob
+from .models import Distrito, Estado, Municipio, MunicipioListagem, Regiao, SearchEntry, Uf
+from .resultcache import ResultCache, cache_stats
+from .conditional import conditional_page
+from .filters import (
+    filter_estados, filter_municipios, filter_distritos, ESTADO_ROW, MUNICIPIO_ROW, DISTRITO_ROW,
+    MUNICIPIO_EXPORT_FIELDS, MUNICIPIO_EXPORT_COLUMNS, DISTRITO_EXPORT_FIELDS, DISTRITO_EXPORT_COLUMNS
+)
+from djangoibge.exports import export_response, stream_for
+from djangoibge.routers import monitor as replica_monitor, replica_configured
+import hmac
+import json
 import logging
 import time
-from ibge.models import Estado, Municipio, Distrito
+from functools import wraps
 
 
 logger = logging.getLogger(__name__)
 siglas = ['AC', 'AL', 'AP', 'AM', 'BA', 'CE', 'DF', 'ES', 'GO', 'MA', 'MT', 'MS', 'MG', 'PA', 'PB', 'PR', 'PE', 'PI', 'RJ', 'RN', 'RS', 'RO', 'RR', 'SC', 'SP', 'SE', 'TO']
 regioes = ["Norte", "Nordeste", "Centro-Oeste", "Sudeste", "Sul"]
 
+# Tabelas lidas por cada página (os filtros de UF e região vêm do gazetteer)
+FILTER_TABLES = [Uf._meta.db_table, Regiao._meta.db_table]
+ESTADOS_TABLES = [Estado._meta.db_table, Regiao._meta.db_table]
+MUNICIPIOS_TABLES = [MunicipioListagem._meta.db_table, SearchEntry._meta.db_table]
+DISTRITOS_TABLES = [
+    Distrito._meta.db_table, Municipio._meta.db_table, Uf._meta.db_table,
+    Regiao._meta.db_table, SearchEntry._meta.db_table,
+]
+
+# Páginas das listagens em cache, invalidadas pela versão das tabelas consultadas
+estados_cache = ResultCache('estados', ESTADOS_TABLES, per_page=20)
+municipios_cache = ResultCache('municipios', MUNICIPIOS_TABLES, per_page=20)
+distritos_cache = ResultCache('distritos', DISTRITOS_TABLES, per_page=20)
+
+
+def _filter_choices():
+    """Opções dos filtros de UF e região, vindas do gazetteer em memória"""
+    gaz = get_gazetteer()
+    return gaz.siglas() or siglas, gaz.regiao_nomes() or regioes
+
 
 def home(request):
     """View para exibir dados paginados"""
@@ -23,259 +64,355 @@ def home(request):
 
 
 @login_required
-def estados_view(request):
-    """View para importação de estados"""
+@conditional_page([SearchEntry._meta.db_table])
+async def busca_api(request):
+    """API JSON de autocomplete por nome em todos os níveis do IBGE"""
+    termo = request.GET.get('q', '').strip()
+    tipos = [t for t in request.GET.getlist('tipo') if t]
+    uf = request.GET.get('uf')
     
-    if request.method == 'POST':
-        start_time = time.time()
-        
-        try:
-            service = EstadoImportService()
-            result = service.import_estados()
-            
-            elapsed_time = time.time() - start_time
-            
-            if request.headers.get('Accept') == 'application/json':
-                return JsonResponse({
-                    'success': True,
-                    'message': f"Estados importados com sucesso em {elapsed_time:.2f} segundos",
-                    'data': result
-                })
-            
-            messages.success(
-                request,
-                f"Estados importados com sucesso! {result['created_estados']} estados e "
-                f"{result['created_regioes']} regiões criados em {elapsed_time:.2f} segundos"
-            )
-            
-            return redirect('estados')
-            
-        except Exception as e:
-            logger.error(f"Erro na view de estados: {e}")
-            
-            if request.headers.get('Accept') == 'application/json':
-                return JsonResponse({
-                    'success': False,
-                    'message': str(e)
-                }, status=500)
-            
-            messages.error(request, f"Erro na importação: {e}")
-            return HttpResponse(f"Erro na importação: {e}", status=500)
+    try:
+        limit = min(max(int(request.GET.get('limit', 10)), 1), 50)
+    except ValueError:
+        limit = 10
+    
+    results = await sync_to_async(search)(termo, tipos=tipos, uf=uf, limit=limit)
+    return JsonResponse({
+        'query': termo,
+        'results': results,
+    })
+
+
+def _resolver_response(request, codigos, formato: str) -> StreamingHttpResponse:
+    """Resposta em streaming com a hierarquia de cada código"""
+    resolver = HierarchyResolver()
+    if formato == 'csv':
+        response = StreamingHttpResponse(resolver.csv(codigos), content_type='text/csv; charset=utf-8')
+        response['Content-Disposition'] = 'attachment; filename="hierarquia.csv"'
     else:
-        # Filtragem
-        estados_list = Estado.objects.select_related('regiao').all()
-        
-        # Filtro por região
-        regiao_filter = request.GET.get('regiao')
-        if regiao_filter:
-            estados_list = estados_list.filter(regiao__nome__icontains=regiao_filter)
-        
-        # Filtro por nome
-        nome_filter = request.GET.get('nome')
-        if nome_filter:
-            estados_list = estados_list.filter(nome__icontains=nome_filter)
-        
-        # Filtro por sigla
-        sigla_filter = request.GET.get('sigla')
-        if sigla_filter:
-            estados_list = estados_list.filter(sigla__icontains=sigla_filter)
-        
-        estados_list = estados_list.order_by('nome')
-        
-        # Paginação
-        paginator = Paginator(estados_list, 20)
-        page_number = request.GET.get('page')
-        page_obj = paginator.get_page(page_number)
-
-        context = {
-            'estados': page_obj,
-            'paginator': paginator,
-            'page_obj': page_obj,
-            'title': 'Estados',
-            'filters': {
-                'regiao': regiao_filter or '',
-                'nome': nome_filter or '',
-                'sigla': sigla_filter or ''
-            },
-            'siglas': siglas,
-            'regioes': regioes,
-
-        }
-        return render(request, 'estados.html', context)
+        response = StreamingHttpResponse(resolver.ndjson(codigos), content_type='application/x-ndjson; charset=utf-8')
+    return stream_for(request, response)
+
+
+def token_or_login_required(view):
+    """
+    Aceita ``Authorization: Bearer <RESOLVER_API_TOKEN>`` ou a sessão do navegador
+
+    Com o token a view é chamada sem login nem CSRF (chamadas de outros
+    serviços); sem ele vale o login com a verificação de CSRF de sempre.
+    """
+    browser_view = login_required(csrf_protect(view))
+
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        token = settings.RESOLVER_API_TOKEN
+        if token and hmac.compare_digest(request.headers.get('Authorization', '').encode(), f'Bearer {token}'.encode()):
+            return view(request, *args, **kwargs)
+        return browser_view(request, *args, **kwargs)
+
+    return csrf_exempt(wrapper)
+
+
+@token_or_login_required
+@require_POST
+def resolver_api(request):
+    """Resolve uma lista JSON de códigos IBGE para a hierarquia completa"""
+    try:
+        payload = json.loads(request.body)
+        values = payload.get('codigos') if isinstance(payload, dict) else payload
+        if not isinstance(values, list):
+            raise ValueError("Envie uma lista em 'codigos'")
+        codigos = list(parse_codigos(values))
+    except TooManyCodes as e:
+        return JsonResponse({'success': False, 'message': str(e)}, status=413)
+    except ValueError as e:
+        return JsonResponse({'success': False, 'message': f"JSON inválido: {e}"}, status=400)
+    
+    return _resolver_response(request, codigos, request.GET.get('formato', 'ndjson'))
+
+
+@token_or_login_required
+@require_POST
+def resolver_csv_api(request):
+    """Resolve os códigos da primeira coluna de um CSV enviado em 'arquivo'"""
+    uploaded = request.FILES.get('arquivo')
+    if uploaded is None:
+        return JsonResponse({'success': False, 'message': "Envie o CSV no campo 'arquivo'"}, status=400)
+    
+    try:
+        codigos = list(parse_codigos(read_csv_codigos(uploaded)))
+    except TooManyCodes as e:
+        return JsonResponse({'success': False, 'message': str(e)}, status=413)
+    except UnicodeDecodeError:
+        return JsonResponse({'success': False, 'message': "O CSV deve estar em UTF-8"}, status=400)
+    
+    return _resolver_response(request, codigos, request.GET.get('formato', 'csv'))
+
+
+async def _blob_response(request, path: str) -> HttpResponse:
+    """Envia a resposta pré-serializada do caminho, com ETag e gzip"""
+    blob = await aget_blob(path)
+    if blob is None:
+        return JsonResponse({'message': 'Recurso não encontrado'}, status=404)
+    
+    etag, content, content_gzip = blob
+    if etag in request.headers.get('If-None-Match', ''):
+        response = HttpResponse(status=304)
+    elif 'gzip' in request.headers.get('Accept-Encoding', ''):
+        response = HttpResponse(content_gzip, content_type='application/json; charset=utf-8')
+        response['Content-Encoding'] = 'gzip'
+    else:
+        response = HttpResponse(content, content_type='application/json; charset=utf-8')
+    
+    response['ETag'] = etag
+    response['Cache-Control'] = 'public, max-age=0, must-revalidate'
+    patch_vary_headers(response, ['Accept-Encoding'])
+    return response
+
+
+@require_GET
+async def localidades_api(request, recurso):
+    """Espelho de /localidades/{estados,municipios,distritos} da API do IBGE"""
+    return await _blob_response(request, recurso)
+
+
+@require_GET
+async def localidades_uf_municipios_api(request, uf):
+    """Espelho de /localidades/estados/{UF}/municipios (UF por id ou sigla)"""
+    if not uf.isdigit():
+        gaz = await sync_to_async(get_gazetteer)()
+        uf_record = gaz.uf_by_sigla(uf)
+        if uf_record is None:
+            return JsonResponse({'message': 'UF não encontrada'}, status=404)
+        uf = uf_record.id
+    return await _blob_response(request, f'estados/{uf}/municipios')
+
+
+@staff_member_required
+@require_GET
+def cache_stats_api(request):
+    """Taxa de acerto dos caches de listagem e do cache do Django e situação da réplica neste processo"""
+    backend = caches['default']
+    return JsonResponse({
+        'caches': cache_stats(),
+        'backend': backend.stats() if hasattr(backend, 'stats') else None,
+        'replica': replica_monitor.status() if replica_configured() else None,
+    })
+
+
+def _import_estados(request):
+    """Importação de estados pela página (POST)"""
+    start_time = time.time()
+
+    try:
+        service = EstadoImportService()
+        result = service.import_estados()
+
+        elapsed_time = time.time() - start_time
+
+        if request.headers.get('Accept') == 'application/json':
+            return JsonResponse({
+                'success': True,
+                'message': f"Estados importados com sucesso em {elapsed_time:.2f} segundos",
+                'data': result
+            })
+
+        messages.success(
+            request,
+            f"Estados importados com sucesso! {result['created_estados']} estados e "
+            f"{result['created_regioes']} regiões criados em {elapsed_time:.2f} segundos"
+        )
+
+        return redirect('estados')
+
+    except Exception as e:
+        logger.error(f"Erro na view de estados: {e}")
+
+        if request.headers.get('Accept') == 'application/json':
+            return JsonResponse({
+                'success': False,
+                'message': str(e)
+            }, status=500)
+
+        messages.error(request, f"Erro na importação: {e}")
+        return HttpResponse(f"Erro na importação: {e}", status=500)
 
 
 @login_required
-def municipios_view(request):
-    """View para importação de municípios"""
+@conditional_page(ESTADOS_TABLES + FILTER_TABLES)
+async def estados_view(request):
+    """Listagem de estados (GET) e importação de estados (POST)"""
     if request.method == 'POST':
-        start_time = time.time()
-        
-        try:
-            service = MunicipioImportService()
-            result = service.import_municipios()
-            
-            elapsed_time = time.time() - start_time
-            
-            if request.headers.get('Accept') == 'application/json':
-                return JsonResponse({
-                    'success': True,
-                    'message': f"Municípios importados com sucesso em {elapsed_time:.2f} segundos",
-                    'data': result
-                })
-            
-            messages.success(
-                request,
-                f"Municípios importados com sucesso! {result['created']} municípios criados em {elapsed_time:.2f} segundos"
-            )
-            
-            return redirect('municipios')
-            
-        except Exception as e:
-            logger.error(f"Erro na view de municípios: {e}")
-            
-            if request.headers.get('Accept') == 'application/json':
-                return JsonResponse({
-                    'success': False,
-                    'message': str(e)
-                }, status=500)
-            
-            messages.error(request, f"Erro na importação: {e}")
-            return HttpResponse(f"Erro na importação: {e}", status=500)
-    else:
-        # Filtragem
-        municipios_list = Municipio.objects.select_related(
-            'microrregiao__mesorregiao__uf__regiao',
-            'regiao_imediata__regiao_intermediaria__uf'
-        ).all()
-        
-        # Filtro por nome
-        nome_filter = request.GET.get('nome')
-        if nome_filter:
-            municipios_list = municipios_list.filter(nome__icontains=nome_filter)
-        
-        # Filtro por UF
-        uf_filter = request.GET.get('uf')
-        if uf_filter:
-            municipios_list = municipios_list.filter(
-                microrregiao__mesorregiao__uf__sigla__icontains=uf_filter
-            )
-        
-        # Filtro por região
-        regiao_filter = request.GET.get('regiao')
-        if regiao_filter:
-            municipios_list = municipios_list.filter(
-                microrregiao__mesorregiao__uf__regiao__nome__icontains=regiao_filter
-            )
-        
-        municipios_list = municipios_list.order_by('nome')
-        
-        # Paginação
-        paginator = Paginator(municipios_list, 20)
-        page_number = request.GET.get('page')
-        page_obj = paginator.get_page(page_number)
-
-        context = {
-            'municipios': page_obj,
-            'paginator': paginator,
-            'page_obj': page_obj,
-            'title': 'Municípios',
-            'filters': {
-                'nome': nome_filter or '',
-                'uf': uf_filter or '',
-                'regiao': regiao_filter or ''
-            },
-            'siglas': siglas,
-            'regioes': regioes,
-
-        }
-        return render(request, 'municipios.html', context)
+        return await sync_to_async(_import_estados)(request)
+
+    estados_list, filters = filter_estados(request.GET)
+
+    # Paginação (página e total em cache por filtros e versão dos dados)
+    page_obj = await estados_cache.aget_page(
+        estados_list.values_list(*ESTADO_ROW.fields), filters, request.GET.get('page')
+    )
+    paginator = page_obj.paginator
+
+    filter_siglas, filter_regioes = await sync_to_async(_filter_choices)()
+
+    context = {
+        'estados': page_obj,
+        'rows': ESTADO_ROW.render(page_obj),
+        'paginator': paginator,
+        'page_obj': page_obj,
+        'title': 'Estados',
+        'filters': filters,
+        'siglas': filter_siglas,
+        'regioes': filter_regioes,
+
+    }
+    return await sync_to_async(render)(request, 'estados.html', context)
+
+
+def _import_municipios(request):
+    """Importação de municípios pela página (POST)"""
+    start_time = time.time()
+
+    try:
+        service = MunicipioImportService()
+        result = service.import_municipios()
+
+        elapsed_time = time.time() - start_time
+
+        if request.headers.get('Accept') == 'application/json':
+            return JsonResponse({
+                'success': True,
+                'message': f"Municípios importados com sucesso em {elapsed_time:.2f} segundos",
+                'data': result
+            })
+
+        messages.success(
+            request,
+            f"Municípios importados com sucesso! {result['created']} municípios criados em {elapsed_time:.2f} segundos"
+        )
+
+        return redirect('municipios')
+
+    except Exception as e:
+        logger.error(f"Erro na view de municípios: {e}")
+
+        if request.headers.get('Accept') == 'application/json':
+            return JsonResponse({
+                'success': False,
+                'message': str(e)
+            }, status=500)
+
+        messages.error(request, f"Erro na importação: {e}")
+        return HttpResponse(f"Erro na importação: {e}", status=500)
 
 
 @login_required
-def distritos_view(request):
-    """View para importação de distritos"""
+@conditional_page(MUNICIPIOS_TABLES + FILTER_TABLES)
+async def municipios_view(request):
+    """Listagem de municípios (GET) e importação de municípios (POST)"""
     if request.method == 'POST':
-        start_time = time.time()
-        
-        try:
-            service = DistritoImportService()
-            result = service.import_distritos()
-            
-            elapsed_time = time.time() - start_time
-            
-            if request.headers.get('Accept') == 'application/json':
-                return JsonResponse({
-                    'success': True,
-                    'message': f"Distritos importados com sucesso em {elapsed_time:.2f} segundos",
-                    'data': result
-                })
-            
-            messages.success(
-                request,
-                f"Distritos importados com sucesso! {result['created']} distritos criados em {elapsed_time:.2f} segundos"
-            )
-            
-            return redirect('distritos')
-            
-        except Exception as e:
-            logger.error(f"Erro na view de distritos: {e}")
-            
-            if request.headers.get('Accept') == 'application/json':
-                return JsonResponse({
-                    'success': False,
-                    'message': str(e)
-                }, status=500)
-            
-            messages.error(request, f"Erro na importação: {e}")
-            return HttpResponse(f"Erro na importação: {e}", status=500)
-    else:
-        # Filtragem
-        distritos_list = Distrito.objects.select_related(
-            'municipio',
-            'uf',
-            'regiao',
-            'microrregiao__mesorregiao'
-        ).all()
-        
-        # Filtro por nome
-        nome_filter = request.GET.get('nome')
-        if nome_filter:
-            distritos_list = distritos_list.filter(nome__icontains=nome_filter)
-        
-        # Filtro por município
-        municipio_filter = request.GET.get('municipio')
-        if municipio_filter:
-            distritos_list = distritos_list.filter(municipio__nome__icontains=municipio_filter)
-        
-        # Filtro por UF
-        uf_filter = request.GET.get('uf')
-        if uf_filter:
-            distritos_list = distritos_list.filter(uf__sigla__icontains=uf_filter)
-        
-        # Filtro por região
-        regiao_filter = request.GET.get('regiao')
-        if regiao_filter:
-            distritos_list = distritos_list.filter(regiao__nome__icontains=regiao_filter)
-        
-        distritos_list = distritos_list.order_by('nome')
-        
-        # Paginação
-        paginator = Paginator(distritos_list, 20)
-        page_number = request.GET.get('page')
-        page_obj = paginator.get_page(page_number)
-
-        context = {
-            'distritos': page_obj,
-            'paginator': paginator,
-            'page_obj': page_obj,
-            'title': 'Distritos',
-            'filters': {
-                'nome': nome_filter or '',
-                'municipio': municipio_filter or '',
-                'uf': uf_filter or '',
-                'regiao': regiao_filter or '',
-            },
-            'siglas': siglas,
-            'regioes': regioes,
-        }
-        return render(request, 'distritos.html', context)
\ No newline at end of file
+        return await sync_to_async(_import_municipios)(request)
+
+    municipios_list, filters = filter_municipios(request.GET)
+
+    export_format = request.GET.get('export')
+    if export_format:
+        return stream_for(request, export_response(
+            municipios_list, MUNICIPIO_EXPORT_FIELDS, export_format, 'municipios',
+            columns=MUNICIPIO_EXPORT_COLUMNS, compress=bool(request.GET.get('gzip')),
+        ))
+
+    # Paginação (página e total em cache por filtros e versão dos dados)
+    page_obj = await municipios_cache.aget_page(
+        municipios_list.values_list(*MUNICIPIO_ROW.fields), filters, request.GET.get('page')
+    )
+    paginator = page_obj.paginator
+
+    filter_siglas, filter_regioes = await sync_to_async(_filter_choices)()
+
+    context = {
+        'municipios': page_obj,
+        'rows': MUNICIPIO_ROW.render(page_obj),
+        'paginator': paginator,
+        'page_obj': page_obj,
+        'title': 'Municípios',
+        'filters': filters,
+        'siglas': filter_siglas,
+        'regioes': filter_regioes,
+
+    }
+    return await sync_to_async(render)(request, 'municipios.html', context)
+
+
+def _import_distritos(request):
+    """Importação de distritos pela página (POST)"""
+    start_time = time.time()
+
+    try:
+        service = DistritoImportService()
+        result = service.import_distritos()
+
+        elapsed_time = time.time() - start_time
+
+        if request.headers.get('Accept') == 'application/json':
+            return JsonResponse({
+                'success': True,
+                'message': f"Distritos importados com sucesso em {elapsed_time:.2f} segundos",
+                'data': result
+            })
+
+        messages.success(
+            request,
+            f"Distritos importados com sucesso! {result['created']} distritos criados em {elapsed_time:.2f} segundos"
+        )
+
+        return redirect('distritos')
+
+    except Exception as e:
+        logger.error(f"Erro na view de distritos: {e}")
+
+        if request.headers.get('Accept') == 'application/json':
+            return JsonResponse({
+                'success': False,
+                'message': str(e)
+            }, status=500)
+
+        messages.error(request, f"Erro na importação: {e}")
+        return HttpResponse(f"Erro na importação: {e}", status=500)
+
+
+@login_required
+@conditional_page(DISTRITOS_TABLES + FILTER_TABLES)
+async def distritos_view(request):
+    """Listagem de distritos (GET) e importação de distritos (POST)"""
+    if request.method == 'POST':
+        return await sync_to_async(_import_distritos)(request)
+
+    distritos_list, filters = filter_distritos(request.GET)
+
+    export_format = request.GET.get('export')
+    if export_format:
+        return stream_for(request, export_response(
+            distritos_list, DISTRITO_EXPORT_FIELDS, export_format, 'distritos',
+            columns=DISTRITO_EXPORT_COLUMNS, compress=bool(request.GET.get('gzip')),
+        ))
+
+    # Paginação (página e total em cache por filtros e versão dos dados)
+    page_obj = await distritos_cache.aget_page(
+        distritos_list.values_list(*DISTRITO_ROW.fields), filters, request.GET.get('page')
+    )
+    paginator = page_obj.paginator
+
+    filter_siglas, filter_regioes = await sync_to_async(_filter_choices)()
+
+    context = {
+        'distritos': page_obj,
+        'rows': DISTRITO_ROW.render(page_obj),
+        'paginator': paginator,
+        'page_obj': page_obj,
+        'title': 'Distritos',
+        'filters': filters,
+        'siglas': filter_siglas,
+        'regioes': filter_regioes,
+    }
+    return await sync_to_async(render)(request, 'distritos.html', context)